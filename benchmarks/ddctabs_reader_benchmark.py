@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark for the ddctabs reader
+
+Compares `DdcTabsReader` with a baseline that splits every token line on all tabs and parses the header with regular expressions (the parsing strategy that `DtakMaker` used before the reader existed).
+
+Example call:
+python3 benchmarks/ddctabs_reader_benchmark.py --data "tests/testdata/dtak/ddctabs/*" --repeat 50
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from transnormer_data.ddctabs_reader import DdcTabsReader
+from transnormer_data.utils import filename_gen
+
+COLUMN_NAMES = {
+    "Token": "xlit",
+    "Utf8": "orig",
+    "CanonicalToken": "norm",
+    "Pos": "pos",
+    "Lemma": "lemma",
+    "WordSep": "ws",
+}
+
+
+def read_baseline(path: str) -> int:
+    """Parse a ddctabs file with a full split per line, return the number of sentences"""
+    columns: Dict[str, int] = {}
+    n_sents = 0
+    sent: List[List[str]] = []
+    with open(path, "r", encoding="utf8") as fh:
+        for line in fh:
+            line = line.strip()
+            if line.startswith("%%$DDC:index["):
+                match = re.split(" |=", line)
+                search_result = re.search(r"\d+", match[0])
+                if search_result and match[1] in COLUMN_NAMES:
+                    columns[COLUMN_NAMES[match[1]]] = int(search_result[0])
+            elif not line.startswith("%%") and line:
+                attrs = line.split("\t")
+                sent.append([attrs[i] for i in columns.values()])
+                re.split(r"_", attrs[columns["norm"]])
+            elif line == "":
+                n_sents += 1
+                sent = []
+    return n_sents
+
+
+def read_reader(path: str) -> int:
+    """Parse a ddctabs file with DdcTabsReader, return the number of sentences"""
+    n_sents = 0
+    for sent in DdcTabsReader(path):
+        for norm in sent.columns["norm"]:
+            norm.split("_")
+        n_sents += 1
+    return n_sents
+
+
+def run(name: str, read: Callable[[str], int], files: List[str], repeat: int) -> float:
+    n_bytes = sum(os.path.getsize(f) for f in files) * repeat
+    n_sents = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for f in files:
+            n_sents += read(f)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<10} {elapsed:8.3f} s  {n_bytes / elapsed / 1e6:8.2f} MB/s  {n_sents / elapsed:10.0f} sents/s"
+    )
+    return elapsed
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Throughput benchmark for the ddctabs reader."
+    )
+
+    parser.add_argument(
+        "--data",
+        default="tests/testdata/dtak/ddctabs/*",
+        help="Path to a ddctabs file or directory, or a glob path (default: the test data).",
+    )
+
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=50,
+        help="Number of times each file is read (default: 50).",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    args = parse_arguments(arguments)
+    files = sorted(filename_gen(args.data))
+    if not files:
+        raise ValueError(f"No files found: '{args.data}'")
+    t_baseline = run("baseline", read_baseline, files, args.repeat)
+    t_reader = run("reader", read_reader, files, args.repeat)
+    print(f"Speed-up: {t_baseline / t_reader:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark for concurrent LanguageTool requests
+
+Sends sentences to `StubLanguageToolServer`s with a fixed per-request latency: one at a time with `LanguageTool.correct` (like `LanguageToolModifier.modify_sample`), with the `LanguageToolClient` with multiple servers and threads, and with the client packing many sentences into one request. Checks that all produce the same output.
+
+Example call:
+python3 benchmarks/langtool_benchmark.py --sentences 2000 --servers 4 --threads 16 --max-chars 10000 --latency 0.005
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional
+
+from language_tool_python import LanguageTool
+
+from transnormer_data.langtool import LanguageToolClient, StubLanguageToolServer
+
+RULES = {"OLD_SPELLING": {"daß": "dass", "muß": "muss", "läßt": "lässt"}}
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark for concurrent LanguageTool requests."
+    )
+    parser.add_argument(
+        "--sentences",
+        type=int,
+        default=2000,
+        help="Number of sentences (default: 2000).",
+    )
+    parser.add_argument(
+        "--servers",
+        type=int,
+        default=4,
+        help="Number of stub servers for the concurrent client (default: 4).",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=16,
+        help="Number of client threads (default: 16).",
+    )
+    parser.add_argument(
+        "--max-chars",
+        type=int,
+        default=10000,
+        help="Maximal number of characters per packed request (default: 10000).",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.005,
+        help="Processing time of the stub server per request in seconds (default: 0.005).",
+    )
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    args = parse_arguments(arguments)
+    rng = random.Random(0)
+    words = ["daß", "muß", "läßt", "er", "sie", "es", "nicht", "immer", "so"]
+    sents = [
+        " ".join(rng.choices(words, k=rng.randint(5, 30))) + "."
+        for _ in range(args.sentences)
+    ]
+    servers = [
+        StubLanguageToolServer(RULES, latency=args.latency).start()
+        for _ in range(args.servers)
+    ]
+    urls = [server.url for server in servers]
+
+    langtool = LanguageTool(language="de-DE", remote_server=urls[0])
+    langtool.enabled_rules = set(RULES)
+    langtool.enabled_rules_only = True
+    start = time.perf_counter()
+    expected = [langtool.correct(sent) for sent in sents]
+    t_sequential = time.perf_counter() - start
+    print(
+        f"sequential  {t_sequential:8.3f} s  {len(sents) / t_sequential:8.0f} sents/s"
+    )
+
+    params = {
+        "language": "de-DE",
+        "enabledRules": ",".join(RULES),
+        "enabledOnly": "true",
+    }
+    client = LanguageToolClient(urls, params, num_threads=args.threads)
+    start = time.perf_counter()
+    actual = client.correct_many(sents)
+    t_concurrent = time.perf_counter() - start
+    print(
+        f"concurrent  {t_concurrent:8.3f} s  {len(sents) / t_concurrent:8.0f} sents/s"
+    )
+    client.close()
+    assert actual == expected
+    print(f"Speed-up: {t_sequential / t_concurrent:.2f}x")
+
+    client = LanguageToolClient(
+        urls, params, num_threads=args.threads, max_chars=args.max_chars
+    )
+    start = time.perf_counter()
+    actual = client.correct_many(sents)
+    t_packed = time.perf_counter() - start
+    print(f"packed      {t_packed:8.3f} s  {len(sents) / t_packed:8.0f} sents/s")
+    client.close()
+    assert actual == expected
+    print(f"Speed-up: {t_sequential / t_packed:.2f}x")
+
+    for server in servers:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""
+Startup and lookup benchmark for compiled replacement lexicons
+
+Writes a synthetic 1:1 mapping file with `--entries` entries, then compares loading it with `ReplaceToken1to1Modifier._load_replacement_mapping` (CSV sniffing and parsing into a dict) with opening the compiled lexicon, and the lookup speed of both on a Zipf-distributed token stream.
+
+Example call:
+python3 benchmarks/lexicon_benchmark.py --entries 2000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List, Optional
+
+from transnormer_data.lexicon import (
+    CompiledLexicon,
+    compile_lexicon,
+    validate_mapping_files,
+)
+from transnormer_data.modifier.replace_token_1to1_modifier import (
+    ReplaceToken1to1Modifier,
+)
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Startup and lookup benchmark for compiled replacement lexicons."
+    )
+    parser.add_argument(
+        "--entries",
+        type=int,
+        default=2000000,
+        help="Number of entries in the mapping (default: 2000000).",
+    )
+    parser.add_argument(
+        "--lookups",
+        type=int,
+        default=1000000,
+        help="Number of token lookups (default: 1000000).",
+    )
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    args = parse_arguments(arguments)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path_tsv = os.path.join(tmpdir, "mapping.tsv")
+        path_lex = os.path.join(tmpdir, "mapping.tnlex")
+        with open(path_tsv, "w", encoding="utf-8") as f:
+            for i in range(args.entries):
+                f.write(f"tok{i}\tTok{i}\n")
+
+        start = time.perf_counter()
+        mapping, errors, _ = validate_mapping_files([path_tsv], "1to1", "\t")
+        assert not errors
+        compile_lexicon(mapping, path_lex, "1to1")
+        print(f"compile      {time.perf_counter() - start:8.3f} s (once)")
+        del mapping
+
+        modifier = ReplaceToken1to1Modifier()
+        start = time.perf_counter()
+        type_mapping = modifier._load_replacement_mapping([path_tsv])
+        print(f"load text    {time.perf_counter() - start:8.3f} s")
+        start = time.perf_counter()
+        lexicon = CompiledLexicon(path_lex)
+        print(f"open binary  {time.perf_counter() - start:8.3f} s")
+
+        tokens = [
+            f"tok{min(int(rng.paretovariate(1.0)) - 1, args.entries * 2)}"
+            for _ in range(args.lookups)
+        ]
+        for name, m in [("dict", type_mapping), ("lexicon", lexicon)]:
+            start = time.perf_counter()
+            for t in tokens:
+                m.get(t)
+            elapsed = time.perf_counter() - start
+            print(
+                f"lookup {name:<8} {elapsed:8.3f} s  {len(tokens) / elapsed:10.0f} lookups/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
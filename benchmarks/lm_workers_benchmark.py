@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark for scoring sentences with the LMScorer in worker processes
+
+Scores the same sentences in one process with all cores as PyTorch threads and with every split of the cores into `num_workers` processes with `threads_per_worker` threads each. Prints the throughput of each split and checks that the scores are the same as in one process.
+
+Example call:
+python3 benchmarks/lm_workers_benchmark.py --model dbmdz/german-gpt2 --sentences 2000 --cores 16 --batch-size 16
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from transnormer_data.modifier.lm_score_modifier import LMScorer
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark for scoring sentences with the LMScorer in worker processes."
+    )
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="dbmdz/german-gpt2",
+        help="Name of the huggingface language model (default: 'dbmdz/german-gpt2').",
+    )
+    parser.add_argument(
+        "--sentences",
+        type=int,
+        default=2000,
+        help="Number of sentences (default: 2000).",
+    )
+    parser.add_argument(
+        "--cores",
+        type=int,
+        default=4,
+        help="Number of cores that are split between workers and threads (default: 4).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=16,
+        help="Number of sentences per batch (default: 16).",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="eager",
+        help="Inference backend of the LMScorer (default: 'eager').",
+    )
+    return parser.parse_args(arguments)
+
+
+def splits(cores: int) -> List[Tuple[int, int]]:
+    """All (num_workers, threads_per_worker) pairs with at least two workers and num_workers * threads_per_worker == cores"""
+    return [(w, cores // w) for w in range(2, cores + 1) if cores % w == 0]
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    args = parse_arguments(arguments)
+    rng = random.Random(0)
+    words = ["daß", "muß", "er", "sie", "es", "nicht", "immer", "so", "Haus", "gehen"]
+    sents = [
+        " ".join(rng.choices(words, k=rng.randint(3, 40))) + "."
+        for _ in range(args.sentences)
+    ]
+
+    scorer = LMScorer(
+        args.model,
+        batch_size=args.batch_size,
+        backend=args.backend,
+        num_threads=args.cores,
+    )
+    start = time.perf_counter()
+    expected = np.array(scorer.predict_logprobs_batch(sents))
+    t_reference = time.perf_counter() - start
+    print(
+        f"workers  1  threads {args.cores:2d}  in-process  {t_reference:8.3f} s  {len(sents) / t_reference:8.1f} sents/s"
+    )
+
+    for num_workers, threads_per_worker in splits(args.cores):
+        scorer = LMScorer(
+            args.model,
+            batch_size=args.batch_size,
+            backend=args.backend,
+            num_workers=num_workers,
+            threads_per_worker=threads_per_worker,
+        )
+        # Start the workers before the clock
+        scorer.predict_logprobs_batch(sents[:1])
+        start = time.perf_counter()
+        actual = np.array(scorer.predict_logprobs_batch(sents))
+        t_split = time.perf_counter() - start
+        scorer.close()
+        print(
+            f"workers {num_workers:2d}  threads {threads_per_worker:2d}  "
+            f"{t_split:20.3f} s  {len(sents) / t_split:8.1f} sents/s  "
+            f"speed-up {t_reference / t_split:5.2f}x"
+        )
+        assert np.allclose(actual, expected, atol=1e-4)
+
+
+if __name__ == "__main__":
+    main()
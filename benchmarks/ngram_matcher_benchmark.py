@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark for the n-gram search of the ReplaceNtoMCrossLayerModifier
+
+Compares the brute-force search `ReplaceNtoMCrossLayerModifier._find_ngram_indices` (which slices every n-gram length out of every sentence and looks it up in a set) with the Aho-Corasick automaton `NgramMatcher`, on a synthetic mapping with n-grams of length 1 to `--max-length`.
+
+Example call:
+python3 benchmarks/ngram_matcher_benchmark.py --entries 100000 --max-length 6 --sentences 5000
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional
+
+from transnormer_data.modifier.replace_ntom_cross_layer_modifier import (
+    ReplaceNtoMCrossLayerModifier,
+)
+from transnormer_data.ngram_matcher import NgramMatcher
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark for the n-gram search of the ReplaceNtoMCrossLayerModifier."
+    )
+    parser.add_argument(
+        "--entries",
+        type=int,
+        default=100000,
+        help="Number of n-grams in the mapping (default: 100000).",
+    )
+    parser.add_argument(
+        "--max-length",
+        type=int,
+        default=6,
+        help="Maximal length of the n-grams in the mapping (default: 6).",
+    )
+    parser.add_argument(
+        "--sentences",
+        type=int,
+        default=5000,
+        help="Number of sentences to search (default: 5000).",
+    )
+    parser.add_argument(
+        "--vocab-size",
+        type=int,
+        default=2000,
+        help="Number of token types (default: 2000).",
+    )
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    args = parse_arguments(arguments)
+    rng = random.Random(0)
+    vocab = [f"t{i}" for i in range(args.vocab_size)]
+    ngrams = {
+        tuple(rng.choices(vocab, k=rng.randint(1, args.max_length)))
+        for _ in range(args.entries)
+    }
+    sents = [rng.choices(vocab, k=rng.randint(5, 40)) for _ in range(args.sentences)]
+
+    modifier = ReplaceNtoMCrossLayerModifier()
+    lengths = modifier.get_ngram_lengths({ngram: ngram for ngram in ngrams})
+
+    start = time.perf_counter()
+    matcher = NgramMatcher(ngrams)
+    print(
+        f"Built automaton for {len(matcher)} n-grams in {time.perf_counter() - start:.3f} s"
+    )
+
+    start = time.perf_counter()
+    # The modifier used to rebuild the set of keys for every sentence
+    expected = [modifier._find_ngram_indices(set(ngrams), s, lengths) for s in sents]
+    t_baseline = time.perf_counter() - start
+    print(f"baseline   {t_baseline:8.3f} s  {len(sents) / t_baseline:10.0f} sents/s")
+
+    start = time.perf_counter()
+    actual = [matcher.find_all(s) for s in sents]
+    t_matcher = time.perf_counter() - start
+    print(f"matcher    {t_matcher:8.3f} s  {len(sents) / t_matcher:10.0f} sents/s")
+
+    assert actual == expected
+    print(f"Speed-up: {t_baseline / t_matcher:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
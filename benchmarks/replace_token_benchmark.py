@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark for the per-record and the type-level mode of the ReplaceToken1to1Modifier
+
+Runs `modify_dataset` with `type_level=False` (`modify_sample` on every record) and `type_level=True` (columnar `modify_batch`) on a synthetic dataset with Zipf-distributed tokens and checks that both produce the same output.
+
+Example call:
+python3 benchmarks/replace_token_benchmark.py --sentences 100000 --vocab-size 50000 --entries 5000
+"""
+
+import argparse
+import itertools
+import random
+import time
+from typing import List, Optional
+
+import datasets
+
+from transnormer_data.modifier.replace_token_1to1_modifier import (
+    ReplaceToken1to1Modifier,
+)
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark for the per-record and the type-level mode of the ReplaceToken1to1Modifier."
+    )
+    parser.add_argument(
+        "--sentences",
+        type=int,
+        default=100000,
+        help="Number of sentences in the dataset (default: 100000).",
+    )
+    parser.add_argument(
+        "--vocab-size",
+        type=int,
+        default=50000,
+        help="Number of token types (default: 50000).",
+    )
+    parser.add_argument(
+        "--entries",
+        type=int,
+        default=5000,
+        help="Number of types in the mapping (default: 5000).",
+    )
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> None:
+    args = parse_arguments(arguments)
+    datasets.disable_progress_bars()
+    rng = random.Random(0)
+    vocab = [f"t{i}" for i in range(args.vocab_size)]
+    cum_weights = list(
+        itertools.accumulate(1 / (rank + 1) for rank in range(args.vocab_size))
+    )
+    mapping = {t: t.upper() for t in rng.sample(vocab, args.entries)}
+
+    records = []
+    for _ in range(args.sentences):
+        tokens = rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(5, 40))
+        ws = [False] + [True] * (len(tokens) - 1)
+        records.append({"norm": " ".join(tokens), "norm_tok": tokens, "norm_ws": ws})
+    modifier = ReplaceToken1to1Modifier()
+    for record in records:
+        record["norm_spans"] = modifier._get_token_spans(
+            record["norm_tok"], record["norm_ws"]
+        )
+    dataset = datasets.Dataset.from_list(records)
+
+    results = []
+    for type_level in [False, True]:
+        modifier = ReplaceToken1to1Modifier(type_level=type_level)
+        modifier.type_mapping = mapping
+        start = time.perf_counter()
+        results.append(modifier.modify_dataset(dataset))
+        elapsed = time.perf_counter() - start
+        print(
+            f"type_level={type_level!s:5}  {elapsed:8.3f} s  {len(dataset) / elapsed:10.0f} sents/s"
+        )
+
+    assert results[0].to_list() == results[1].to_list()
+
+
+if __name__ == "__main__":
+    main()
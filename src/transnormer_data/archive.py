@@ -0,0 +1,110 @@
+import glob
+import io
+import os
+import tarfile
+import zipfile
+from typing import IO, BinaryIO, Dict, Iterator, NamedTuple, Optional, Tuple, Union
+
+ARCHIVE_EXTENSIONS = (
+    ".tar",
+    ".tar.gz",
+    ".tgz",
+    ".tar.bz2",
+    ".tar.xz",
+    ".zip",
+)
+
+
+class ArchiveMember(NamedTuple):
+    """A file inside of an archive
+
+    `data` holds the member's content if it has already been read from the archive (e.g. from a compressed tar archive, which can only be read sequentially). Otherwise the member is read from the archive when it is opened.
+    """
+
+    archive: str
+    name: str
+    data: Optional[bytes] = None
+
+
+# A document that is processed by a maker: path to a file or archive member
+Document = Union[str, ArchiveMember]
+
+# Open zip files of this process, (pid, path) -> ZipFile
+_zipfiles: Dict[Tuple[int, str], zipfile.ZipFile] = {}
+
+
+def is_archive(path: Union[str, os.PathLike]) -> bool:
+    """Is `path` a tar or zip archive (judging by its file extension)"""
+    return os.path.isfile(path) and str(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_documents(path: Union[str, os.PathLike]) -> Iterator[Document]:
+    """Yield the documents from a directory or an archive
+
+    - Directory: paths of all files in the directory, sorted by name
+    - Zip archive: all file members, sorted by name. Their content is not read yet, so that members can be read and decompressed in parallel by different processes.
+    - Tar archive (optionally compressed): all file members in archive order. Members are read one after another in a single pass over the archive (streaming mode), so their content is attached to the yielded `ArchiveMember`.
+
+    No files are extracted to disk.
+    """
+    if not is_archive(path):
+        yield from sorted(glob.iglob(os.path.join(path, "*"), recursive=True))
+    elif str(path).lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            names = sorted(info.filename for info in zf.infolist() if not info.is_dir())
+        for name in names:
+            yield ArchiveMember(str(path), name)
+    else:
+        with tarfile.open(path, mode="r|*") as tf:
+            for info in tf:
+                if not info.isfile():
+                    continue
+                fileobj = tf.extractfile(info)
+                assert fileobj is not None
+                yield ArchiveMember(str(path), info.name, fileobj.read())
+
+
+def open_document(
+    document: Document, encoding: Optional[str] = None, buffer_size: int = 1 << 20
+) -> IO:
+    """Open a document for reading, in text mode if an `encoding` is given, else in binary mode
+
+    Archive members are read from memory (if their content is attached) or directly from the archive. Zip archives are opened once per process and then kept open, so that reading many members does not parse the archive's directory over and over again; they are closed with `close_archives`.
+    """
+    if not isinstance(document, ArchiveMember):
+        if encoding is None:
+            return open(document, "rb", buffering=buffer_size)
+        return open(document, "r", encoding=encoding, buffering=buffer_size)
+    fileobj: BinaryIO
+    if document.data is not None:
+        fileobj = io.BytesIO(document.data)
+    elif document.archive.lower().endswith(".zip"):
+        key = (os.getpid(), document.archive)
+        if key not in _zipfiles:
+            _zipfiles[key] = zipfile.ZipFile(document.archive)
+        fileobj = _zipfiles[key].open(document.name)  # type: ignore
+    else:
+        with tarfile.open(document.archive) as tf:
+            member = tf.extractfile(document.name)
+            assert member is not None
+            fileobj = io.BytesIO(member.read())
+    if encoding is None:
+        return fileobj
+    return io.TextIOWrapper(fileobj, encoding=encoding)
+
+
+def close_archives() -> None:
+    """Close the zip archives that have been kept open by `open_document`
+
+    Archives that are needed again afterwards are re-opened. Archives that were inherited from a forked parent process are also closed (in this process only).
+    """
+    while _zipfiles:
+        _, zf = _zipfiles.popitem()
+        zf.close()
+
+
+def document_name(document: Document) -> str:
+    """File path or member name of a document"""
+    if isinstance(document, ArchiveMember):
+        return document.name
+    return document
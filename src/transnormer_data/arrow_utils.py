@@ -0,0 +1,94 @@
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def dictionary_encode_tokens(
+    column: pa.ChunkedArray | pa.ListArray,
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Dictionary-encode a column of token lists (type `list<string>`)
+
+    Returns a tuple `(types, type_ids, row_ids)`: `types` are the distinct tokens of the column, `type_ids[i]` is the index into `types` of the i-th token of the flattened column and `row_ids[i]` is the row that the i-th token belongs to.
+
+    Example:
+
+    >>> dictionary_encode_tokens(pa.array([["daß", "es"], [], ["es", "muß"]]))
+    (['daß', 'es', 'muß'], array([0, 1, 1, 2]), array([0, 0, 2, 2]))
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    encoded = pc.dictionary_encode(pc.list_flatten(column))
+    types: List[str] = encoded.dictionary.to_pylist()
+    type_ids = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+    row_ids = pc.list_parent_indices(column).to_numpy(zero_copy_only=False)
+    return types, type_ids, row_ids.astype(np.int64)
+
+
+def rows_with_types(
+    row_ids: np.ndarray, type_ids: np.ndarray, selected_types: np.ndarray
+) -> np.ndarray:
+    """Return the sorted indices of the rows that contain at least one token whose type is selected in the boolean array `selected_types`"""
+    return np.unique(row_ids[selected_types[type_ids]])
+
+
+def replace_rows(
+    table: pa.Table, rows: Sequence[int], modify_row: Callable[[int, Dict], Dict]
+) -> pa.Table:
+    """Rebuild only the given `rows` of `table` with `modify_row(row_index, record)` and keep all other rows as they are
+
+    The rebuilt records must fit the schema of `table`. The order of the rows is preserved.
+    """
+    if len(rows) == 0:
+        return table
+    modified = [
+        modify_row(row, record)
+        for row, record in zip(rows, table.take(pa.array(rows)).to_pylist())
+    ]
+    return put_rows(table, rows, pa.Table.from_pylist(modified, schema=table.schema))
+
+
+def put_rows(table: pa.Table, rows: Sequence[int], new_rows: pa.Table) -> pa.Table:
+    """Return a copy of `table` in which the given `rows` are replaced by the rows of `new_rows` (same schema, same order as `rows`)"""
+    if len(rows) == 0:
+        return table
+    # Unchanged rows point to the original table, replaced rows to the appended ones
+    indices = np.arange(len(table), dtype=np.int64)
+    indices[np.asarray(rows)] = np.arange(len(table), len(table) + len(rows))
+    return pa.concat_tables([table, new_rows]).take(pa.array(indices))
+
+
+def list_offsets(column: pa.ListArray) -> np.ndarray:
+    """Offsets of the lists in `column` into the flattened column (`pc.list_flatten`), starting at 0; null lists count as empty"""
+    lengths = pc.list_value_length(column).fill_null(0).to_numpy(zero_copy_only=False)
+    return np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+
+def join_tokens(
+    offsets: np.ndarray, tokens: pa.StringArray, whitespaces: pa.BooleanArray
+) -> pa.StringArray:
+    """Vectorized `BaseDatasetModifier._tok2raw`: join the flattened `tokens` of each list (delimited by `offsets`) into a string and put a space in front of every token whose whitespace flag is True"""
+    prefixed = pc.if_else(
+        whitespaces, pc.binary_join_element_wise(" ", tokens, ""), tokens
+    )
+    lists = pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), prefixed)
+    return pc.binary_join(lists, "")
+
+
+def token_spans(
+    offsets: np.ndarray, tokens: pa.StringArray, whitespaces: pa.BooleanArray
+) -> pa.ListArray:
+    """Vectorized `BaseDatasetModifier._get_token_spans`: character spans `[start, end]` of the flattened `tokens` in the strings of `join_tokens`, computed with cumulative sums over token lengths and whitespace flags"""
+    lengths = pc.utf8_length(tokens).to_numpy(zero_copy_only=False).astype(np.int64)
+    ws = whitespaces.to_numpy(zero_copy_only=False).astype(np.int64)
+    cumsum = np.concatenate([[0], np.cumsum(lengths + ws)])
+    # Subtract the sum over all previous lists from each token's end
+    list_lengths = np.diff(offsets)
+    ends = cumsum[1:] - np.repeat(cumsum[offsets[:-1]], list_lengths)
+    starts = ends - lengths
+    pairs = pa.ListArray.from_arrays(
+        pa.array(np.arange(0, 2 * len(starts) + 1, 2), pa.int32()),
+        pa.array(np.stack([starts, ends], axis=1).ravel()),
+    )
+    return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pairs)
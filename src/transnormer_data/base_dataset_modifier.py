@@ -1,6 +1,6 @@
 import os
 from abc import abstractmethod
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import datasets
 import spacy
@@ -140,8 +140,10 @@ class BaseDatasetModifier:
         self,
         dataset: datasets.Dataset,
         save_to: Optional[Union[str, os.PathLike]] = None,
+        num_proc: Optional[int] = None,
     ) -> Union[datasets.Dataset, None]:
-        dataset = dataset.map(self.modify_sample)
+        """Apply `modify_sample` to every record of the dataset, optionally in `num_proc` processes (see `datasets.Dataset.map`)"""
+        dataset = self._map_dataset(dataset, num_proc=num_proc)
         if save_to:
             if not os.path.isdir(save_to):
                 os.makedirs(save_to)
@@ -150,6 +152,24 @@ class BaseDatasetModifier:
             )
         return dataset
 
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        """Apply the modification to every record of the dataset; subclasses may override this to process whole batches at once"""
+        return dataset.map(self.modify_sample, num_proc=num_proc)
+
+    def input_fields(self) -> Optional[List[str]]:
+        """Names of the properties that the output of `modify_sample` depends on, or None if the modifier does not declare them; modifiers that declare their input and output fields can be memoized (see `MemoizedModifier`)"""
+        return None
+
+    def output_fields(self) -> Optional[List[str]]:
+        """Names of the properties that `modify_sample` sets, or None if the modifier does not declare them"""
+        return None
+
+    def fingerprint(self) -> List[Any]:
+        """JSON-serializable description of the configuration that the output of the modifier depends on besides its input fields (e.g. a hash of its mapping files)"""
+        return []
+
     def get_idx2idxs(
         self, alignment: List[List[int | None]]
     ) -> Dict[int | None, List[int | None]]:
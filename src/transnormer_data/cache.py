@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Number of keys per SELECT ... IN (...) query, below SQLite's limit of host parameters
+_QUERY_CHUNK_SIZE = 500
+
+# Number of pending access times after which they are written without waiting for the next write
+_TOUCH_FLUSH_SIZE = 10000
+
+_TABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def cache_key(*parts: Any) -> str:
+    """SHA-256 hex digest of the JSON-serializable `parts`
+
+    Since the parts are serialized as a JSON list, the key is unambiguous, e.g. `cache_key("ab", "c") != cache_key("a", "bc")`.
+    """
+    serialized = json.dumps(parts, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def file_digest(paths: Iterable[str]) -> str:
+    """SHA-256 hex digest of the contents of the files at `paths`, in the given order"""
+    digest = hashlib.sha256()
+    for path in paths:
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(block)
+        digest.update(file_hash.digest())
+    return digest.hexdigest()
+
+
+class SqliteCache(object):
+    """Persistent key-value cache in an SQLite database that can be shared by several threads and processes
+
+    Values must be JSON-serializable and are returned as deserialized JSON (e.g. tuples come back as lists). The database is opened in write-ahead-log mode, so that readers do not block the writer, and every thread of every process uses its own connection; concurrent writers wait for each other up to `timeout` seconds. A cache object can be pickled (e.g. as part of a modifier that is passed to `datasets.Dataset.map` with `num_proc > 1`), the connections are then reopened in the new process.
+
+    Several caches can share one database file under different `table` names.
+
+    If `max_entries` is given, the least recently used entries are evicted whenever a write makes the table grow beyond `max_entries` entries. Reads and writes record the time of access for this; the order is by wall-clock time, so it is shared by all processes that use the cache. Reads do not write to the database: their access times are kept in memory and written in the transaction of the next `set_many` of the same process (or by `flush`, `close` or when more than `_TOUCH_FLUSH_SIZE` are pending), so concurrent readers do not wait for the write lock. Until then, an entry that was only read may be evicted by another process.
+
+    Example:
+
+    >>> cache = SqliteCache("cache.sqlite")
+    >>> key = cache_key("daß", "OLD_SPELLING")
+    >>> cache.set(key, "dass")
+    >>> cache.get(key)
+    'dass'
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "cache",
+        timeout: float = 60.0,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        if not _TABLE_NAME.match(table):
+            raise ValueError(f"Invalid table name: '{table}'")
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be a positive integer")
+        self.path = path
+        self.table = table
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._local = threading.local()
+        # Access times of the entries read since the last write, see `_touch`
+        self._touched: Dict[str, float] = {}
+        # Create the table now, so that errors (e.g. a wrong path) surface early
+        self._connection()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_local"]
+        state["_touched"] = {}
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the current thread in the current process"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "accessed REAL NOT NULL DEFAULT 0)"
+            )
+            # Tables of older versions have no access times
+            columns = [
+                row[1] for row in connection.execute(f"PRAGMA table_info({self.table})")
+            ]
+            if "accessed" not in columns:
+                connection.execute(
+                    f"ALTER TABLE {self.table} "
+                    "ADD COLUMN accessed REAL NOT NULL DEFAULT 0"
+                )
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed "
+                f"ON {self.table} (accessed)"
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for `key` or None if it is not cached"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return a dictionary with the values of all `keys` that are cached"""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        connection = self._connection()
+        for i in range(0, len(keys), _QUERY_CHUNK_SIZE):
+            chunk = keys[i : i + _QUERY_CHUNK_SIZE]  # noqa: E203
+            placeholders = ",".join("?" * len(chunk))
+            rows = connection.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})",
+                chunk,
+            )
+            found.update((key, json.loads(value)) for key, value in rows)
+        if self.max_entries is not None and found:
+            self._touch(found)
+        return found
+
+    def _touch(self, keys: Iterable[str]) -> None:
+        """Record now as the access time of `keys`; the times are written with the next write (see `_write_touched`)"""
+        now = time.time()
+        self._touched.update((key, now) for key in keys)
+        if len(self._touched) > _TOUCH_FLUSH_SIZE:
+            self.flush()
+
+    def _write_touched(self, connection: sqlite3.Connection) -> None:
+        """Write the pending access times within the current transaction of `connection`"""
+        touched, self._touched = self._touched, {}
+        connection.executemany(
+            f"UPDATE {self.table} SET accessed = MAX(accessed, ?) WHERE key = ?",
+            [(accessed, key) for key, accessed in touched.items()],
+        )
+
+    def flush(self) -> None:
+        """Write the pending access times of entries that were read (see `max_entries`)"""
+        if not self._touched:
+            return
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            self._write_touched(connection)
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store all `(key, value)` pairs in one transaction, existing values are overwritten"""
+        now = time.time()
+        rows: List[Tuple[str, str, float]] = [
+            (key, json.dumps(value, ensure_ascii=False), now) for key, value in items
+        ]
+        if not rows:
+            return
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if self._touched:
+                self._write_touched(connection)
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, accessed) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            if self.max_entries is not None:
+                self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """Delete the least recently used entries beyond `max_entries`"""
+        assert self.max_entries is not None
+        size = connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if size > self.max_entries:
+            connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed LIMIT ?)",
+                (size - self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        return (
+            self._connection()
+            .execute(f"SELECT COUNT(*) FROM {self.table}")
+            .fetchone()[0]
+        )
+
+    def close(self) -> None:
+        """Write the pending access times and close the connection of the current thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self.flush()
+            connection.close()
+            self._local.connection = None
+
+
+class MemoryCache(object):
+    """In-memory cache with the interface of `SqliteCache`
+
+    The entries are neither persisted nor shared between processes. With `max_entries`, the least recently used entries are evicted. Values are stored as they are, not serialized.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be a positive integer")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the value for `key` or None if it is not cached"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return a dictionary with the values of all `keys` that are cached"""
+        found: Dict[str, Any] = {}
+        for key in keys:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                found[key] = self._entries[key]
+        return found
+
+    def set(self, key: str, value: Any) -> None:
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Store all `(key, value)` pairs, existing values are overwritten"""
+        for key, value in items:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+        if self.max_entries is not None:
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,103 @@
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+from transnormer_data.lexicon import (
+    LEXICON_EXTENSION,
+    LEXICON_KINDS,
+    compile_lexicon,
+    validate_mapping_files,
+)
+
+# Number of problems that are printed per category
+MAX_PRINTED = 50
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Validates replacement mapping files (TSV/CSV) and compiles them into a binary lexicon that the replacement modifiers can memory-map."
+    )
+
+    parser.add_argument(
+        "files",
+        nargs="+",
+        help="Path(s) to the mapping file(s). Files are read in the given order.",
+    )
+
+    parser.add_argument(
+        "-k",
+        "--kind",
+        choices=LEXICON_KINDS,
+        required=True,
+        help="Kind of lexicon: '1to1' for ReplaceToken1to1Modifier, '1ton' for ReplaceToken1toNModifier, 'ntom' for ReplaceNtoMCrossLayerModifier.",
+    )
+
+    parser.add_argument(
+        "-o",
+        "--out",
+        type=str,
+        help=f"Path to the output file (extension: '{LEXICON_EXTENSION}'). If not given, the files are only validated.",
+    )
+
+    parser.add_argument(
+        "-d",
+        "--delimiters",
+        type=str,
+        default=None,
+        help="Possible delimiters of the mapping files, passed to the CSV sniffer. Pass '{TAB}' for the TAB character (default: sniff any delimiter).",
+    )
+
+    parser.add_argument(
+        "--on-conflict",
+        choices=["error", "first", "last"],
+        default="error",
+        help="What to do if a source is mapped to different targets: fail (default), keep the first or keep the last mapping. Note: the modifiers keep the last mapping when they read text files.",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    args = parse_arguments(arguments)
+    if args.out is not None and not args.out.endswith(LEXICON_EXTENSION):
+        raise ValueError(f"Output file must have the extension '{LEXICON_EXTENSION}'")
+    delimiters = "\t" if args.delimiters == "{TAB}" else args.delimiters
+
+    start = time.perf_counter()
+    mapping, errors, warnings = validate_mapping_files(
+        args.files, args.kind, delimiters=delimiters, on_conflict=args.on_conflict
+    )
+    for category, problems in [("Warning", warnings), ("Error", errors)]:
+        for problem in problems[:MAX_PRINTED]:
+            print(f"{category}: {problem}", file=sys.stderr)
+        if len(problems) > MAX_PRINTED:
+            print(
+                f"{category}: ... {len(problems) - MAX_PRINTED} more",
+                file=sys.stderr,
+            )
+    print(
+        f"{len(mapping)} entries, {len(errors)} errors, {len(warnings)} warnings",
+        file=sys.stderr,
+    )
+    if errors:
+        return 1
+
+    if args.out is not None:
+        compile_lexicon(
+            mapping, args.out, args.kind, info={"source_files": list(args.files)}
+        )
+        print(
+            f"Wrote {args.out} in {time.perf_counter() - start:.2f} s",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    """
+    Example call:
+
+    python3 src/transnormer_data/cli/compile_lexicon.py --kind 1to1 -o old2new.tnlex tests/testdata/type-replacements/old2new.tsv
+    """
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from transnormer_data import utils
+from transnormer_data.modifier.language_detection_modifier import (
+    LanguageIdentificationEnsemble,
+    cascade_report,
+)
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Runs the whole language identification ensemble on a sample of sentences and reports how often the cascade mode of the LanguageDetectionModifier (see `cascade_threshold`) stops after fastText and how well its output agrees with the ensemble, for several thresholds."
+    )
+
+    parser.add_argument(
+        "--data",
+        type=str,
+        required=True,
+        help="Path to the input data file or directory (JSONL).",
+    )
+
+    parser.add_argument(
+        "--layer",
+        type=str,
+        default="orig",
+        help="Property that holds the raw sentence (default: 'orig').",
+    )
+
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=10000,
+        help="Number of randomly sampled sentences (default: 10000).",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed for the sample (default: 42).",
+    )
+
+    parser.add_argument(
+        "--thresholds",
+        type=str,
+        default="0.5,0.7,0.8,0.9,0.95,0.99",
+        help="Comma-separated thresholds for fastText's probability (default: '0.5,0.7,0.8,0.9,0.95,0.99').",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    args = parse_arguments(arguments)
+    texts = utils.sample_sentences(args.data, args.layer, args.sample, args.seed)
+    thresholds = [float(t) for t in args.thresholds.split(",")]
+    report = cascade_report(LanguageIdentificationEnsemble(), texts, thresholds)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    """
+    Example call:
+
+    python3 src/transnormer_data/cli/langdetect_cascade_report.py --data tests/testdata/jsonl/dtak --sample 5000 --thresholds 0.8,0.9,0.95
+    """
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from language_tool_python import LanguageTool
+
+from transnormer_data import utils
+from transnormer_data.langtool import (
+    LANGTOOL_VERSION,
+    LanguageToolClient,
+    TriggerIndex,
+    langtool_params,
+    load_rules,
+    prefilter_report,
+    server_url,
+)
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Runs LanguageTool without prefilter on a sample of sentences and reports the recall of a trigger index (see LanguageToolModifier's `trigger_index`). Can also learn a trigger index from the matches of the run."
+    )
+
+    parser.add_argument(
+        "--data",
+        type=str,
+        required=True,
+        help="Path to the input data file or directory (JSONL).",
+    )
+
+    parser.add_argument(
+        "--rule-file",
+        type=str,
+        required=True,
+        help="Path to the file with the LanguageTool rule IDs, one per line.",
+    )
+
+    parser.add_argument(
+        "--layer",
+        type=str,
+        default="norm",
+        help="Property that holds the raw sentence (default: 'norm').",
+    )
+
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=10000,
+        help="Number of randomly sampled sentences (default: 10000).",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed for the sample (default: 42).",
+    )
+
+    parser.add_argument(
+        "--index",
+        type=str,
+        help="Path to a (curated) trigger index to evaluate. Learned triggers are added to it if --learn is passed.",
+    )
+
+    parser.add_argument(
+        "--learn",
+        type=str,
+        help="Path to the output file for a trigger index that is learned from the matches on the sample. The recall is then reported on the held-out part of the sample.",
+    )
+
+    parser.add_argument(
+        "--holdout",
+        type=float,
+        default=0.5,
+        help="Share of the sample that is held out for the report if --learn is passed (default: 0.5).",
+    )
+
+    parser.add_argument(
+        "--remote-servers",
+        type=str,
+        help="Comma-separated URLs of running LanguageTool servers (default: start a local server).",
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Number of concurrent requests (default: 4).",
+    )
+
+    parser.add_argument(
+        "--max-request-chars",
+        type=int,
+        default=10000,
+        help="Number of characters per packed request (default: 10000).",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    args = parse_arguments(arguments)
+    rules = load_rules(args.rule_file)
+    texts = utils.sample_sentences(args.data, args.layer, args.sample, args.seed)
+
+    langtool = None
+    if args.remote_servers:
+        urls = args.remote_servers.split(",")
+    else:
+        langtool = LanguageTool(
+            language="de-DE", language_tool_download_version=LANGTOOL_VERSION
+        )
+        urls = [server_url(langtool)]
+    client = LanguageToolClient(
+        urls,
+        langtool_params(rules),
+        num_threads=args.concurrency,
+        max_chars=args.max_request_chars,
+    )
+    matches = client.check_texts(texts)
+    client.close()
+    if langtool is not None:
+        langtool.close()
+
+    index = TriggerIndex.load(args.index) if args.index else TriggerIndex()
+    if args.learn:
+        n_train = int(len(texts) * (1 - args.holdout))
+        # Rules that never matched on the sample get no triggers, i.e. they stay candidates for every sentence
+        index.learn(texts[:n_train], matches[:n_train])
+        index.save(args.learn)
+        texts, matches = texts[n_train:], matches[n_train:]
+
+    report = prefilter_report(texts, matches, index, rules)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    """
+    Example call:
+
+    python3 src/transnormer_data/cli/langtool_prefilter.py --data tests/testdata/jsonl/dtak --rule-file tests/testdata/languagetool/rules.txt --sample 5000 --learn triggers.json
+    """
+    sys.exit(main())
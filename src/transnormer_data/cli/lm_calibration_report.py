@@ -0,0 +1,101 @@
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from transnormer_data import utils
+from transnormer_data.modifier.lm_score_modifier import BACKENDS, calibration_report
+
+
+def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Scores a sample of sentences with the inference backends of the LMScoreModifier and reports the correlation of the scores with the float32 reference and the throughput of each backend."
+    )
+
+    parser.add_argument(
+        "--data",
+        type=str,
+        required=True,
+        help="Path to the input data file or directory (JSONL).",
+    )
+
+    parser.add_argument(
+        "--layer",
+        type=str,
+        default="norm",
+        help="Property that holds the raw sentence (default: 'norm').",
+    )
+
+    parser.add_argument(
+        "--model",
+        type=str,
+        default="dbmdz/german-gpt2",
+        help="Name of the huggingface language model (default: 'dbmdz/german-gpt2').",
+    )
+
+    parser.add_argument(
+        "--backends",
+        type=str,
+        default=",".join(BACKENDS),
+        help=f"Comma-separated backends to compare (default: '{','.join(BACKENDS)}').",
+    )
+
+    parser.add_argument(
+        "--sample",
+        type=int,
+        default=2000,
+        help="Number of randomly sampled sentences (default: 2000).",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed for the sample (default: 42).",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Number of sentences per batch (default: 1).",
+    )
+
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        help="Maximum number of tokens per batch, including padding.",
+    )
+
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        help="Number of PyTorch intra-op threads (default: PyTorch's default).",
+    )
+
+    return parser.parse_args(arguments)
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    args = parse_arguments(arguments)
+    texts = utils.sample_sentences(args.data, args.layer, args.sample, args.seed)
+    report = calibration_report(
+        args.model,
+        texts,
+        backends=args.backends.split(","),
+        batch_size=args.batch_size,
+        max_tokens=args.max_tokens,
+        num_threads=args.num_threads,
+    )
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    """
+    Example call:
+
+    python3 src/transnormer_data/cli/lm_calibration_report.py --data tests/testdata/jsonl/dtak --backends eager,int8,torchscript --batch-size 16 --num-threads 8
+    """
+    sys.exit(main())
@@ -24,12 +24,12 @@ def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace
 
     parser.add_argument(
         "--data",
-        help="Path to the input data directory",
+        help="Path to the input data directory or to a .zip, .tar or .tar.gz archive of the input files",
     )
 
     parser.add_argument(
         "--metadata",
-        help="Path to the input metadata file",
+        help="Path to the input metadata file. The dtakmaker reads the metadata from the headers of the ddctabs files if this is not given.",
     )
 
     parser.add_argument(
@@ -38,6 +38,27 @@ def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace
         help="Path to the output directory",
     )
 
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Flag for writing records as they are parsed instead of creating a dataset first. Peak memory then depends on --batch-size, not on the size of the corpus. Currently only supported by the dtakmaker.",
+    )
+
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="Number of records that are modified and written together in streaming mode (default: 1000).",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes that create the documents in parallel (default: 1). Pass 0 to use one process per CPU.",
+    )
+
     return parser.parse_args(arguments)
 
 
@@ -56,11 +77,20 @@ def main(arguments: Optional[List[str]] = None) -> None:
     if plugin.lower() == "dtaevalmaker":
         from transnormer_data.maker.dta_eval_maker import DtaEvalMaker
 
-        maker: Any = DtaEvalMaker(input_dir_data, input_dir_metadata, output_dir)
+        maker: Any = DtaEvalMaker(
+            input_dir_data, input_dir_metadata, output_dir, jobs=args.jobs
+        )
     elif plugin.lower() == "dtakmaker":
         from transnormer_data.maker.dtak_maker import DtakMaker
 
-        maker = DtakMaker(input_dir_data, input_dir_metadata, output_dir)
+        maker = DtakMaker(
+            input_dir_data,
+            input_dir_metadata,
+            output_dir,
+            streaming=args.streaming,
+            batch_size=args.batch_size,
+            jobs=args.jobs,
+        )
     _ = maker.make(save=True)
 
 
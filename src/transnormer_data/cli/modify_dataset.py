@@ -11,6 +11,8 @@ import datasets
 
 from transnormer_data import utils
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.langtool import LANGTOOL_VERSION
+from transnormer_data.lexicon import SharedLexicon
 from transnormer_data.modifier import (
     replace_token_1to1_modifier,
     replace_token_1ton_modifier,
@@ -19,6 +21,7 @@ from transnormer_data.modifier import (
     language_tool_modifier,
     language_detection_modifier,
     lm_score_modifier,
+    memoized_modifier,
 )
 
 # Reset existing logging configuration
@@ -76,6 +79,31 @@ def parse_arguments(arguments: Optional[List[str]] = None) -> argparse.Namespace
         help="Set `merge_into_single_dataset` to True (default: False) when you have a small dataset. Per default we expect the DTAK dataset to be too large to put all incoming documents into a single dataset that is then processed as one. Instead we produce create and save individual dataset objects and run the processing separately on each one of them. Whether `merge_into_single_dataset` is True or False does not make a difference to the saved output files. This is also why, in the future, we might remove the option to merge all incoming files into a single dataset.",
     )
 
+    parser.add_argument(
+        "--num-proc",
+        type=int,
+        default=None,
+        help="Number of processes that modify a dataset in parallel (default: 1). The replacement modifiers then share a single copy of their lexicon between the processes.",
+    )
+
+    parser.add_argument(
+        "--memoize",
+        action="store_true",
+        help="Flag for modifying each distinct combination of the modifier's input properties only once and replaying the output for all other records (see MemoizedModifier). The outputs are kept in memory unless --cache is passed.",
+    )
+
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="Path to an SQLite database that keeps the memoized outputs across runs. Implies --memoize.",
+    )
+
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        help="Maximum number of memoized outputs; the least recently used ones are evicted first.",
+    )
+
     return parser.parse_args(arguments)
 
 
@@ -118,17 +146,21 @@ def main(arguments: Optional[List[str]] = None) -> None:
     if plugin.lower() == "replacetoken1to1modifier":
         mapping_files = modifier_kwargs["mapping_files"].split(",")
         layer = modifier_kwargs["layer"]
+        type_level = modifier_kwargs.get("type_level", "")
+        type_level_bool = type_level.lower() in {"true", "yes", "t", "1"}
         modifier: BaseDatasetModifier = (
             replace_token_1to1_modifier.ReplaceToken1to1Modifier(
-                layer=layer, mapping_files=mapping_files
+                layer=layer, mapping_files=mapping_files, type_level=type_level_bool
             )
         )
 
     elif plugin.lower() == "replacetoken1tonmodifier":
         mapping_files = modifier_kwargs["mapping_files"].split(",")
         layer = modifier_kwargs["layer"]
+        type_level = modifier_kwargs.get("type_level", "")
+        type_level_bool = type_level.lower() in {"true", "yes", "t", "1"}
         modifier = replace_token_1ton_modifier.ReplaceToken1toNModifier(
-            layer=layer, mapping_files=mapping_files
+            layer=layer, mapping_files=mapping_files, type_level=type_level_bool
         )
 
     elif plugin.lower() == "replacentomcrosslayermodifier":
@@ -138,6 +170,8 @@ def main(arguments: Optional[List[str]] = None) -> None:
         target_layer = modifier_kwargs["target_layer"]
         xlit_src = modifier_kwargs.get("transliterate_source", "")
         xlit_src_bool = True if xlit_src.lower() in {"true", "yes", "t", "1"} else False
+        longest = modifier_kwargs.get("longest_match_first", "")
+        longest_bool = True if longest.lower() in {"true", "yes", "t", "1"} else False
         # If the delimiter is the tab character we need a little hack
         # We have to pass the string "{TAB}" on the command line
         if delim == "{TAB}":
@@ -148,6 +182,7 @@ def main(arguments: Optional[List[str]] = None) -> None:
             mapping_files=mapping_files,
             mapping_files_delimiters=delim,
             transliterate_source=xlit_src_bool,
+            longest_match_first=longest_bool,
         )
 
     elif plugin.lower() == "replacerawmodifier":
@@ -155,31 +190,90 @@ def main(arguments: Optional[List[str]] = None) -> None:
         layer = modifier_kwargs["layer"]
         # uid_labels = modifier_kwargs["uid_labels"]
         raw_label = modifier_kwargs["raw_label"]
+        streaming = modifier_kwargs.get("streaming", "")
+        streaming_bool = streaming.lower() in {"true", "yes", "t", "1"}
+        chunk_size = int(modifier_kwargs.get("chunk_size", 1_000_000))
         modifier = replace_raw_modifier.ReplaceRawModifier(
             layer=layer,
             mapping_files=mapping_files,
             # uid_labels=uid_labels,
             raw_label=raw_label,
+            streaming=streaming_bool,
+            chunk_size=chunk_size,
         )
 
     elif plugin.lower() == "languagetoolmodifier":
         rule_file = modifier_kwargs["rule_file"]
-        modifier = language_tool_modifier.LanguageToolModifier(rule_file=rule_file)
+        remote_servers = modifier_kwargs.get("remote_servers")
+        modifier = language_tool_modifier.LanguageToolModifier(
+            rule_file=rule_file,
+            num_servers=int(modifier_kwargs.get("num_servers", 1)),
+            remote_servers=remote_servers.split(",") if remote_servers else None,
+            concurrency=int(modifier_kwargs.get("concurrency", 1)),
+            batch_size=int(modifier_kwargs.get("batch_size", 1000)),
+            max_request_chars=int(modifier_kwargs.get("max_request_chars", 0)),
+            trigger_index=modifier_kwargs.get("trigger_index"),
+            cache=modifier_kwargs.get("cache"),
+            langtool_version=modifier_kwargs.get("langtool_version", LANGTOOL_VERSION),
+        )
 
     elif plugin.lower() == "languagedetectionmodifier":
         layer = modifier_kwargs.get("layer")
-        modifier = language_detection_modifier.LanguageDetectionModifier(layer)
+        batch_size = modifier_kwargs.get("batch_size")
+        cascade_threshold = modifier_kwargs.get("cascade_threshold")
+        modifier = language_detection_modifier.LanguageDetectionModifier(
+            layer,
+            batch_size=int(batch_size) if batch_size else None,
+            num_threads=int(modifier_kwargs.get("num_threads", 1)),
+            cascade_threshold=float(cascade_threshold) if cascade_threshold else None,
+        )
 
     elif plugin.lower() == "lmscoremodifier":
         layer = modifier_kwargs.get("layer")
         model = modifier_kwargs.get("model")
-        modifier = lm_score_modifier.LMScoreModifier(layer, model)
+        max_tokens = modifier_kwargs.get("max_tokens")
+        num_threads = modifier_kwargs.get("num_threads")
+        num_interop_threads = modifier_kwargs.get("num_interop_threads")
+        cache_max_entries = modifier_kwargs.get("cache_max_entries")
+        num_workers = int(modifier_kwargs.get("num_workers", 1))
+        if num_workers > 1 and args.num_proc is not None and args.num_proc > 1:
+            raise ValueError(
+                "The lmscoremodifier's num_workers > 1 cannot be combined with --num-proc > 1"
+            )
+        modifier = lm_score_modifier.LMScoreModifier(
+            layer,
+            model,
+            batch_size=int(modifier_kwargs.get("batch_size", 1)),
+            max_tokens=int(max_tokens) if max_tokens else None,
+            token_nlls=modifier_kwargs.get("token_nlls", "false").lower()
+            in {"true", "yes", "t", "1"},
+            backend=modifier_kwargs.get("backend", "eager"),
+            num_threads=int(num_threads) if num_threads else None,
+            num_interop_threads=(
+                int(num_interop_threads) if num_interop_threads else None
+            ),
+            num_workers=num_workers,
+            threads_per_worker=int(modifier_kwargs.get("threads_per_worker", 1)),
+            cache=modifier_kwargs.get("cache"),
+            cache_max_entries=int(cache_max_entries) if cache_max_entries else None,
+        )
 
     else:
         raise ValueError(
             f"Unknown modifier name '{plugin}'. Please select a valid modifier name."
         )
 
+    # Share the lexicon of a replacement modifier between the processes
+    shared_lexicon = None
+    if args.num_proc is not None and args.num_proc > 1:
+        if hasattr(modifier, "share_lexicon"):
+            shared_lexicon = modifier.share_lexicon()
+
+    if args.memoize or args.cache:
+        modifier = memoized_modifier.MemoizedModifier(
+            modifier, cache=args.cache, max_entries=args.cache_max_entries
+        )
+
     # (4) Iterate over files lists, modify, save
     for files in files_lists:
         # (4.1) Load dataset
@@ -190,7 +284,7 @@ def main(arguments: Optional[List[str]] = None) -> None:
         dataset.data.validate()
 
         # (4.2) Modify dataset
-        dataset = modifier.modify_dataset(dataset)
+        dataset = modifier.modify_dataset(dataset, num_proc=args.num_proc)
 
         # (4.3) Save dataset
         # (a) To a single file
@@ -206,6 +300,14 @@ def main(arguments: Optional[List[str]] = None) -> None:
                 dataset, property="basename", path_outdir=output_path
             )
 
+    # If the process crashes before, the block is freed by the resource tracker
+    if isinstance(shared_lexicon, SharedLexicon):
+        shared_lexicon.close()
+
+    # Remove the temporary files of a streaming ReplaceRawModifier
+    if isinstance(modifier, replace_raw_modifier.ReplaceRawModifier):
+        modifier.close()
+
     return None
 
 
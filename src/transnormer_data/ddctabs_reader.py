@@ -0,0 +1,169 @@
+import io
+import os
+from operator import itemgetter
+from typing import (
+    IO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+# Names of the ddctabs columns that the reader extracts by default, with their
+# long and short index names in the `%%$DDC:index[...]` header lines
+DEFAULT_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "xlit": ("Token", "w"),
+    "orig": ("Utf8", "u"),
+    "norm": ("CanonicalToken", "v"),
+    "pos": ("Pos", "p"),
+    "lemma": ("Lemma", "l"),
+    "ws": ("WordSep", "ws"),
+}
+
+INDEX_PREFIX = "%%$DDC:index["
+META_PREFIX = "%%$DDC:meta."
+
+
+class DdcTabsSentence(NamedTuple):
+    """A sentence from a ddctabs file
+
+    `columns` maps the names of the extracted columns (e.g. "orig", "pos") to the list of the sentence's token values in this column. The values of the "ws" column are cast to bool as they are in the file, i.e. the value of the first token is not set to False (unlike the `orig_ws` property of `DtakMaker`).
+    """
+
+    idx: int
+    columns: Dict[str, List]
+
+
+class DdcTabsReader(object):
+    """Lazy reader for a single ddctabs file
+
+    The reader parses the `%%$DDC:index[...]` header lines to find the positions of the requested columns and then only extracts these columns from the token lines. Sentences are yielded one at a time.
+
+    The document metadata from the `%%$DDC:meta.*` header lines is collected into `self.meta` (e.g. `{"author": ..., "basename": ..., ...}`) during the same scan. It is complete when the first sentence is yielded.
+
+    Input format documentation: https://kaskade.dwds.de/~moocow/software/ddc/ddc_tabs.html
+
+    Example:
+
+    >>> for sent in DdcTabsReader("weigel_moralweissheit_1674.TEI-P5.tabs"):
+    ...     print(sent.idx, sent.columns["orig"], sent.columns["ws"])
+
+    A sentence is terminated by an empty line. Tokens that follow the last empty line of a file are not yielded.
+    """
+
+    def __init__(
+        self,
+        source: Union[str, os.PathLike, IO[str]],
+        columns: Optional[Dict[str, Tuple[str, str]]] = None,
+        buffer_size: int = 1 << 20,
+    ) -> None:
+        """Initialize the reader with a path or an open text stream
+
+        `columns` maps the names under which columns are returned to the column's (long, short) index name, see `DEFAULT_COLUMNS`. A column is found if either of the two names matches the header.
+
+        `buffer_size` is the size in bytes of the chunks in which the file is read.
+        """
+        self.source = source
+        self.columns = DEFAULT_COLUMNS if columns is None else columns
+        self.buffer_size = buffer_size
+
+        # Column name -> tab index, filled when the header is parsed
+        self.column_indices: Dict[str, int] = {}
+        # Metadata name -> value, filled when the header is parsed
+        self.meta: Dict[str, str] = {}
+
+    def __iter__(self) -> Iterator[DdcTabsSentence]:
+        if isinstance(self.source, (str, os.PathLike)):
+            with io.open(
+                self.source, "r", encoding="utf8", buffering=self.buffer_size
+            ) as fh:
+                yield from self._read(fh)
+        else:
+            yield from self._read(self.source)
+
+    def _read(self, fh: IO[str]) -> Iterator[DdcTabsSentence]:
+        names: Sequence[str] = []
+        # Set up when the first token line is reached
+        getter: Optional[Callable[[List[str]], Tuple[str, ...]]] = None
+        maxsplit = -1
+        ws_pos = -1
+
+        sent: List[Sequence[str]] = []
+        idx = 0
+        while True:
+            lines = fh.readlines(self.buffer_size)
+            if not lines:
+                break
+            for line in lines:
+                line = line.strip()
+
+                # (A) Token line
+                if line and not line.startswith("%%"):
+                    if getter is None:
+                        names, getter, maxsplit, ws_pos = self._projection()
+                    sent.append(getter(line.split("\t", maxsplit)))
+
+                # (B) Empty line: end of sentence
+                elif not line:
+                    yield self._make_sentence(idx, sent, names, ws_pos)
+                    idx += 1
+                    sent = []
+
+                # (C) Header line with column index
+                elif line.startswith(INDEX_PREFIX):
+                    self._parse_index_line(line)
+                    getter = None
+
+                # (D) Header line with metadata
+                elif line.startswith(META_PREFIX):
+                    name, _, value = line.removeprefix(META_PREFIX).partition("=")
+                    self.meta[name] = value
+
+    def _parse_index_line(self, line: str) -> None:
+        """Parse a header line of the form `%%$DDC:index[0]=Token w`"""
+        index, _, names = line.removeprefix(INDEX_PREFIX).partition("]=")
+        try:
+            i = int(index)
+            long, short = names.split(" ")[:2]
+        except ValueError:
+            raise Exception(f"Couldn't parse ddc-tabs header line: '{line}'")
+        for name, (col_long, col_short) in self.columns.items():
+            if long == col_long or short == col_short:
+                self.column_indices[name] = i
+                break
+
+    def _projection(
+        self,
+    ) -> Tuple[Sequence[str], Callable[[List[str]], Tuple[str, ...]], int, int]:
+        """Get the column names, a getter for the column values, the number of splits that is needed per token line and the position of the "ws" column"""
+        missing = set(self.columns) - set(self.column_indices)
+        if missing:
+            raise Exception(f"Columns missing from ddc-tabs header: {sorted(missing)}")
+        names = list(self.columns)
+        indices = [self.column_indices[name] for name in names]
+        getter: Callable[[List[str]], Tuple[str, ...]] = itemgetter(*indices)
+        if len(indices) == 1:
+            # itemgetter with a single item does not return a tuple
+            single_getter = itemgetter(*indices)
+            getter = lambda fields: (single_getter(fields),)  # noqa: E731
+        ws_pos = names.index("ws") if "ws" in names else -1
+        # Only split as far as the rightmost needed column
+        return names, getter, max(indices) + 1, ws_pos
+
+    def _make_sentence(
+        self, idx: int, sent: List[Sequence[str]], names: Sequence[str], ws_pos: int
+    ) -> DdcTabsSentence:
+        if not sent:
+            return DdcTabsSentence(idx, {name: [] for name in self.columns})
+        columns: Dict[str, List] = {
+            name: list(values) for name, values in zip(names, zip(*sent))
+        }
+        if ws_pos >= 0:
+            name = names[ws_pos]
+            columns[name] = [bool(int(ws)) for ws in columns[name]]
+        return DdcTabsSentence(idx, columns)
@@ -0,0 +1,575 @@
+import bisect
+import http.client
+import json
+import os
+import re
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from language_tool_python import LanguageTool
+
+# LanguageTool version that is downloaded for local servers
+LANGTOOL_VERSION = "6.3"
+
+# Separator between packed texts; LanguageTool checks paragraphs independently
+PACKING_SEPARATOR = "\n\n"
+
+
+class LanguageToolClient(object):
+    """Client that sends `/v2/check` requests to one or more LanguageTool servers concurrently
+
+    Requests are sent from a pool of `num_threads` threads, round-robin over the servers. Every thread keeps one persistent (keep-alive) HTTP connection per server. The results of `check_many` and `correct_many` are in the order of the input texts.
+
+    `params` are the request parameters except for the text, e.g. `{"language": "de-DE", "enabledRules": "OLD_SPELLING", "enabledOnly": "true"}` (see the LanguageTool HTTP API).
+
+    If `max_chars` is given, `check_texts` and `correct_many` pack consecutive texts into a single request of at most `max_chars` characters, separated by blank lines, and map the matches back to the texts by their offsets. Texts that contain a blank line themselves or are longer than `max_chars` are sent on their own.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        params: Dict[str, str],
+        num_threads: Optional[int] = None,
+        timeout: float = 300.0,
+        max_chars: Optional[int] = None,
+    ) -> None:
+        if not urls:
+            raise ValueError("LanguageToolClient: at least one server URL is required")
+        self.servers: List[Tuple[str, int, str]] = [
+            self._parse_url(url) for url in urls
+        ]
+        self.params = params
+        self.num_threads = 4 * len(urls) if num_threads is None else num_threads
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Process that created the executor
+        self._pid: Optional[int] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Threads and connections cannot be pickled, they are re-created on demand
+        state = self.__dict__.copy()
+        state["_local"] = None
+        state["_executor"] = None
+        state["_pid"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @staticmethod
+    def _parse_url(url: str) -> Tuple[str, int, str]:
+        """Split the URL of a server, e.g. 'http://localhost:8081/v2/', into host, port and path of the check endpoint"""
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme != "http" or parsed.hostname is None:
+            raise ValueError(f"LanguageToolClient: not an http URL: '{url}'")
+        path = parsed.path if parsed.path.endswith("/") else parsed.path + "/"
+        if not path.endswith("v2/"):
+            path += "v2/"
+        return parsed.hostname, parsed.port or 80, path + "check"
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            self._local = threading.local()
+            self._pid = os.getpid()
+        return self._executor
+
+    def _connection(self, server: int) -> http.client.HTTPConnection:
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        if server not in connections:
+            host, port, _ = self.servers[server]
+            connections[server] = http.client.HTTPConnection(
+                host, port, timeout=self.timeout
+            )
+        return connections[server]
+
+    def check(self, text: str, server: int = 0) -> Dict[str, Any]:
+        """Send `text` to the server with index `server` and return the JSON response"""
+        body = urllib.parse.urlencode({**self.params, "text": text})
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded; charset=utf-8",
+            "Accept": "application/json",
+        }
+        path = self.servers[server][2]
+        for attempt in range(2):
+            connection = self._connection(server)
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server may have closed the keep-alive connection
+                connection.close()
+                if attempt == 1:
+                    raise
+                continue
+            if response.status != 200:
+                raise Exception(
+                    f"LanguageTool server returned {response.status}: {data[:200]!r}"
+                )
+            return json.loads(data)
+        raise AssertionError("unreachable")
+
+    def _check_at(self, item: Tuple[int, str]) -> Dict[str, Any]:
+        i, text = item
+        return self.check(text, server=i % len(self.servers))
+
+    def check_many(self, texts: Iterable[str]) -> List[Dict[str, Any]]:
+        """Check all `texts` concurrently and return the JSON responses in input order"""
+        return list(self.executor.map(self._check_at, enumerate(texts)))
+
+    def check_texts(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        """Return the matches (as JSON objects) for each of the `texts`, in input order, packing texts into requests if `max_chars` is set"""
+        if not self.max_chars:
+            return [response["matches"] for response in self.check_many(texts)]
+        groups = self._pack(texts)
+        responses = self.check_many(
+            PACKING_SEPARATOR.join(texts[i] for i in group) for group in groups
+        )
+        matches: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        for group, response in zip(groups, responses):
+            unpacked = self._unpack([texts[i] for i in group], response["matches"])
+            for i, text_matches in zip(group, unpacked):
+                matches[i] = text_matches
+        return matches
+
+    def _pack(self, texts: List[str]) -> List[List[int]]:
+        """Group the indices of consecutive texts so that the packed texts of a group have at most `max_chars` characters"""
+        assert self.max_chars is not None
+        groups: List[List[int]] = []
+        size = 0
+        for i, text in enumerate(texts):
+            if PACKING_SEPARATOR in text or len(text) >= self.max_chars:
+                groups.append([i])
+                size = self.max_chars
+                continue
+            if groups and size + len(PACKING_SEPARATOR) + len(text) <= self.max_chars:
+                groups[-1].append(i)
+                size += len(PACKING_SEPARATOR) + len(text)
+            else:
+                groups.append([i])
+                size = len(text)
+        return groups
+
+    @staticmethod
+    def _unpack(
+        texts: List[str], matches: List[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        """Assign the matches for the packed `texts` to the individual texts and make their offsets relative to the text
+
+        LanguageTool counts offsets in UTF-16 code units. Matches that are not within a single text are dropped.
+        """
+        starts = []
+        ends = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += _utf16_length(text)
+            ends.append(position)
+            position += len(PACKING_SEPARATOR)
+        unpacked: List[List[Dict[str, Any]]] = [[] for _ in texts]
+        for match in matches:
+            k = bisect.bisect_right(starts, match["offset"]) - 1
+            if k < 0 or match["offset"] + match["length"] > ends[k]:
+                continue
+            match = dict(match, offset=match["offset"] - starts[k])
+            unpacked[k].append(match)
+        return unpacked
+
+    def correct_many(self, texts: List[str]) -> List[str]:
+        """Apply the first suggestion of every match to each of the `texts`, like `LanguageTool.correct`, with concurrent requests"""
+        return [
+            correct_text(text, matches)
+            for text, matches in zip(texts, self.check_texts(texts))
+        ]
+
+    def close(self) -> None:
+        """Shut down the threads (the connections are closed with them)"""
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown()
+        self._executor = None
+
+
+def server_url(langtool: LanguageTool) -> str:
+    """URL of the server of `langtool` (local or remote), for `LanguageToolClient`
+
+    Older versions of language-tool-python have no public `LanguageTool.url`, only the private `_url` with the same value.
+    """
+    url = getattr(langtool, "url", None)
+    return url if url is not None else langtool._url  # type: ignore
+
+
+def correct_text(text: str, matches: List[Dict[str, Any]]) -> str:
+    """Apply the first replacement of every match (as JSON objects, see `LanguageToolClient.check_texts`) to `text`, like `language_tool_python.utils.correct`
+
+    This does not depend on the `Match` class of language-tool-python, whose API differs between versions. Offsets are converted from UTF-16 code units to string indices. A match is skipped if an earlier replacement has changed its span.
+    """
+    spans = []
+    for match in matches:
+        if not match["replacements"]:
+            continue
+        if _utf16_length(text) == len(text):
+            start, end = match["offset"], match["offset"] + match["length"]
+        else:
+            start, end = _utf16_span_to_str(text, match["offset"], match["length"])
+        spans.append((start, end, match["replacements"][0]["value"]))
+    ltext = list(text)
+    errors = [ltext[start:end] for start, end, _ in spans]
+    shift = 0
+    for (start, end, replacement), error in zip(spans, errors):
+        start, end = start + shift, end + shift
+        if ltext[start:end] != error:
+            continue
+        ltext[start:end] = list(replacement)
+        shift += len(replacement) - len(error)
+    return "".join(ltext)
+
+
+def load_rules(path: str) -> Set[str]:
+    """Load a file with LanguageTool rule IDs (e.g. OLD_SPELLING), one per line"""
+    rules = set()
+    with open(path, "r") as f:
+        for line in f:
+            rule_id = line.strip()  # Remove leading/trailing whitespace
+            if rule_id:  # Skip empty lines
+                rules.add(rule_id)
+    return rules
+
+
+def langtool_params(rules: Iterable[str], language: str = "de-DE") -> Dict[str, str]:
+    """Request parameters that restrict a check request to the given rules (like `LanguageTool.enabled_rules` with `enabled_rules_only=True`)"""
+    return {
+        "language": language,
+        "enabledRules": ",".join(sorted(rules)),
+        "enabledOnly": "true",
+    }
+
+
+# Words of a sentence, as used by the TriggerIndex
+WORD_PATTERN = re.compile(r"\w+")
+
+
+class TriggerIndex(object):
+    """Index of trigger words and regexes per LanguageTool rule, to skip sentences in which none of the rules can match
+
+    A sentence is a candidate for a rule if it contains one of the rule's trigger words (compared case-insensitively) or if one of the rule's regexes matches it. Rules that are not in the index or have neither trigger words nor regexes can match any sentence. The index is either curated by hand or learned from the matches of earlier runs (`learn`), and is stored as a JSON file, e.g.:
+
+    `{"ZUVIEL": {"tokens": ["zuviel", "zuwenig"], "regexes": []}, "OLD_SPELLING": {"tokens": ["daß"], "regexes": ["ß$"]}}`
+
+    Since learned triggers only cover the errors that were seen, a learned index can miss sentences; `prefilter_report` measures its recall.
+    """
+
+    def __init__(
+        self, triggers: Optional[Dict[str, Dict[str, List[str]]]] = None
+    ) -> None:
+        self.tokens: Dict[str, Set[str]] = {}
+        self.regexes: Dict[str, List[str]] = {}
+        for rule_id, rule_triggers in (triggers or {}).items():
+            self.add(
+                rule_id,
+                tokens=rule_triggers.get("tokens", []),
+                regexes=rule_triggers.get("regexes", []),
+            )
+        self._compiled: Dict[str, Optional[re.Pattern]] = {}
+
+    def __contains__(self, rule_id: str) -> bool:
+        return rule_id in self.tokens
+
+    def add(
+        self, rule_id: str, tokens: Iterable[str] = (), regexes: Iterable[str] = ()
+    ) -> None:
+        """Add trigger words and regexes for a rule"""
+        self.tokens.setdefault(rule_id, set()).update(t.lower() for t in tokens)
+        rule_regexes = self.regexes.setdefault(rule_id, [])
+        rule_regexes.extend(r for r in regexes if r not in rule_regexes)
+        self._compiled = {}
+
+    def _regex(self, rule_id: str) -> Optional[re.Pattern]:
+        if rule_id not in self._compiled:
+            regexes = self.regexes.get(rule_id)
+            self._compiled[rule_id] = (
+                re.compile("|".join(f"(?:{r})" for r in regexes)) if regexes else None
+            )
+        return self._compiled[rule_id]
+
+    def is_candidate(self, text: str, rules: Iterable[str]) -> bool:
+        """Return True if any of the `rules` can match `text`"""
+        words = None
+        for rule_id in rules:
+            if rule_id not in self.tokens:
+                return True
+            regex = self._regex(rule_id)
+            if not self.tokens[rule_id] and regex is None:
+                # No triggers are known for the rule
+                return True
+            if self.tokens[rule_id]:
+                if words is None:
+                    words = {w.lower() for w in WORD_PATTERN.findall(text)}
+                if not words.isdisjoint(self.tokens[rule_id]):
+                    return True
+            if regex is not None and regex.search(text):
+                return True
+        return False
+
+    def learn(self, texts: List[str], matches: List[List[Dict[str, Any]]]) -> None:
+        """Add the words of the text spans that the rules matched in `texts` as triggers (`matches` as returned by `LanguageToolClient.check_texts`)
+
+        Spans without word characters are added as literal regexes.
+        """
+        for text, text_matches in zip(texts, matches):
+            for match in text_matches:
+                start, end = _utf16_span_to_str(text, match["offset"], match["length"])
+                span = text[start:end]
+                words = WORD_PATTERN.findall(span)
+                if words:
+                    self.add(match["rule"]["id"], tokens=words)
+                elif span:
+                    self.add(match["rule"]["id"], regexes=[re.escape(span)])
+
+    @classmethod
+    def load(cls, path: str) -> "TriggerIndex":
+        with open(path, "r", encoding="utf8") as f:
+            return cls(json.load(f))
+
+    def save(self, path: str) -> None:
+        triggers = {
+            rule_id: {
+                "tokens": sorted(self.tokens[rule_id]),
+                "regexes": self.regexes.get(rule_id, []),
+            }
+            for rule_id in sorted(self.tokens)
+        }
+        with open(path, "w", encoding="utf8") as f:
+            json.dump(triggers, f, ensure_ascii=False, indent=2)
+
+
+def prefilter_report(
+    texts: List[str],
+    matches: List[List[Dict[str, Any]]],
+    index: TriggerIndex,
+    rules: Iterable[str],
+) -> Dict[str, Any]:
+    """Compare the candidates of the `index` with the `matches` of an unfiltered run on `texts`
+
+    Recall is the share of the sentences with at least one match (overall and per rule) that the prefilter passes to LanguageTool.
+    """
+    rules = list(rules)
+    candidates = [index.is_candidate(text, rules) for text in texts]
+    with_matches = [bool(text_matches) for text_matches in matches]
+    recalled = sum(c and m for c, m in zip(candidates, with_matches))
+    per_rule: Dict[str, Dict[str, int]] = {}
+    for candidate, text_matches in zip(candidates, matches):
+        for rule_id in {match["rule"]["id"] for match in text_matches}:
+            counts = per_rule.setdefault(rule_id, {"sentences": 0, "recalled": 0})
+            counts["sentences"] += 1
+            counts["recalled"] += candidate
+    return {
+        "sentences": len(texts),
+        "candidates": sum(candidates),
+        "sentences_with_matches": sum(with_matches),
+        "recalled": recalled,
+        "recall": recalled / sum(with_matches) if any(with_matches) else 1.0,
+        "per_rule": per_rule,
+    }
+
+
+class StubLanguageToolServer(object):
+    """Local stand-in for a LanguageTool server, for tests and benchmarks without Java
+
+    Implements `GET /v2/languages` and `POST /v2/check` of the LanguageTool HTTP API (HTTP/1.1, keep-alive) for a fixed set of word replacement rules, e.g. `{"OLD_SPELLING": {"daß": "dass"}, "ZUVIEL": {"Zuviel": "Zu viel"}}`. Whole words are matched; like a real server, match offsets and lengths are counted in UTF-16 code units. `latency` (in seconds) is added to every check request to simulate the processing time of a real server.
+
+    Example:
+
+    >>> with StubLanguageToolServer({"OLD_SPELLING": {"daß": "dass"}}) as server:
+    ...     client = LanguageToolClient([server.url], {"language": "de-DE"})
+    ...     client.correct_many(["Ich weiß, daß es geht."])
+    ['Ich weiß, dass es geht.']
+    """
+
+    def __init__(
+        self,
+        rules: Dict[str, Dict[str, str]],
+        latency: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.rules = rules
+        self.latency = latency
+        # Number of check requests served
+        self.num_checks = 0
+        self._lock = threading.Lock()
+        self.patterns = {
+            rule_id: re.compile(
+                r"\b("
+                + "|".join(
+                    re.escape(w) for w in sorted(replacements, key=len, reverse=True)
+                )
+                + r")\b"
+            )
+            for rule_id, replacements in rules.items()
+            if replacements
+        }
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, as expected by `LanguageTool(remote_server=...)`"""
+        host, port = self._httpd.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubLanguageToolServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubLanguageToolServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def check(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Compute the response to a check request with the (decoded) form `params`"""
+        text = params.get("text", "")
+        rule_ids = list(self.patterns)
+        enabled = [r for r in params.get("enabledRules", "").split(",") if r]
+        disabled = set(params.get("disabledRules", "").split(","))
+        if params.get("enabledOnly") == "true":
+            rule_ids = [r for r in rule_ids if r in enabled]
+        rule_ids = [r for r in rule_ids if r not in disabled]
+
+        found = []
+        for rule_id in rule_ids:
+            for m in self.patterns[rule_id].finditer(text):
+                found.append((m.start(), m.end(), rule_id))
+        # Like LanguageTool, don't return overlapping matches
+        found.sort()
+        matches = []
+        end_previous = 0
+        # Offset in UTF-16 code units of `end_previous`
+        offset_previous = 0
+        for start, end, rule_id in found:
+            if start < end_previous:
+                continue
+            offset = offset_previous + _utf16_length(text[end_previous:start])
+            length = _utf16_length(text[start:end])
+            end_previous, offset_previous = end, offset + length
+            matches.append(self._match(text, start, end, offset, length, rule_id))
+        return {
+            "software": {"name": "LanguageTool (stub)", "version": "6.3"},
+            "language": {"name": "German (Germany)", "code": params.get("language")},
+            "matches": matches,
+        }
+
+    def _match(
+        self, text: str, start: int, end: int, offset: int, length: int, rule_id: str
+    ) -> Dict[str, Any]:
+        replacement = self.rules[rule_id][text[start:end]]
+        # Like LanguageTool, show some context around the match
+        context_start = max(0, start - 40)
+        context = text[context_start : end + 40]  # noqa: E203
+        return {
+            "message": f"Replace by '{replacement}'",
+            "shortMessage": "",
+            "replacements": [{"value": replacement}],
+            "offset": offset,
+            "length": length,
+            "context": {
+                "text": context,
+                "offset": _utf16_length(text[context_start:start]),
+                "length": length,
+            },
+            "rule": {
+                "id": rule_id,
+                "description": rule_id,
+                "issueType": "misspelling",
+                "category": {"id": "STUB", "name": "Stub"},
+            },
+        }
+
+    def _make_handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send_json(self, obj: Any) -> None:
+                data = json.dumps(obj).encode("utf8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _check(self, query: str) -> None:
+                params = dict(urllib.parse.parse_qsl(query, keep_blank_values=True))
+                with server._lock:
+                    server.num_checks += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                self._send_json(server.check(params))
+
+            def do_GET(self) -> None:
+                url = urllib.parse.urlsplit(self.path)
+                # Older versions of language-tool-python send checks as GET requests
+                if url.path.rstrip("/") == "/v2/check":
+                    self._check(url.query)
+                elif url.path.rstrip("/") == "/v2/languages":
+                    self._send_json(
+                        [
+                            {
+                                "name": "German (Germany)",
+                                "code": "de",
+                                "longCode": "de-DE",
+                            }
+                        ]
+                    )
+                else:
+                    self.send_error(404)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf8")
+                if urllib.parse.urlsplit(self.path).path.rstrip("/") != "/v2/check":
+                    self.send_error(404)
+                    return
+                self._check(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def _utf16_length(text: str) -> int:
+    """Length of `text` in UTF-16 code units, in which LanguageTool counts offsets"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _utf16_span_to_str(text: str, offset: int, length: int) -> Tuple[int, int]:
+    """Convert a span in UTF-16 code units (as in LanguageTool matches) into string indices of `text`"""
+    prefix = text.encode("utf-16-le")[: 2 * offset].decode("utf-16-le", "ignore")
+    span = text.encode("utf-16-le")[2 * offset : 2 * (offset + length)]  # noqa: E203
+    start = len(prefix)
+    return start, start + len(span.decode("utf-16-le", "ignore"))
@@ -0,0 +1,568 @@
+import array
+import csv
+import functools
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from multiprocessing import resource_tracker, shared_memory
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from transnormer_data.ngram_matcher import NgramMatcher
+
+# File extension of compiled lexicons
+LEXICON_EXTENSION = ".tnlex"
+
+# Bump this when the binary layout changes
+LEXICON_VERSION = 1
+
+# Kinds of lexicons: which modifier they are made for, decides how keys and values are decoded
+# - "1to1": token -> token (ReplaceToken1to1Modifier)
+# - "1ton": token -> list of tokens (ReplaceToken1toNModifier)
+# - "ntom": tuple of tokens -> tuple of tokens (ReplaceNtoMCrossLayerModifier)
+LEXICON_KINDS = ("1to1", "1ton", "ntom")
+
+# File layout: magic, version, length of the JSON header; then the JSON header,
+# the key offsets and value offsets (each n+1 unsigned 64 bit integers), the key
+# blob and the value blob. Keys are sorted by their UTF-8 bytes.
+_MAGIC = b"TNLEX"
+_PREAMBLE = struct.Struct("<5sBxxI")
+
+# Separates the tokens of a multi-token key or value. Tokens must not contain
+# characters below 0x20, so that all keys that start with the same tokens are
+# stored next to each other.
+SEP = "\x1f"
+_SEP_BYTES = SEP.encode("utf-8")
+
+Key = Union[str, Tuple[str, ...]]
+Value = Union[str, List[str], Tuple[str, ...]]
+
+
+def read_mapping_file(
+    path: Union[str, os.PathLike], delimiters: Optional[str] = None
+) -> Iterator[Tuple[int, List[str]]]:
+    """Yield the line number and the row for every line of a TSV/CSV mapping file
+
+    The dialect is sniffed as in the replacement modifiers' loaders, with "`" as quote character. If the sniffer fails (e.g. because some rows have the wrong number of columns) and a single delimiter is given, the file is read with this delimiter, so that the broken rows can be reported.
+    """
+    with open(path, newline="", encoding="utf-8") as csvfile:
+        try:
+            dialect = csv.Sniffer().sniff(csvfile.read(1024), delimiters=delimiters)
+        except csv.Error:
+            if delimiters is None or len(delimiters) != 1:
+                raise
+            dialect = type("dialect", (csv.excel,), {"delimiter": delimiters})
+        dialect.quotechar = "`"
+        csvfile.seek(0)
+        reader = csv.reader(csvfile, dialect)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def validate_mapping_files(
+    files: Sequence[Union[str, os.PathLike]],
+    kind: str,
+    delimiters: Optional[str] = None,
+    on_conflict: str = "error",
+) -> Tuple[Dict[Key, Value], List[str], List[str]]:
+    """Read and validate mapping files for a lexicon of type `kind`
+
+    Returns the mapping, a list of errors and a list of warnings. Errors and warnings have the form "<file>:<line>: <message>".
+
+    The following problems are detected:
+    - arity errors: rows that do not have exactly two columns, and multi-token sources (or targets, for kind "1to1") where the lexicon only allows single tokens
+    - invalid tokens: empty tokens or tokens that contain control characters
+    - duplicates: the same pair occurs more than once (warning)
+    - conflicts: the same source is mapped to different targets. With `on_conflict` "error" (default) this is an error, with "first" or "last" the first or last pair is kept and a warning is issued. The text loaders of the modifiers keep the last pair.
+    """
+    if kind not in LEXICON_KINDS:
+        raise ValueError(
+            f"Unknown lexicon kind '{kind}', must be one of {LEXICON_KINDS}"
+        )
+    if on_conflict not in {"error", "first", "last"}:
+        raise ValueError(f"Unknown conflict strategy: '{on_conflict}'")
+    mapping: Dict[Key, Value] = {}
+    # Location of the pair that is stored for a key
+    locations: Dict[Key, str] = {}
+    errors: List[str] = []
+    warnings: List[str] = []
+    for file in files:
+        for line_num, row in read_mapping_file(file, delimiters):
+            location = f"{file}:{line_num}"
+            if len(row) != 2:
+                errors.append(f"{location}: expected 2 columns, got {len(row)}: {row}")
+                continue
+            src, trg = row[0].split(" "), row[1].split(" ")
+            if kind != "ntom" and len(src) != 1:
+                errors.append(f"{location}: source must be a single token: '{row[0]}'")
+                continue
+            if kind == "1to1" and len(trg) != 1:
+                errors.append(f"{location}: target must be a single token: '{row[1]}'")
+                continue
+            invalid = [t for t in src + trg if not t or min(t) < " "]
+            if invalid:
+                errors.append(f"{location}: empty token or control character: {row}")
+                continue
+            key: Key = src[0] if kind != "ntom" else tuple(src)
+            value: Value
+            if kind == "1to1":
+                value = trg[0]
+            elif kind == "1ton":
+                value = trg
+            else:
+                value = tuple(trg)
+            if key not in mapping:
+                mapping[key] = value
+                locations[key] = location
+            elif mapping[key] == value:
+                warnings.append(
+                    f"{location}: duplicate of {locations[key]}: {row[0]} -> {row[1]}"
+                )
+            else:
+                message = (
+                    f"{location}: conflicts with {locations[key]}: {row[0]} -> {row[1]}"
+                )
+                if on_conflict == "error":
+                    errors.append(message)
+                else:
+                    warnings.append(message)
+                    if on_conflict == "last":
+                        mapping[key] = value
+                        locations[key] = location
+    return mapping, errors, warnings
+
+
+def compile_lexicon(
+    mapping: Mapping[Key, Value],
+    path_out: Union[str, os.PathLike],
+    kind: str,
+    info: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Write `mapping` as a compiled lexicon of type `kind` to `path_out`
+
+    `info` is stored in the header of the file (e.g. the names of the source files). The lexicon is written to a temporary file first and then moved to `path_out`.
+    """
+    chunks = _serialize_lexicon(mapping, kind, info)
+    dirname = os.path.dirname(os.path.abspath(path_out))
+    fd, path_tmp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(path_tmp, path_out)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+
+
+def _serialize_lexicon(
+    mapping: Mapping[Key, Value], kind: str, info: Optional[Dict[str, Any]] = None
+) -> List[bytes]:
+    """Serialize `mapping` to the binary lexicon layout, return the consecutive parts of the layout"""
+    if kind not in LEXICON_KINDS:
+        raise ValueError(
+            f"Unknown lexicon kind '{kind}', must be one of {LEXICON_KINDS}"
+        )
+    entries = sorted((_encode(key), _encode(value)) for key, value in mapping.items())
+    key_offsets = array.array("Q", [0])
+    value_offsets = array.array("Q", [0])
+    for key, value in entries:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(value))
+    header = json.dumps(
+        {
+            "kind": kind,
+            "size": len(entries),
+            "ngram_lengths": sorted(
+                {len(key) if isinstance(key, tuple) else 1 for key in mapping}
+            ),
+            "byteorder": sys.byteorder,
+            "info": info or {},
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    # Pad the header, so that the offset arrays are 8-byte aligned
+    header += b" " * (-(_PREAMBLE.size + len(header)) % 8)
+    return [
+        _PREAMBLE.pack(_MAGIC, LEXICON_VERSION, len(header)),
+        header,
+        key_offsets.tobytes(),
+        value_offsets.tobytes(),
+        b"".join(key for key, _ in entries),
+        b"".join(value for _, value in entries),
+    ]
+
+
+def is_compiled_lexicon(path: Union[str, os.PathLike]) -> bool:
+    return str(path).endswith(LEXICON_EXTENSION)
+
+
+def _encode(item: Value) -> bytes:
+    if isinstance(item, str):
+        return item.encode("utf-8")
+    return SEP.join(item).encode("utf-8")
+
+
+class CompiledLexicon(Mapping):
+    """Read-only mapping backed by a compiled lexicon file (see `compile_lexicon`)
+
+    The file is memory-mapped, so opening a lexicon does not depend on its size. Keys are looked up by binary search over the sorted keys. Results of lookups (including misses) are cached in an LRU cache of `cache_size` entries, since token frequencies are very skewed.
+
+    Keys and values have the same types as in the dictionaries that the modifiers build from text mapping files: `str -> str` for kind "1to1", `str -> List[str]` for kind "1ton" and `Tuple[str, ...] -> Tuple[str, ...]` for kind "ntom".
+    """
+
+    def __init__(
+        self, path: Union[str, os.PathLike], cache_size: Optional[int] = 1 << 16
+    ) -> None:
+        self.path = path
+        self.cache_size = cache_size
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._load_layout(memoryview(self._mm))
+
+    def _load_layout(self, buffer: memoryview) -> None:
+        """Parse the header of the lexicon in `buffer` and set up views on its sections"""
+        self._buffer = buffer
+        if len(buffer) < _PREAMBLE.size:
+            raise ValueError(f"Not a compiled lexicon: '{self.path}'")
+        magic, version, header_len = _PREAMBLE.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError(f"Not a compiled lexicon: '{self.path}'")
+        if version != LEXICON_VERSION:
+            raise ValueError(
+                f"Lexicon '{self.path}' has version {version}, expected {LEXICON_VERSION}. Re-compile the lexicon."
+            )
+        start = _PREAMBLE.size
+        end = start + header_len
+        self.header: Dict[str, Any] = json.loads(bytes(buffer[start:end]))
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Lexicon '{self.path}' was compiled on another platform")
+        self.kind: str = self.header["kind"]
+        self.ngram_lengths: List[int] = self.header["ngram_lengths"]
+        self._size: int = self.header["size"]
+
+        # Offset arrays of n+1 entries each
+        start, end = end, end + 8 * (self._size + 1)
+        self._key_offsets = buffer[start:end].cast("Q")
+        start, end = end, end + 8 * (self._size + 1)
+        self._value_offsets = buffer[start:end].cast("Q")
+        start = end
+        self._keys_start = start
+        self._values_start = start + self._key_offsets[self._size]
+
+        # Either the LRU cache wrapper or the uncached lookup
+        self._lookup: Callable[[bytes], Optional[bytes]]
+        if self.cache_size is None or self.cache_size > 0:
+            self._lookup = functools.lru_cache(maxsize=self.cache_size)(
+                self._lookup_uncached
+            )
+        else:
+            self._lookup = self._lookup_uncached
+
+    def _release_buffer(self) -> None:
+        """Release all views on the lexicon's buffer"""
+        for view in [self._key_offsets, self._value_offsets, self._buffer]:
+            view.release()
+        if hasattr(self._lookup, "cache_clear"):
+            self._lookup.cache_clear()
+
+    def close(self) -> None:
+        self._release_buffer()
+        self._mm.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Memory maps cannot be pickled, the file is re-opened by the receiver
+        return {"path": self.path, "cache_size": self.cache_size}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    def _key_bytes(self, i: int) -> bytes:
+        start = self._keys_start + self._key_offsets[i]
+        end = self._keys_start + self._key_offsets[i + 1]
+        return bytes(self._buffer[start:end])
+
+    def _value_bytes(self, i: int) -> bytes:
+        start = self._values_start + self._value_offsets[i]
+        end = self._values_start + self._value_offsets[i + 1]
+        return bytes(self._buffer[start:end])
+
+    def _bisect(self, key: bytes, lo: int = 0, hi: Optional[int] = None) -> int:
+        """Index of the first key that is >= `key`"""
+        if hi is None:
+            hi = self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _lookup_uncached(self, key: bytes) -> Optional[bytes]:
+        i = self._bisect(key)
+        if i < self._size and self._key_bytes(i) == key:
+            return self._value_bytes(i)
+        return None
+
+    def _decode_key(self, key: bytes) -> Key:
+        if self.kind == "ntom":
+            return tuple(key.decode("utf-8").split(SEP))
+        return key.decode("utf-8")
+
+    def _decode_value(self, value: bytes) -> Value:
+        if self.kind == "1to1":
+            return value.decode("utf-8")
+        tokens = value.decode("utf-8").split(SEP)
+        return tokens if self.kind == "1ton" else tuple(tokens)
+
+    def __getitem__(self, key: Key) -> Value:
+        if not isinstance(key, (str, tuple)):
+            raise KeyError(key)
+        value = self._lookup(_encode(key))
+        if value is None:
+            raise KeyError(key)
+        return self._decode_value(value)
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, (str, tuple)):
+            return False
+        return self._lookup(_encode(key)) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Key]:
+        for i in range(self._size):
+            yield self._decode_key(self._key_bytes(i))
+
+    def prefix_range(
+        self, prefix: Sequence[str], lo: int = 0, hi: Optional[int] = None
+    ) -> Tuple[int, int, bool]:
+        """Find the keys that start with the tokens in `prefix`
+
+        Returns the range `(start, end)` of the indices of these keys and whether `prefix` itself is a key. Pass the range of a shorter prefix as `lo` and `hi` to narrow down the search.
+        """
+        if hi is None:
+            hi = self._size
+        key = _encode(tuple(prefix))
+        start = self._bisect(key, lo, hi)
+        is_key = start < hi and self._key_bytes(start) == key
+        # All keys with further tokens start with prefix + SEP; the next
+        # possible character after SEP is SEP + 1
+        end = self._bisect(key + bytes([_SEP_BYTES[0] + 1]), start, hi)
+        return start, end, is_key
+
+
+class SharedLexicon(CompiledLexicon):
+    """Compiled lexicon in a `multiprocessing.shared_memory` block
+
+    A process creates the lexicon from a mapping with `SharedLexicon.create`. Other processes attach to it by name, which is what happens when a `SharedLexicon` is pickled and sent to a worker process (e.g. by `datasets.Dataset.map` with `num_proc`). The lexicon is stored only once per machine and all processes query it in place, with the same API as the dict it was created from.
+
+    The creating process owns the shared memory block and must free it with `close` (or by using the lexicon as a context manager) when all processes are done with it.
+
+    Example:
+
+    >>> with SharedLexicon.create({"daß": "dass"}, kind="1to1") as lexicon:
+    ...     pool.map(worker_function, [lexicon] * n)  # workers attach by name
+    """
+
+    def __init__(
+        self,
+        name: str,
+        cache_size: Optional[int] = 1 << 16,
+        tracker_pid: Optional[int] = None,
+    ) -> None:
+        """Attach to the shared lexicon `name`
+
+        `tracker_pid` is the PID of the resource tracker of the creating process, see `_open`.
+        """
+        self.name = name
+        self.path = name
+        self.cache_size = cache_size
+        self.tracker_pid = tracker_pid
+        self._owner = False
+        self._open()
+
+    @classmethod
+    def create(
+        cls,
+        mapping: Mapping[Key, Value],
+        kind: str,
+        info: Optional[Dict[str, Any]] = None,
+        cache_size: Optional[int] = 1 << 16,
+    ) -> "SharedLexicon":
+        """Serialize `mapping` into a new shared memory block
+
+        Tokens must not be empty or contain control characters (see `validate_mapping_files`), since these would break the order of the keys that `prefix_range` relies on.
+        """
+        for key, value in mapping.items():
+            tokens = [key] if isinstance(key, str) else list(key)
+            tokens += [value] if isinstance(value, str) else list(value)
+            if any(not t or min(t) < " " for t in tokens):
+                raise ValueError(
+                    f"Empty token or control character in mapping: {key!r} -> {value!r}"
+                )
+        chunks = _serialize_lexicon(mapping, kind, info)
+        shm = shared_memory.SharedMemory(
+            create=True, size=max(1, sum(len(chunk) for chunk in chunks))
+        )
+        buf = shm.buf
+        assert buf is not None
+        position = 0
+        for chunk in chunks:
+            buf[position : position + len(chunk)] = chunk  # noqa: E203
+            position += len(chunk)
+        lexicon = cls.__new__(cls)
+        lexicon.name = shm.name
+        lexicon.path = shm.name
+        lexicon.cache_size = cache_size
+        # Creating the block has started the resource tracker of this process
+        lexicon.tracker_pid = getattr(resource_tracker._resource_tracker, "_pid", None)
+        lexicon._owner = True
+        lexicon._shm = shm
+        lexicon._load_layout(buf)
+        return lexicon
+
+    def _open(self) -> None:
+        try:
+            # Python >= 3.13: only the creating process tracks the block
+            self._shm = shared_memory.SharedMemory(name=self.name, track=False)  # type: ignore
+        except TypeError:
+            shares_tracker = self._shares_resource_tracker()
+            self._shm = shared_memory.SharedMemory(name=self.name)
+            # A process with its own resource tracker would remove the block
+            # when it ends, even though the creating process still uses it.
+            # Forked and spawned children share the tracker of the creating
+            # process instead, and unregistering there would also drop the
+            # creator's registration (which frees the block if the creator
+            # crashes).
+            if not shares_tracker:
+                resource_tracker.unregister(self._shm._name, "shared_memory")  # type: ignore
+        buf = self._shm.buf
+        assert buf is not None
+        self._load_layout(buf)
+
+    def _shares_resource_tracker(self) -> bool:
+        """Does this process use the resource tracker of the creating process
+
+        Child processes inherit the connection to the tracker of their parent (with its PID if they are forked, without if they are spawned).
+        """
+        tracker = resource_tracker._resource_tracker
+        if getattr(tracker, "_fd", None) is None:
+            return False
+        pid = getattr(tracker, "_pid", None)
+        return pid is None or pid == self.tracker_pid
+
+    def close(self) -> None:
+        """Detach from the shared memory block, and free it if this process created it"""
+        self._release_buffer()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self) -> "SharedLexicon":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "path": self.name,
+            "cache_size": self.cache_size,
+            "tracker_pid": self.tracker_pid,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._owner = False
+        self._open()
+
+
+def share_mapping(
+    mapping: Mapping[Any, Any], kind: str, cache_size: Optional[int] = 1 << 16
+) -> CompiledLexicon:
+    """Return a version of `mapping` that can be shared by multiple processes without copying
+
+    Compiled lexicons are already shared, since all processes map the same file. All other mappings are copied into a `SharedLexicon`.
+    """
+    if isinstance(mapping, CompiledLexicon):
+        return mapping
+    return SharedLexicon.create(mapping, kind, cache_size=cache_size)
+
+
+class LexiconNgramMatcher(NgramMatcher):
+    """`NgramMatcher` for the keys of a compiled "ntom" lexicon
+
+    Instead of building an automaton from all keys (which would defeat the purpose of a lexicon that is opened in milliseconds), matches are found by extending n-grams token by token from every start position and narrowing the range of candidate keys in the sorted key table. The search from a start position stops as soon as no key begins with the current n-gram.
+    """
+
+    def __init__(self, lexicon: CompiledLexicon) -> None:
+        self.lexicon = lexicon
+        self._max_length = max(lexicon.ngram_lengths, default=0)
+
+    def __len__(self) -> int:
+        return len(self.lexicon)
+
+    def __contains__(self, ngram: Sequence[str]) -> bool:
+        return len(ngram) > 0 and tuple(ngram) in self.lexicon
+
+    def iter_matches(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int]]:
+        """Yield the `(start, length)` of every occurrence of an n-gram in `tokens`, ordered by start position"""
+        for start in range(len(tokens)):
+            lo, hi = 0, len(self.lexicon)
+            for length in range(1, min(self._max_length, len(tokens) - start) + 1):
+                token = tokens[start + length - 1]
+                if not token or min(token) < " ":
+                    break
+                lo, hi, is_key = self.lexicon.prefix_range(
+                    tokens[start : start + length], lo, hi  # noqa: E203
+                )
+                if is_key:
+                    yield start, length
+                if hi - lo <= int(is_key):
+                    break
+
+
+def find_compiled_lexicon(files: Sequence[Union[str, os.PathLike]]) -> Optional[str]:
+    """Return the path of the compiled lexicon in `files` or None if `files` are text mapping files
+
+    A compiled lexicon cannot be combined with other mapping files (compile them into a single lexicon instead).
+    """
+    compiled = [str(f) for f in files if is_compiled_lexicon(f)]
+    if not compiled:
+        return None
+    if len(files) > 1:
+        raise ValueError(
+            f"A compiled lexicon must be the only mapping file, got: {list(files)}"
+        )
+    return compiled[0]
+
+
+def load_compiled_lexicon(path: Union[str, os.PathLike], kind: str) -> CompiledLexicon:
+    """Open a compiled lexicon and check that it is of type `kind`"""
+    lexicon = CompiledLexicon(path)
+    if lexicon.kind != kind:
+        raise ValueError(
+            f"Lexicon '{path}' is of kind '{lexicon.kind}', expected '{kind}'"
+        )
+    return lexicon
@@ -1,12 +1,15 @@
-import glob
 import os
 import re
-from typing import List, Optional, Tuple, Union
+import tempfile
+from typing import Generator, Iterable, List, Optional, Tuple, Union
 
 import datasets
+import pyarrow as pa
+from datasets.table import InMemoryTable
 from lxml import etree
 
 from transnormer_data import utils
+from transnormer_data.archive import Document, document_name, open_document
 from transnormer_data.maker.dta_maker import DtaMaker
 from transnormer_data.modifier.vanilla_dta_modifier import VanillaDtaModifier
 
@@ -19,21 +22,50 @@ class DtaEvalMaker(DtaMaker):
         path_data: Union[str, os.PathLike],
         path_metadata: Union[str, os.PathLike],
         path_output: Union[str, os.PathLike],
+        jobs: int = 1,
     ) -> None:
-        """Initialize the maker with paths to the data files, metadata file and output directory"""
-        super().__init__(path_data, path_metadata, path_output)
+        """Initialize the maker with paths to the data files, metadata file and output directory
+
+        With `jobs` > 1 (or 0 for one per CPU), each XML file is processed by one of a pool of worker processes. The workers write their records to Arrow files in a temporary directory, from which the parent process reads the returned dataset. The returned dataset and the saved files are identical to the sequential run.
+        """
+        super().__init__(path_data, path_metadata, path_output, jobs=jobs)
 
         self._modifier: Optional[VanillaDtaModifier] = None
 
+        # Whether the workers save their output, set by `make`
+        self._save = False
+        # Directory for the Arrow files of the workers, set by `make`
+        self._shard_dir: Optional[str] = None
+        self._num_shards = 0
+
     def make(self, save: bool = False) -> datasets.Dataset:
         """Create a datasets.Dataset object from the paths passed to the constructor.
 
         Pass `save=True` to save the dataset in JSONL format to the output directory that was passed to the constructor. If the directory does not exists, it will be created.
         """
-        self._metadata = self._load_metadata()
-        self._dataset = self._load_data()
-        self._dataset = self._join_data_and_metadata(join_on="basename")
+        self._metadata = {}
+        self._metadata_index = self._load_metadata_index()
         self._modifier = VanillaDtaModifier()
+        if self.jobs > 1:
+            self._save = save
+            if save and not os.path.isdir(self.path_output):
+                os.makedirs(self.path_output)
+            with tempfile.TemporaryDirectory() as shard_dir:
+                self._shard_dir = shard_dir
+                paths = self._make_documents_in_parallel(self._iter_documents())
+                tables = []
+                for path in paths:
+                    with pa.OSFile(path, "rb") as source:
+                        tables.append(pa.ipc.open_stream(source).read_all())
+            self._shard_dir = None
+            if tables:
+                self._dataset = datasets.Dataset(
+                    InMemoryTable(pa.concat_tables(tables))
+                )
+                return self._dataset
+        # Without documents, the parallel path returns the same empty dataset
+        self._dataset = self._load_data(files=[] if self.jobs > 1 else None)
+        self._dataset = self._join_data_and_metadata(join_on="basename")
         self._dataset = self._modifier.modify_dataset(self._dataset)
         if save:
             if not os.path.isdir(self.path_output):
@@ -43,22 +75,44 @@ class DtaEvalMaker(DtaMaker):
             )
         return self._dataset
 
-    def _load_data(self) -> datasets.Dataset:
+    def _make_document(self, document: Document) -> str:
+        """Create (and optionally save) the dataset for a single XML file (in a worker process) and write its records to an Arrow file in `self._shard_dir`, whose path is returned"""
+        assert self._modifier is not None and self._shard_dir is not None
+        self._dataset = self._load_data(files=[document])
+        self._dataset = self._join_data_and_metadata(join_on="basename")
+        self._dataset = self._modifier.modify_dataset(self._dataset)
+        if self._save:
+            utils.save_dataset_to_json_grouped_by_property(
+                self._dataset, property="basename", path_outdir=self.path_output
+            )
+        self._num_shards += 1
+        path = os.path.join(self._shard_dir, f"{os.getpid()}-{self._num_shards}.arrow")
+        table = self._dataset.data.table
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        return path
+
+    def _load_data(
+        self, files: Optional[Iterable[Document]] = None
+    ) -> datasets.Dataset:
         """
-        Reads from a DTA EvalCorpus XML file into a dataset
+        Reads from DTA EvalCorpus XML files into a dataset
 
+        Reads all files (or archive members) in `self.path_data`, unless a list of `files` is given.
         """
+        if files is None:
+            files = self._iter_documents()
         basenames = []
         sents_orig_tok = []
         sents_norm_tok = []
         sents_is_bad = []
         sents_orig_tokclass = []
         par_idxs = []
-        for fname_in in glob.iglob(os.path.join(self.path_data, "*"), recursive=True):
-            basename = utils.get_basename_no_ext(fname_in)
-            tree = etree.parse(fname_in)
+        for fname_in in files:
+            basename = utils.get_basename_no_ext(document_name(fname_in))
             # sentences
-            for i, s in enumerate(tree.iterfind("//s")):
+            for i, s in enumerate(self._iter_sentence_elements(fname_in)):
                 (
                     sent_orig_tok,
                     sent_norm_tok,
@@ -93,6 +147,25 @@ class DtaEvalMaker(DtaMaker):
             }
         )
 
+    @staticmethod
+    def _iter_sentence_elements(
+        fname_in: Document,
+    ) -> Generator[etree._Element, None, None]:
+        """Incrementally parse a DTA EvalCorpus XML file (or archive member) and yield its <s> elements
+
+        Every <s> element is yielded when its end tag has been parsed. Sentences that have already been processed are cleared and removed from the tree, together with the preceding siblings of the sentence and of all its ancestors (e.g. finished <p> and <div> elements), so that memory stays flat regardless of the size of the document.
+        """
+        with open_document(fname_in) as f:
+            for _, s in etree.iterparse(f, events=("end",), tag="s"):
+                elem = s
+                parent = elem.getparent()
+                while parent is not None:
+                    while elem.getprevious() is not None:
+                        del parent[0]
+                    elem, parent = parent, parent.getparent()
+                yield s
+                s.clear(keep_tail=True)
+
     def _create_example_from_s(
         self, s: etree.Element
     ) -> Tuple[List[str], List[str], List[str]]:
@@ -109,7 +182,7 @@ class DtaEvalMaker(DtaMaker):
         sent_norm_tok = []
         sent_orig_tokclass = []
         # Iterate over first <w> under <s>
-        for w in s.xpath("./w"):
+        for w in s.iterfind("w"):
             # 1. Filter tokens that have no @old version (= rare errors)
             try:
                 orig = w.attrib["old"]
@@ -127,10 +200,9 @@ class DtaEvalMaker(DtaMaker):
             # Get inner w-nodes for orig and outer w-node for norm
             if w.attrib["class"] == "JOIN":
                 # get the orig tokens and annos
-                tokens = [inner_w.attrib["old"] for inner_w in list(w.iterfind("w"))]
-                tokclass_annos = [
-                    inner_w.attrib["class"] for inner_w in list(w.iterfind("w"))
-                ]
+                inner_ws = list(w.iterfind("w"))
+                tokens = [inner_w.attrib["old"] for inner_w in inner_ws]
+                tokclass_annos = [inner_w.attrib["class"] for inner_w in inner_ws]
                 tokens_mod = self.join_wrongly_splitted_tokens(tokens)
 
                 # If tokens changed, adapt the annotations: use default for remaining token(s)
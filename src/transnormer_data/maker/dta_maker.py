@@ -1,11 +1,54 @@
+import collections
 import json
+import multiprocessing
+import multiprocessing.util
 import os
-from typing import Dict, List, Optional, Union
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Union
 
 import datasets
+import pyarrow as pa
+import pyarrow.compute as pc
+from datasets.table import InMemoryTable
 
+from transnormer_data.archive import Document, close_archives, iter_documents
 from transnormer_data.base_maker import BaseMaker
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.metadata_index import MetadataIndex, default_index_path
+
+# Properties of a record in the DTA metadata JSONL files, in their original order
+METADATA_FIELDS = [
+    "date_",
+    "author",
+    "basename",
+    "bibl",
+    "collection",
+    "firstDate",
+    "textClass",
+    "title",
+]
+
+# Identifies `DtaMaker._normalize_metadata_record` in compiled metadata indexes,
+# bump the version when the normalization changes
+METADATA_TRANSFORM_TAG = "DtaMaker._normalize_metadata_record:1"
+
+# Maker instance of a worker process, set by _init_worker
+_worker_maker: Optional["DtaMaker"] = None
+
+
+def _init_worker(maker: "DtaMaker") -> None:
+    """Initializer for the worker processes of `DtaMaker._make_documents_in_parallel`"""
+    global _worker_maker
+    _worker_maker = maker
+    # Close the archives that the worker has opened when it exits
+    multiprocessing.util.Finalize(None, close_archives, exitpriority=0)
+
+
+def _make_document_in_worker(document: Document) -> Any:
+    assert _worker_maker is not None
+    return _worker_maker._make_document(document)
 
 
 class DtaMaker(BaseMaker):
@@ -14,19 +57,72 @@ class DtaMaker(BaseMaker):
     def __init__(
         self,
         path_data: Union[str, os.PathLike],
-        path_metadata: Union[str, os.PathLike],
+        path_metadata: Optional[Union[str, os.PathLike]],
         path_output: Union[str, os.PathLike],
+        jobs: int = 1,
     ) -> None:
-        """Initialize the maker with paths to the data files, metadata file and output directory"""
+        """Initialize the maker with paths to the data files, metadata file and output directory
+
+        `path_data` is either a directory or a tar (optionally compressed) or zip archive that contains the data files. Archive members are read directly from the archive, see `transnormer_data.archive.iter_documents`.
+
+        The metadata file can be a JSONL file or a metadata index that was compiled from it (see `_load_metadata_index`). Makers whose input files carry their own metadata accept None instead.
+
+        `jobs` is the number of worker processes that create the documents in parallel (default: 1, i.e. no parallelism). Pass 0 to use one process per CPU.
+        """
         self.path_data = path_data
         self.path_metadata = path_metadata
         self.path_output = path_output
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
 
         self._dataset: Optional[datasets.Dataset] = None
+        # Metadata records of the processed documents, filled from the index
         self._metadata: Optional[Dict[str, Dict]] = None
+        self._metadata_index: Optional[MetadataIndex] = None
 
         self._modifier: Optional[BaseDatasetModifier] = None
 
+    def _iter_documents(self) -> Iterator[Document]:
+        """Yield the input documents (files or archive members) from `self.path_data`
+
+        Zip archives that have been opened to read the documents are closed when the iteration is finished.
+        """
+        try:
+            yield from iter_documents(self.path_data)
+        finally:
+            close_archives()
+
+    def _make_document(self, document: Document) -> Any:
+        """Create (and save) the output for a single input document"""
+        raise NotImplementedError
+
+    def _make_documents_in_parallel(self, documents: Iterable[Document]) -> List[Any]:
+        """Run `_make_document` for each document in a pool of `self.jobs` worker processes
+
+        The maker - including its metadata and modifier - is handed to the workers once, when they are started. Where the platform supports it, workers are forked, so that the metadata is shared with the parent process instead of being copied. The results are returned in the order of `documents`.
+
+        Documents are submitted lazily, with at most two pending documents per worker. This way, the members of a tar archive, which are read sequentially by the parent process, are never all held in memory at once.
+        """
+        context: BaseContext
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        with ProcessPoolExecutor(
+            max_workers=self.jobs,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self,),
+        ) as executor:
+            results = []
+            pending: Deque[Future] = collections.deque()
+            for document in documents:
+                pending.append(executor.submit(_make_document_in_worker, document))
+                if len(pending) >= 2 * self.jobs:
+                    results.append(pending.popleft().result())
+            while pending:
+                results.append(pending.popleft().result())
+            return results
+
     def _load_metadata(self) -> Dict[str, Dict]:
         """
         Create a metadata_mapper (example below) from JSONL file.
@@ -60,20 +156,12 @@ class DtaMaker(BaseMaker):
         }
 
         """
+        assert self.path_metadata is not None
         metadata_mapper = {}
 
         with open(self.path_metadata, "r", encoding="utf-8") as f:
             for line in f:
-                record = json.loads(line)
-
-                # Assert that the two dates are identical, keep only one, change the variable name
-                assert record["date_"] == record["firstDate"]
-                record["date"] = int(record["firstDate"])
-                record.pop("date_")
-                record.pop("firstDate")
-                record.pop("bibl")
-                record.pop("collection")
-                record["genre"] = record.pop("textClass")
+                record = self._normalize_metadata_record(json.loads(line))
 
                 # Make entry to metadata_mapper
                 id = record["basename"]
@@ -82,35 +170,115 @@ class DtaMaker(BaseMaker):
 
         return metadata_mapper
 
-    def _join_data_and_metadata(self, join_on: str) -> datasets.Dataset:
-        """Join the metadata (stored in dictionary) with the data (stored in dataset) on a key ('join_on') that is contained in both"""
-        assert self._metadata is not None and self._dataset is not None
-        # new_columns
-        # the following assumes all metadat entries have the same structure
-        new_columns: Dict[str, List] = {
-            key: [] for key in list(self._metadata.values())[0] if key != join_on
-        }
-        # Get the column to join metadata and data on, e.g. "basename"
-        join_column = self._dataset[join_on]
-
-        for entry in join_column:
-            # metadata dictionary for a specific property value
-            # e.g. for basename=='fontane_stechlin_1899'
-            try:
-                metadata = self._metadata[entry]
-            except KeyError as e:
-                print(e, f"{entry} not in metadata dictionary - check metadata file")
+    @classmethod
+    def _select_metadata_fields(cls, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a metadata record in the JSONL input format (see `_load_metadata`) from a larger collection of metadata, e.g. the metadata header of a ddctabs file"""
+        try:
+            return {field: metadata[field] for field in METADATA_FIELDS}
+        except KeyError as e:
+            raise KeyError(f"Metadata field {e} is missing for: {metadata}")
+
+    @staticmethod
+    def _normalize_metadata_record(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a DTA metadata record to the output format (see `_load_metadata`)"""
+        # Assert that the two dates are identical, keep only one, change the variable name
+        assert record["date_"] == record["firstDate"]
+        record["date"] = int(record["firstDate"])
+        record.pop("date_")
+        record.pop("firstDate")
+        record.pop("bibl")
+        record.pop("collection")
+        record["genre"] = record.pop("textClass")
+        return record
+
+    def _load_metadata_index(self) -> MetadataIndex:
+        """
+        Open the compiled metadata index for `self.path_metadata`
+
+        `self.path_metadata` can either be a compiled index (file extension ".sqlite") or a JSONL metadata file. In the latter case, the JSONL file is compiled into an index the first time (see `MetadataIndex.open_or_build`) and the index is re-used by later runs. Records are only read from the index when a document is processed.
+        """
+        assert self.path_metadata is not None
+        if str(self.path_metadata).endswith(".sqlite"):
+            return MetadataIndex(self.path_metadata)
+        try:
+            return MetadataIndex.open_or_build(
+                self.path_metadata,
+                transform=self._normalize_metadata_record,
+                transform_tag=METADATA_TRANSFORM_TAG,
+            )
+        except OSError:
+            # Cache directory is not writable
+            return MetadataIndex.open_or_build(
+                self.path_metadata,
+                path_index=default_index_path(
+                    self.path_metadata, tempfile.gettempdir()
+                ),
+                transform=self._normalize_metadata_record,
+                transform_tag=METADATA_TRANSFORM_TAG,
+            )
+
+    def _get_metadata(self, key: str) -> Dict[str, Any]:
+        """Return the metadata record for a document, e.g. for basename=='fontane_stechlin_1899'
+
+        Records are read from the metadata index once per document and cached in `self._metadata`.
+        """
+        if self._metadata is None:
+            self._metadata = {}
+        if key not in self._metadata:
+            record = None
+            if self._metadata_index is not None:
+                record = self._metadata_index.get(key)
+            if record is None:
+                e = KeyError(key)
+                print(e, f"{key} not in metadata dictionary - check metadata file")
                 raise e
-            for key, value in metadata.items():
-                if key != join_on:
-                    new_columns[key].append(value)
+            self._metadata[key] = record
+        return self._metadata[key]
 
-        # Append new columns to dataset
-        for name, column in new_columns.items():
-            self._dataset = self._dataset.add_column(name, column)
+    def _join_data_and_metadata(self, join_on: str) -> datasets.Dataset:
+        """Join the metadata with the data (stored in dataset) on a key ('join_on') that is contained in both
 
+        The join is done in one step on the dataset's Arrow table: the metadata records of the distinct keys are collected into a small table, whose rows are then taken for every row of the dataset and appended as new columns.
+        """
+        assert self._dataset is not None
+        table = self._dataset.data.table
+        join_column = table[join_on]
+        # Get the metadata for each distinct key (in order of first occurrence)
+        keys = pc.unique(join_column).to_pylist()
+        if not keys:
+            return self._dataset
+        metadata_table = pa.Table.from_pylist(
+            [
+                {
+                    name: value
+                    for name, value in self._get_metadata(key).items()
+                    if name != join_on
+                }
+                for key in keys
+            ]
+        )
+        indices = pc.index_in(join_column, value_set=pa.array(keys))
+        metadata_columns = metadata_table.take(indices)
+        for name, column in zip(
+            metadata_columns.column_names, metadata_columns.columns
+        ):
+            table = table.append_column(name, column)
+        self._dataset = datasets.Dataset(InMemoryTable(table))
         return self._dataset
 
+    def _add_metadata_to_record(
+        self, record: Dict[str, Any], join_on: str
+    ) -> Dict[str, Any]:
+        """Join the metadata with a single record on a key ('join_on') that is contained in both
+
+        Record-level counterpart of `_join_data_and_metadata`: the metadata properties are appended to the record in the same order as the columns that `_join_data_and_metadata` adds to the dataset.
+        """
+        metadata = self._get_metadata(record[join_on])
+        for key, value in metadata.items():
+            if key != join_on:
+                record[key] = value
+        return record
+
     @staticmethod
     def join_wrongly_splitted_tokens(tokens: List[str]) -> List[str]:
         """Joins strings in a list that should actually be a single string
@@ -1,56 +1,80 @@
-import glob
+import itertools
 import os
-import re
-from typing import List, Tuple, Union
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple, Union
 
 import datasets
 
 from transnormer_data import utils
+from transnormer_data.archive import Document, document_name, open_document
+from transnormer_data.ddctabs_reader import DdcTabsReader
 from transnormer_data.maker.dta_maker import DtaMaker
 from transnormer_data.modifier.vanilla_dta_modifier import VanillaDtaModifier
 
 
 class DtakMaker(DtaMaker):
-    """An object that creates a dataset in the transnormer format from the DTAK Corpus in its original ddctabs format, plus metadata in JSONL format"""
+    """An object that creates a dataset in the transnormer format from the DTAK Corpus in its original ddctabs format, plus metadata in JSONL format or from the ddctabs headers"""
 
     def __init__(
         self,
         path_data: Union[str, os.PathLike],
-        path_metadata: Union[str, os.PathLike],
+        path_metadata: Optional[Union[str, os.PathLike]],
         path_output: Union[str, os.PathLike],
         merge_into_single_dataset: bool = False,
+        streaming: bool = False,
+        batch_size: int = 1000,
+        jobs: int = 1,
     ) -> None:
         """Initialize the maker with paths to the data files, metadata file and output directory
 
+        Pass None as `path_metadata` to take the metadata from the `%%$DDC:meta.*` header lines of each ddctabs file instead of a separate metadata file. The header fields are converted with the same rules as the records of a metadata file (see `DtaMaker._load_metadata`). This way, no global metadata has to be loaded and every document can be processed on its own.
+
         Set `merge_into_single_dataset` to True (default: False) when you have a small dataset. Per default we expect the DTAK dataset to be too large to put all incoming documents into a single dataset that is then processed as one. Instead we produce create and save individual dataset objects and run the processing separately on each one of them. Whether `merge_into_single_dataset` is True or False does not make a difference to the saved output files. This is also why, in the future, we might remove the option to merge all incoming files into a single dataset.
+
+        Set `streaming` to True (default: False) to skip building datasets.Dataset objects altogether. Sentences are then parsed one at a time, joined with their metadata, modified in batches of `batch_size` records and written to the output files right away, so that peak memory depends on `batch_size` and not on the size of the corpus. The saved output files are identical to the non-streaming mode. In streaming mode, `merge_into_single_dataset` is ignored.
+
+        With `jobs` > 1 (or 0 for one per CPU), the documents are processed by a pool of worker processes. Each worker parses, modifies and saves one ddctabs file at a time, so the output files are identical to the sequential run. `merge_into_single_dataset` is ignored in this case as well.
         """
-        super().__init__(path_data, path_metadata, path_output)
+        super().__init__(path_data, path_metadata, path_output, jobs=jobs)
 
         # Do we put the incoming data into a single - potentially large - dataset
         # or do we create a new dataset for every incoming document and reset it
         # after it was saved
         self.merge_into_single_dataset = merge_into_single_dataset
 
+        # Do we skip the dataset creation and write records as they are parsed
+        self.streaming = streaming
+        self.batch_size = batch_size
+
+        # Whether the workers save their output, set by `make`
+        self._save = True
+
     def make(self, save: bool = True) -> None:
         """Create a datasets.Dataset object from the paths passed to the constructor.
 
         Pass `save=True` to save the dataset in JSONL format to the output directory that was passed to the constructor. If the directory does not exists, it will be created.
         """
-        self._metadata = self._load_metadata()
+        self._metadata = {}
+        if self.path_metadata is not None:
+            self._metadata_index = self._load_metadata_index()
         self._modifier = VanillaDtaModifier()
 
+        if self.jobs > 1:
+            self._save = save
+            self._make_documents_in_parallel(self._iter_documents())
+            return
+
+        if self.streaming:
+            self._make_streaming(self._iter_documents(), save=save)
+            return
+
+        files_list: Iterable[List[Document]]
         if self.merge_into_single_dataset:
-            files_list: List[List[str]] = [
-                glob.glob(os.path.join(self.path_data, "*"), recursive=True)
-            ]  # len = 1
+            files_list = [list(self._iter_documents())]  # len = 1
         # Will overwrite self._dataset with every iteration
         else:
-            files_list = [
-                [fname]
-                for fname in glob.iglob(
-                    os.path.join(self.path_data, "*"), recursive=True
-                )
-            ]  # len = number of files
+            files_list = (
+                [document] for document in self._iter_documents()
+            )  # len = number of files
 
         for files in files_list:
             self._dataset = self._load_data(files=files)
@@ -63,7 +87,59 @@ class DtakMaker(DtaMaker):
                     self._dataset, property="basename", path_outdir=self.path_output
                 )
 
-    def _load_data(self, files: List[str]) -> datasets.Dataset:
+    def _make_document(self, document: Document) -> None:
+        """Create and save the output for a single ddctabs file (in a worker process)"""
+        if self.streaming:
+            self._make_streaming([document], save=self._save)
+            return
+        self._dataset = self._load_data(files=[document])
+        self._dataset = self._join_data_and_metadata(join_on="basename")
+        assert self._modifier is not None
+        self._dataset = self._modifier.modify_dataset(self._dataset)
+        if self._save:
+            if not os.path.isdir(self.path_output):
+                os.makedirs(self.path_output, exist_ok=True)
+            utils.save_dataset_to_json_grouped_by_property(
+                self._dataset, property="basename", path_outdir=self.path_output
+            )
+        self._dataset = None
+
+    def _make_streaming(self, files: Iterable[Document], save: bool = True) -> None:
+        """Parse, modify and save the records from `files` without creating a dataset
+
+        Only a single batch of `self.batch_size` records is held in memory at a time.
+        """
+        if save and not os.path.isdir(self.path_output):
+            os.makedirs(self.path_output, exist_ok=True)
+        records = (
+            self._add_metadata_to_record(record, join_on="basename")
+            for fname_in in files
+            for record in self._iter_sentences(fname_in)
+        )
+        records = self._modify_in_batches(records)
+        if save:
+            utils.save_dataset_to_json_grouped_by_property(
+                records, property="basename", path_outdir=self.path_output
+            )
+        else:
+            for _ in records:
+                pass
+
+    def _modify_in_batches(
+        self, records: Iterable[Dict[str, Any]]
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Apply the maker's modifier to the records, one batch of `self.batch_size` records at a time"""
+        assert self._modifier is not None
+        records = iter(records)
+        while True:
+            batch = list(itertools.islice(records, self.batch_size))
+            if not batch:
+                break
+            for record in batch:
+                self._modifier.modify_sample(record)
+            yield from batch
+
+    def _load_data(self, files: Iterable[Document]) -> datasets.Dataset:
         """
         Reads data from a DTA ddctabs file into a dataset
 
@@ -78,112 +154,15 @@ class DtakMaker(DtaMaker):
         sents_norm_tok: List[List[str]] = []
         par_idxs = []
         for fname_in in files:
-            basename = utils.get_basename_no_ext(fname_in)
-            par_idx = 0  # reset paragraph index for every document
-
-            columns = {}  # column tab index
-            attrs = []  # tabs per line
-            in_s = False  # within sentence (= not first token of sentence)
-
-            # initialize single sent lists
-            sent_orig_tok: List[str] = []
-            sent_orig_xlit: List[str] = []
-            sent_orig_lemma: List[str] = []
-            sent_orig_pos: List[str] = []
-            sent_orig_ws: List[bool] = []
-            sent_norm_tok: List[str] = []
-
-            with open(fname_in, "r", encoding="utf8") as fh:
-                for line in fh:
-                    line = line.strip()
-
-                    # (A) Metadata line
-                    if line.startswith("%%$DDC:index["):
-                        match = re.split(" |=", line.strip())
-
-                        # Check if re.search returned a match
-                        search_result = re.search(r"\d+", match[0])
-                        if search_result:
-                            try:
-                                i = int(search_result[0])
-                            except (TypeError, IndexError):
-                                # Handle the case where match[0] is None or not indexable
-                                raise Exception(
-                                    "Couldn't parse ddc-tabs input file correctly."
-                                )
-                        else:
-                            # Handle the case where re.search returned None
-                            raise Exception(
-                                "Couldn't find a digit in the specified pattern."
-                            )
-                        long = match[1]
-                        short = match[2]
-                        if long == "Token" or short == "w":
-                            columns["xlit"] = i
-                        elif long == "Utf8" or short == "u":
-                            columns["original"] = i
-                        elif long == "CanonicalToken" or short == "v":
-                            columns["normalized"] = i
-                        elif long == "Pos" or short == "p":
-                            columns["pos"] = i
-                        elif long == "Lemma" or short == "l":
-                            columns["lemma"] = i
-                        elif long == "WordSept" or short == "ws":
-                            columns["ws"] = i
-
-                    # (B) Token line: inside sentence
-                    elif not line.startswith("%%") and line:
-                        # 1. Get tokens/annotations
-                        attrs = line.split("\t")
-                        orig = attrs[columns["original"]]
-                        orig_xlit = attrs[columns["xlit"]]
-                        orig_lemma = attrs[columns["lemma"]]
-                        orig_pos = attrs[columns["pos"]]
-                        orig_ws = (
-                            bool(int(attrs[columns["ws"]])) if in_s else False
-                        )  # always false for first token in sentence
-                        norm = attrs[columns["normalized"]]
-
-                        # 2. Default modification: Replace the pre-normalized punctuation  # on norm layer with the original unnormalized punctuation
-                        # Look at POS-annotations for that
-                        if orig_pos.startswith("$"):  # STTS-Tags "$,", "$.", "$("
-                            norm = orig
-
-                        # 3. Add to sentence list
-                        sent_orig_tok.append(orig)
-                        sent_orig_xlit.append(orig_xlit)
-                        sent_orig_lemma.append(orig_lemma)
-                        sent_orig_pos.append(orig_pos)
-                        sent_orig_ws.append(orig_ws)
-
-                        # 4. Split norm token at "_"
-                        norm_split, _ = self.custom_split(norm)
-                        sent_norm_tok.extend(norm_split)
-
-                        # Set in-sentence flag
-                        in_s = True
-
-                    # (C) Empty line: end of sentence
-                    elif line.strip() == "":
-                        # Append single sentences to sentences lists
-                        par_idxs.append(par_idx)
-                        basenames.append(basename)
-                        sents_orig_tok.append(sent_orig_tok)
-                        sents_orig_xlit.append(sent_orig_xlit)
-                        sents_orig_lemma.append(sent_orig_lemma)
-                        sents_orig_pos.append(sent_orig_pos)
-                        sents_orig_ws.append(sent_orig_ws)
-                        sents_norm_tok.append(sent_norm_tok)
-
-                        # Reset
-                        in_s = False
-                        par_idx += 1
-                        sent_orig_tok = []
-                        sent_orig_xlit = []
-                        sent_orig_lemma = []
-                        sent_orig_pos = []
-                        sent_orig_ws = []
-                        sent_norm_tok = []
+            for sent in self._iter_sentences(fname_in):
+                par_idxs.append(sent["par_idx"])
+                basenames.append(sent["basename"])
+                sents_orig_tok.append(sent["orig_tok"])
+                sents_orig_xlit.append(sent["orig_xlit"])
+                sents_orig_lemma.append(sent["orig_lemma"])
+                sents_orig_pos.append(sent["orig_pos"])
+                sents_orig_ws.append(sent["orig_ws"])
+                sents_norm_tok.append(sent["norm_tok"])
 
         length = len(basenames)
         assert (
@@ -208,10 +187,69 @@ class DtakMaker(DtaMaker):
             }
         )
 
+    def _iter_sentences(
+        self, fname_in: Document
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        Lazily reads the sentences from a single DTA ddctabs file (or archive member)
+
+        Every sentence is yielded as a record that has the same properties (and property order) as a row of the dataset created by `_load_data`.
+        """
+        basename = utils.get_basename_no_ext(document_name(fname_in))
+        with open_document(fname_in, encoding="utf8") as fh:
+            yield from self._iter_records(basename, DdcTabsReader(fh))
+
+    def _iter_records(
+        self, basename: str, reader: DdcTabsReader
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Convert the sentences from a ddctabs reader to records, see `_iter_sentences`"""
+        for sent in reader:
+            # Metadata from the header is complete when the first sentence is read
+            if sent.idx == 0 and self.path_metadata is None:
+                self._set_metadata_from_header(basename, reader.meta)
+            columns = sent.columns
+            sent_orig_tok: List[str] = columns["orig"]
+            sent_orig_pos: List[str] = columns["pos"]
+            # always false for first token in sentence
+            sent_orig_ws: List[bool] = columns["ws"]
+            if sent_orig_ws:
+                sent_orig_ws[0] = False
+
+            sent_norm_tok: List[str] = []
+            for orig, orig_pos, norm in zip(
+                sent_orig_tok, sent_orig_pos, columns["norm"]
+            ):
+                # Default modification: Replace the pre-normalized punctuation
+                # on norm layer with the original unnormalized punctuation
+                # Look at POS-annotations for that
+                if orig_pos.startswith("$"):  # STTS-Tags "$,", "$.", "$("
+                    norm = orig
+                # Split norm token at "_"
+                sent_norm_tok.extend(norm.split("_"))
+
+            yield {
+                "basename": basename,
+                "par_idx": sent.idx,
+                "orig_tok": sent_orig_tok,
+                "orig_xlit": columns["xlit"],
+                "orig_lemma": columns["lemma"],
+                "orig_pos": sent_orig_pos,
+                "orig_ws": sent_orig_ws,
+                "norm_tok": sent_norm_tok,
+                "norm_ws": None,
+            }
+
+    def _set_metadata_from_header(self, basename: str, meta: Dict[str, str]) -> None:
+        """Store the metadata from a ddctabs header as the metadata of the document `basename`"""
+        if self._metadata is None:
+            self._metadata = {}
+        record = self._normalize_metadata_record(self._select_metadata_fields(meta))
+        self._metadata[basename] = record
+
     @staticmethod
     def custom_split(input_string: str) -> Tuple[List[str], bool]:
         """Returns the list of token(s) and True if there actually was a split"""
         if "_" in input_string:
-            return re.split(r"_", input_string), True
+            return input_string.split("_"), True
         else:
             return [input_string], False
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+# Bump this when the layout of the index changes
+INDEX_VERSION = "2"
+
+
+def default_index_path(
+    path_jsonl: Union[str, os.PathLike], directory: Optional[str] = None
+) -> str:
+    """Path of the index for `path_jsonl` in `directory` (default: "transnormer_data/metadata" in the user's cache directory, `$XDG_CACHE_HOME` or "~/.cache")
+
+    The file name contains a hash of the absolute path of `path_jsonl`, so that different metadata files with the same name do not share an index, e.g. "/data/dtak/metadata.jsonl" -> "metadata-3f2a...c1.index.sqlite".
+    """
+    if directory is None:
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        directory = os.path.join(cache_home, "transnormer_data", "metadata")
+    path_abs = os.path.abspath(path_jsonl)
+    digest = hashlib.sha256(path_abs.encode("utf-8")).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(path_abs))[0]
+    return os.path.join(directory, f"{stem}-{digest}.index.sqlite")
+
+
+class MetadataIndex(object):
+    """Read-only sqlite index of metadata records, keyed by a document identifier (e.g. "basename")
+
+    The index is compiled once from a JSONL metadata file with `MetadataIndex.build` and can then be queried lazily for single documents, so that a maker that only processes a handful of documents does not have to parse the entire metadata file.
+
+    Records are stored as JSON strings, i.e. the order of their properties is preserved.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        """Open an existing index file"""
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Metadata index does not exist: '{path}'")
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        # Process that opened the connection
+        self._pid: Optional[int] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections cannot be pickled, they are re-opened on demand
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared with forked processes
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(
+                f"file:{os.fspath(self.path)}?mode=ro", uri=True
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    @classmethod
+    def build(
+        cls,
+        path_jsonl: Union[str, os.PathLike],
+        path_index: Union[str, os.PathLike],
+        key: str = "basename",
+        transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        transform_tag: Optional[str] = None,
+    ) -> "MetadataIndex":
+        """Compile the JSONL file `path_jsonl` into an index at `path_index`
+
+        `transform` is applied to every record before it is stored. If there are multiple records with the same `key`, the first one is kept. `transform_tag` identifies the transform in the info of the index, see `transform_signature`.
+
+        The index is written to a temporary file first and then moved to `path_index`, so that processes that build the same index concurrently do not see partial files. Missing directories of `path_index` are created.
+        """
+        dirname = os.path.dirname(os.path.abspath(path_index))
+        os.makedirs(dirname, exist_ok=True)
+        fd, path_tmp = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        os.close(fd)
+        # mkstemp creates the file with mode 0600, use the default permissions instead
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(path_tmp, 0o666 & ~umask)
+        try:
+            connection = sqlite3.connect(path_tmp)
+            with connection:
+                connection.execute(
+                    "CREATE TABLE metadata (key TEXT PRIMARY KEY, record TEXT NOT NULL)"
+                )
+                connection.execute(
+                    "CREATE TABLE info (name TEXT PRIMARY KEY, value TEXT)"
+                )
+                with open(path_jsonl, "r", encoding="utf-8") as f:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO metadata VALUES (?, ?)",
+                        cls._records_to_rows(f, key, transform),
+                    )
+                connection.executemany(
+                    "INSERT INTO info VALUES (?, ?)",
+                    [
+                        ("version", INDEX_VERSION),
+                        ("key", key),
+                        ("source", cls._source_signature(path_jsonl)),
+                        (
+                            "transform",
+                            cls.transform_signature(transform, transform_tag),
+                        ),
+                    ],
+                )
+            connection.close()
+            os.replace(path_tmp, path_index)
+        finally:
+            if os.path.exists(path_tmp):
+                os.remove(path_tmp)
+        return cls(path_index)
+
+    @classmethod
+    def open_or_build(
+        cls,
+        path_jsonl: Union[str, os.PathLike],
+        path_index: Optional[Union[str, os.PathLike]] = None,
+        key: str = "basename",
+        transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        transform_tag: Optional[str] = None,
+    ) -> "MetadataIndex":
+        """Open the index for `path_jsonl`, (re-)build it if it does not exist or is outdated
+
+        An index is outdated if it was built with another version of this module, another `key`, from another state of the JSONL file or with another transform (see `transform_signature`). Per default the index is stored in the user's cache directory, see `default_index_path`.
+        """
+        if path_index is None:
+            path_index = default_index_path(path_jsonl)
+        if os.path.isfile(path_index):
+            index = cls(path_index)
+            if index.info() == {
+                "version": INDEX_VERSION,
+                "key": key,
+                "source": cls._source_signature(path_jsonl),
+                "transform": cls.transform_signature(transform, transform_tag),
+            }:
+                return index
+            index.close()
+        return cls.build(
+            path_jsonl,
+            path_index,
+            key=key,
+            transform=transform,
+            transform_tag=transform_tag,
+        )
+
+    def info(self) -> Dict[str, str]:
+        try:
+            return dict(self.connection.execute("SELECT name, value FROM info"))
+        except sqlite3.DatabaseError:
+            return {}
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the record for `key` or None"""
+        row = self.connection.execute(
+            "SELECT record FROM metadata WHERE key = ?", (key,)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the records for all `keys` that are in the index"""
+        records = {}
+        for key in keys:
+            record = self.get(key)
+            if record is not None:
+                records[key] = record
+        return records
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    @staticmethod
+    def _records_to_rows(
+        lines: Iterable[str],
+        key: str,
+        transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]],
+    ) -> Iterable[List[str]]:
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if transform is not None:
+                record = transform(record)
+            yield [record[key], json.dumps(record, ensure_ascii=False)]
+
+    @staticmethod
+    def transform_signature(
+        transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]],
+        transform_tag: Optional[str] = None,
+    ) -> str:
+        """String that identifies the transform of an index: `transform_tag` if given, else the qualified name of `transform` or "" if there is no transform
+
+        Pass a `transform_tag` with a version number to invalidate existing indexes when the behavior of a transform changes.
+        """
+        if transform_tag is not None:
+            return transform_tag
+        if transform is None:
+            return ""
+        return f"{transform.__module__}.{transform.__qualname__}"
+
+    @staticmethod
+    def _source_signature(path: Union[str, os.PathLike]) -> str:
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
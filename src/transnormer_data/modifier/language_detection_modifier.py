@@ -1,7 +1,9 @@
 import os
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 
 import cld3
+import datasets
 import fasttext
 from py3langid.langid import MODEL_FILE, LanguageIdentifier
 
@@ -12,15 +14,39 @@ ROOT = os.path.abspath(
 )
 MODELPATH_FT = os.path.join(ROOT, "resources/lid.176.ftz")
 
+# Output keys of the classifiers in the ensemble
+LABEL_KEYS = ("lang_fastText", "lang_py3langid", "lang_cld3")
+
 
 class LanguageIdentificationEnsemble(object):
-    def __init__(self):
+    def __init__(self, num_threads: int = 1):
+        """
+        Ensemble of the language classifiers fastText, py3langid and cld3
+
+        `num_threads` is the number of threads that `predict_batch` runs the classifiers in. Threads only help for the parts of the classifiers that release the GIL.
+        """
         self.model_ft = fasttext.FastText._FastText(model_path=MODELPATH_FT)
         self.model_li = LanguageIdentifier.from_pickled_model(
             MODEL_FILE, norm_probs=True
         )
+        self.num_threads = num_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
         return
 
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        return state
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            self._pid = os.getpid()
+        return self._executor
+
     def __call__(self, text: str) -> Dict[str, str]:
         """
         Returns what each classifier in the ensemble holds to be the most probable language
@@ -44,16 +70,96 @@ class LanguageIdentificationEnsemble(object):
         labels["lang_cld3"] = cld3.get_language(text).language
         return labels
 
+    def predict_batch(self, texts: List[str]) -> List[Dict[str, str]]:
+        """
+        Like `__call__`, but for a list of texts
+
+        Every classifier processes the whole batch (fastText with its native batch prediction) and each distinct text is classified only once. With `num_threads > 1`, the classifiers run in parallel threads. The output is the same as `[self(text) for text in texts]`.
+        """
+        unique = list(dict.fromkeys(texts))
+        results = self._run_classifiers(
+            [self._predict_fasttext, self._predict_py3langid, self._predict_cld3],
+            unique,
+        )
+        labels = {
+            text: dict(zip(LABEL_KEYS, text_labels))
+            for text, text_labels in zip(unique, zip(*results))
+        }
+        return [dict(labels[text]) for text in texts]
+
+    def predict_cascade(
+        self, texts: List[str], threshold: float
+    ) -> Tuple[List[Dict[str, Optional[str]]], List[bool]]:
+        """
+        Cascade version of `predict_batch`
+
+        fastText, the cheapest classifier, classifies all texts first. py3langid and cld3 only classify the texts for which fastText's probability is below `threshold`; for the other texts, their labels are None. Returns the labels and, for each text, whether the cascade stopped after fastText.
+        """
+        unique = list(dict.fromkeys(texts))
+        langs_ft, probs_ft = self._predict_fasttext_with_probs(unique)
+        uncertain = [text for text, p in zip(unique, probs_ft) if p < threshold]
+        results = self._run_classifiers(
+            [self._predict_py3langid, self._predict_cld3], uncertain
+        )
+        labels_uncertain = dict(zip(uncertain, zip(*results)))
+        labels = {
+            text: dict(
+                zip(LABEL_KEYS, (lang, *labels_uncertain.get(text, (None, None))))
+            )
+            for text, lang in zip(unique, langs_ft)
+        }
+        return (
+            [dict(labels[text]) for text in texts],
+            [text not in labels_uncertain for text in texts],
+        )
+
+    def _run_classifiers(
+        self, classifiers: List[Callable[[List[str]], List[str]]], texts: List[str]
+    ) -> List[List[str]]:
+        """Apply each classifier to all `texts`, in parallel threads if `num_threads > 1`"""
+        if self.num_threads > 1:
+            return list(self.executor.map(lambda f: f(texts), classifiers))
+        return [f(texts) for f in classifiers]
+
+    def _predict_fasttext(self, texts: List[str]) -> List[str]:
+        return self._predict_fasttext_with_probs(texts)[0]
+
+    def _predict_fasttext_with_probs(
+        self, texts: List[str]
+    ) -> Tuple[List[str], List[float]]:
+        if not texts:
+            return [], []
+        langs_ft, probs_ft = self.model_ft.predict(texts)
+        return [langs[0][-2:] for langs in langs_ft], [float(p[0]) for p in probs_ft]
+
+    def _predict_py3langid(self, texts: List[str]) -> List[str]:
+        return [self.model_li.classify(text)[0] for text in texts]
+
+    def _predict_cld3(self, texts: List[str]) -> List[str]:
+        return [cld3.get_language(text).language for text in texts]
+
 
 class LanguageDetectionModifier(BaseDatasetModifier):
-    def __init__(self, layer: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        layer: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        num_threads: int = 1,
+        cascade_threshold: Optional[float] = None,
+    ) -> None:
         """
         This modifier runs language detection algorithms over the raw version of the source or target layer of the corpus and adds the language labels as additional properties to the dataset.
 
         The default layer that language detection is applied to is "orig".
+
+        If `batch_size` is given, `modify_dataset` classifies batches of `batch_size` samples with `LanguageIdentificationEnsemble.predict_batch`, running the classifiers in `num_threads` threads. The output is the same as with `modify_sample`.
+
+        If `cascade_threshold` is given, py3langid and cld3 only classify the samples for which fastText's probability is below the threshold (see `LanguageIdentificationEnsemble.predict_cascade`). For the other samples, their labels are None and `lang_de` is fastText's vote alone. The additional property `lang_path` records whether a sample was classified by "fastText" alone or by the whole "ensemble". Use `cascade_report` to compare the output with the whole ensemble.
         """
 
-        self.languagedetector = LanguageIdentificationEnsemble()
+        self.languagedetector = LanguageIdentificationEnsemble(num_threads=num_threads)
+        self.batch_size = batch_size
+        self.cascade_threshold = cascade_threshold
 
         # Set layer
         accepted_layers = {"orig", "norm"}
@@ -71,10 +177,106 @@ class LanguageDetectionModifier(BaseDatasetModifier):
         and propagate the modifications to other properties of the sample.
         """
 
+        if self.cascade_threshold is not None:
+            batch = self._modify_batch_cascade({k: [v] for k, v in sample.items()})
+            return {k: v[0] for k, v in batch.items()}
         guesses = self.languagedetector(sample[self.raw])
         sample.update(guesses)
-        sample["lang_de"] = round(
-            sum(lang == "de" for lang in guesses.values()) / len(guesses), 3
-        )
+        sample["lang_de"] = _share_de(guesses)
 
         return sample
+
+    def modify_batch(self, batch: Dict[str, List]) -> Dict[str, List]:
+        """Like `modify_sample`, but for a batch of samples that are classified at once"""
+        if self.cascade_threshold is not None:
+            return self._modify_batch_cascade(batch)
+        all_guesses = self.languagedetector.predict_batch(batch[self.raw])
+        for key in LABEL_KEYS:
+            batch[key] = [guesses[key] for guesses in all_guesses]
+        batch["lang_de"] = [_share_de(guesses) for guesses in all_guesses]
+        return batch
+
+    def _modify_batch_cascade(self, batch: Dict[str, List]) -> Dict[str, List]:
+        assert self.cascade_threshold is not None
+        all_guesses, early_exits = self.languagedetector.predict_cascade(
+            batch[self.raw], self.cascade_threshold
+        )
+        for key in LABEL_KEYS:
+            batch[key] = [guesses[key] for guesses in all_guesses]
+        batch["lang_de"] = [_share_de(guesses) for guesses in all_guesses]
+        batch["lang_path"] = [
+            "fastText" if early_exit else "ensemble" for early_exit in early_exits
+        ]
+        return batch
+
+    def input_fields(self) -> List[str]:
+        return [self.raw]
+
+    def output_fields(self) -> List[str]:
+        fields = [*LABEL_KEYS, "lang_de"]
+        if self.cascade_threshold is not None:
+            fields.append("lang_path")
+        return fields
+
+    def fingerprint(self) -> List[Any]:
+        return [os.path.basename(MODELPATH_FT), self.cascade_threshold]
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        if self.batch_size is None:
+            return super()._map_dataset(dataset, num_proc=num_proc)
+        return dataset.map(
+            self.modify_batch,
+            batched=True,
+            batch_size=self.batch_size,
+            num_proc=num_proc,
+        )
+
+
+def _share_de(guesses: Mapping[str, Optional[str]]) -> float:
+    """Share of the classifiers that guess German, rounded to 3 decimal points; classifiers that did not run (None) are ignored"""
+    votes = [lang for lang in guesses.values() if lang is not None]
+    return round(sum(lang == "de" for lang in votes) / len(votes), 3)
+
+
+def cascade_report(
+    ensemble: LanguageIdentificationEnsemble,
+    texts: List[str],
+    thresholds: Iterable[float],
+) -> Dict[str, Any]:
+    """
+    Compare the cascade mode with the whole ensemble on `texts` for several thresholds
+
+    For each threshold, the report gives the number of early exits, the share of texts for which `lang_de` is the same as with the whole ensemble, and the share for which the filter decision `lang_de == 0` is the same. Skips that only one of the two modes makes are counted separately.
+    """
+    texts = list(texts)
+    full = [_share_de(guesses) for guesses in ensemble.predict_batch(texts)]
+    langs_ft, probs_ft = ensemble._predict_fasttext_with_probs(texts)
+    n = len(texts)
+    report: Dict[str, Any] = {"sentences": n, "thresholds": {}}
+    for threshold in thresholds:
+        early_exits = [p >= threshold for p in probs_ft]
+        cascade = [
+            float(lang == "de") if early_exit else lang_de
+            for lang, early_exit, lang_de in zip(langs_ft, early_exits, full)
+        ]
+        report["thresholds"][str(threshold)] = {
+            "early_exits": sum(early_exits),
+            "early_exit_rate": sum(early_exits) / n if n else 0.0,
+            "lang_de_agreement": (
+                sum(c == f for c, f in zip(cascade, full)) / n if n else 1.0
+            ),
+            "skip_agreement": (
+                sum((c == 0) == (f == 0) for c, f in zip(cascade, full)) / n
+                if n
+                else 1.0
+            ),
+            "skipped_only_by_cascade": sum(
+                c == 0 and f != 0 for c, f in zip(cascade, full)
+            ),
+            "skipped_only_by_ensemble": sum(
+                f == 0 and c != 0 for c, f in zip(cascade, full)
+            ),
+        }
+    return report
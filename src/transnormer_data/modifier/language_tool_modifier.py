@@ -1,18 +1,45 @@
-from typing import Dict, Set
+from typing import Any, Dict, List, Optional, Set
 
+import datasets
 import spacy
 from language_tool_python import LanguageTool
 
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.cache import SqliteCache, cache_key, file_digest
+from transnormer_data.langtool import (
+    LANGTOOL_VERSION,
+    LanguageToolClient,
+    TriggerIndex,
+    langtool_params,
+    load_rules,
+    server_url,
+)
 
 
 class LanguageToolModifier(BaseDatasetModifier):
-    def __init__(self, rule_file: str) -> None:
+    def __init__(
+        self,
+        rule_file: str,
+        num_servers: int = 1,
+        remote_servers: Optional[List[str]] = None,
+        concurrency: int = 1,
+        batch_size: int = 1000,
+        max_request_chars: Optional[int] = None,
+        trigger_index: Optional[str] = None,
+        cache: Optional[str] = None,
+        langtool_version: str = LANGTOOL_VERSION,
+    ) -> None:
         """
         This modifier applies the LanguageTool to the raw version of the target layer
         and propagates the changes to the tokenized version.
 
         Target layer is fixed to "norm", source layer is fixed to "orig".
+
+        Per default, a local LanguageTool server is started and `modify_dataset` sends one sentence at a time. With `concurrency > 1`, `modify_dataset` sends batches of `batch_size` sentences with up to `concurrency` requests in flight, distributed over `num_servers` local servers or the already running servers at the URLs `remote_servers` (see `LanguageToolClient`). If `max_request_chars` is given, `modify_dataset` packs the sentences of a batch into requests of up to `max_request_chars` characters. The output is the same in all modes.
+
+        `trigger_index` is the path to a JSON file with trigger words and regexes per rule (see `langtool.TriggerIndex`). If it is given, only the sentences that contain a trigger of one of the rules are sent to LanguageTool.
+
+        `cache` is the path to an SQLite database that stores the corrected sentences (see `cache.SqliteCache`), keyed by a hash of the sentence, the enabled rules and `langtool_version`. Cached sentences are not sent to LanguageTool again, also not in later runs or other processes. `langtool_version` is the version of the local servers; for `remote_servers`, it should be set to the version of the remote servers.
         """
 
         # Keys in the sample dictionary
@@ -26,12 +53,47 @@ class LanguageToolModifier(BaseDatasetModifier):
         # NLP
         self.nlp = spacy.blank("de")
 
-        # LanguageTool instance
-        self.langtool: LanguageTool = LanguageTool(
-            language="de-DE", language_tool_download_version="6.3"
+        # LanguageTool instance(s)
+        if remote_servers:
+            self.langtools: List[LanguageTool] = [
+                LanguageTool(language="de-DE", remote_server=url)
+                for url in remote_servers
+            ]
+        else:
+            self.langtools = [
+                LanguageTool(
+                    language="de-DE", language_tool_download_version=langtool_version
+                )
+                for _ in range(num_servers)
+            ]
+        self.langtool: LanguageTool = self.langtools[0]
+        self.langtool_version = langtool_version
+
+        # Client for concurrent requests
+        self.batch_size = batch_size
+        self.client: Optional[LanguageToolClient] = None
+        if concurrency > 1 or max_request_chars:
+            self.client = LanguageToolClient(
+                [server_url(langtool) for langtool in self.langtools],
+                params={},
+                num_threads=concurrency,
+                max_chars=max_request_chars,
+            )
+        # Cache of corrected sentences
+        self.cache: Optional[SqliteCache] = (
+            SqliteCache(cache, table="languagetool") if cache else None
         )
+
         self.set_langtool_rules(self._load_rules(rule_file))
 
+        # Prefilter
+        self.trigger_index: Optional[TriggerIndex] = (
+            TriggerIndex.load(trigger_index) if trigger_index else None
+        )
+        self._trigger_index_key = (
+            file_digest([trigger_index]) if trigger_index else None
+        )
+
     def modify_sample(self, sample: Dict) -> Dict:
         """
         Apply a modification function to a property of the sample
@@ -42,8 +104,64 @@ class LanguageToolModifier(BaseDatasetModifier):
         """
 
         # Update raw via LanguageTool
+        return self._update_sample(sample, self.correct([sample[self.raw]])[0])
+
+    def correct(self, raws: List[str]) -> List[str]:
+        """Return the LanguageTool corrections of `raws`
+
+        Sentences that the trigger index rules out are returned as they are. Cached sentences and repeated sentences are not sent to LanguageTool (again). Uses the client for concurrent requests, if there is one.
+        """
+        corrected = list(raws)
+        todo = [i for i, raw in enumerate(raws) if self.is_candidate(raw)]
+        if self.cache is not None:
+            keys = {i: self._cache_key(raws[i]) for i in todo}
+            cached = self.cache.get_many(keys.values())
+            for i in todo:
+                if keys[i] in cached:
+                    corrected[i] = cached[keys[i]]
+            todo = [i for i in todo if keys[i] not in cached]
+        unique = list(dict.fromkeys(raws[i] for i in todo))
+        if self.client is not None:
+            results = dict(zip(unique, self.client.correct_many(unique)))
+        else:
+            results = {raw: self.langtool.correct(raw) for raw in unique}
+        for i in todo:
+            corrected[i] = results[raws[i]]
+        if self.cache is not None:
+            self.cache.set_many((keys[i], corrected[i]) for i in todo)
+        return corrected
+
+    def _cache_key(self, raw: str) -> str:
+        return cache_key(self._rules_key, raw)
+
+    def is_candidate(self, raw: str) -> bool:
+        """Return False if the trigger index rules out that any of the rules matches `raw`"""
+        if self.trigger_index is None:
+            return True
+        return self.trigger_index.is_candidate(raw, self.rules)
+
+    def modify_batch(self, batch: Dict[str, List]) -> Dict[str, List]:
+        """Like `modify_sample`, but for a batch of samples whose raw strings are sent to the LanguageTool server(s) concurrently"""
+        raws_new = self.correct(batch[self.raw])
+        samples = [dict(zip(batch, values)) for values in zip(*batch.values())]
+        samples = [self._update_sample(s, raw) for s, raw in zip(samples, raws_new)]
+        return {key: [s[key] for s in samples] for key in batch}
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        if self.client is None:
+            return super()._map_dataset(dataset, num_proc=num_proc)
+        return dataset.map(
+            self.modify_batch,
+            batched=True,
+            batch_size=self.batch_size,
+            num_proc=num_proc,
+        )
+
+    def _update_sample(self, sample: Dict, raw_new: str) -> Dict:
+        """Set the corrected raw string and propagate the changes to tokens, whitespaces, spans and alignment"""
         raw_old = sample[self.raw]
-        raw_new = self.langtool.correct(raw_old)
         any_changes = raw_new != raw_old
         if any_changes:
             sample[self.raw] = raw_new
@@ -69,19 +187,22 @@ class LanguageToolModifier(BaseDatasetModifier):
             )
         return sample
 
+    def input_fields(self) -> List[str]:
+        return [self.raw, self.tok, self.ws, self.spans, self.tok_src, self.alignment]
+
+    def output_fields(self) -> List[str]:
+        return [self.raw, self.tok, self.ws, self.spans, self.alignment]
+
+    def fingerprint(self) -> List[Any]:
+        return [self._rules_key, self._trigger_index_key]
+
     def _load_rules(self, file: str) -> Set[str]:
         """
         Load the file with the LanguageTool rule identifiers as a set of strings
 
         `file` must be a path to a text file that contains a list of identifiers for LanguageTool rules (e.g. OLD_SPELLING), one rule ID per line.
         """
-        rules_set = set()
-        with open(file, "r") as f:
-            for line in f:
-                rule_id = line.strip()  # Remove leading/trailing whitespace
-                if rule_id:  # Skip empty lines
-                    rules_set.add(rule_id)
-        return rules_set
+        return load_rules(file)
 
     def set_langtool_rules(self, rules: Set[str]) -> None:
         """
@@ -90,5 +211,10 @@ class LanguageToolModifier(BaseDatasetModifier):
         by LanguageTool.
         """
         # TODO: Check if rules actually exist
-        self.langtool.enabled_rules = rules
-        self.langtool.enabled_rules_only = True
+        self.rules = rules
+        self._rules_key = cache_key(self.langtool_version, sorted(rules))
+        for langtool in self.langtools:
+            langtool.enabled_rules = rules
+            langtool.enabled_rules_only = True
+        if self.client is not None:
+            self.client.params = langtool_params(rules, language="de-DE")
@@ -1,17 +1,92 @@
 import logging
-from typing import Dict, Optional
+import multiprocessing
+import os
+import queue
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import datasets
 import numpy as np
 import torch
 import transformers
+from transformers.pytorch_utils import Conv1D
 
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.cache import SqliteCache, cache_key
 
 logger = logging.getLogger(__name__)
 
+# Number of records that `LMScoreModifier.modify_dataset` sorts into length buckets at once
+MAP_BATCH_SIZE = 1000
+
+# Inference backends of `LMScorer`
+BACKENDS = ("eager", "int8", "torchscript", "compile")
+
+# Attributes of model configs that transform the logits after the LM head, e.g.
+# the softcapping of Gemma 2, and their values for "no transformation"
+LOGIT_TRANSFORMS = {
+    "final_logit_softcapping": (None, 0, 0.0),
+    "logit_scale": (None, 1, 1.0),
+    "logits_scaling": (None, 1, 1.0),
+    "scale_width": (None, False),
+}
+
 
 class LMScorer(object):
-    def __init__(self, model_name: str, prefix: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: str,
+        prefix: Optional[str] = None,
+        batch_size: int = 1,
+        max_tokens: Optional[int] = None,
+        chunk_size: int = 256,
+        backend: str = "eager",
+        num_threads: Optional[int] = None,
+        num_interop_threads: Optional[int] = None,
+        num_workers: int = 1,
+        threads_per_worker: int = 1,
+        cache: Optional[str] = None,
+        cache_max_entries: Optional[int] = None,
+    ):
+        """
+        Language model scorer
+
+        `batch_size` and `max_tokens` configure `predict_logprobs_batch`: a batch holds up to `batch_size` texts and, if `max_tokens` is given, up to `max_tokens` tokens including padding. `chunk_size` is the number of token positions for which the logits over the vocabulary are computed at once.
+
+        `backend` selects how the model runs (see `BACKENDS`):
+        - "eager": plain PyTorch in float32
+        - "int8": the linear layers (including GPT-2's `Conv1D` layers and the LM head) are quantized dynamically to int8, CPU only
+        - "torchscript": the transformer is traced with `torch.jit.trace`
+        - "compile": the transformer is compiled with `torch.compile` (PyTorch >= 2.0)
+
+        `num_threads` and `num_interop_threads` set PyTorch's intra-op and inter-op thread pools for the whole process. Use `calibration_report` to compare the scores and throughput of the backends with "eager".
+
+        With `num_workers > 1`, `predict_logprobs_batch` distributes the batches over that many worker processes with `threads_per_worker` PyTorch threads each (see `_WorkerPool`). The workers are started before the model runs in this process and load their own copy of the model; they cannot be started from daemonic processes, e.g. the processes of `datasets.Dataset.map` with `num_proc > 1`. On machines with many cores, several processes with few threads each are often faster than one process with many threads; `benchmarks/lm_workers_benchmark.py` compares the splits.
+
+        The token NLLs are computed from the last hidden state of the base model and the LM head, without materializing the logits of whole sequences (see `_token_nlls`). Models whose logits are computed differently (see `LOGIT_TRANSFORMS` and `_logits_from_lm_head`) are scored with their own, full logits instead.
+
+        `cache` is the path to an SQLite database that stores the token NLLs of each text (see `cache.SqliteCache`), keyed by a hash of the model name, the model revision, the backend and the text. Cached texts are not tokenized or scored again, also not in later runs or other processes. With `cache_max_entries`, the least recently used entries are evicted when the cache grows beyond that size. The revision is the commit hash of a model from the huggingface hub; a local model has none, so delete the cache when a local model changes.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"LMScorer: backend must be one of {BACKENDS}")
+
+        # Worker processes, started before PyTorch runs in this process
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self._worker_kwargs: Dict[str, Any] = dict(
+            model_name=model_name,
+            prefix=prefix,
+            batch_size=batch_size,
+            max_tokens=max_tokens,
+            chunk_size=chunk_size,
+            backend=backend,
+            num_threads=threads_per_worker,
+        )
+        self._pool: Optional[_WorkerPool] = None
+        if num_workers > 1:
+            self._pool = _WorkerPool(self._worker_kwargs, num_workers)
+
+        set_torch_threads(num_threads, num_interop_threads)
         logger.info(f'Loading huggingface language model "{model_name}"')
         device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
         self.tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
@@ -24,8 +99,67 @@ class LMScorer(object):
 
         self.key = f"{prefix}_{model_name}" if prefix else f"{model_name}"
 
+        # Cache
+        self.cache: Optional[SqliteCache] = (
+            SqliteCache(cache, table="lmscores", max_entries=cache_max_entries)
+            if cache
+            else None
+        )
+        revision = getattr(self.model.config, "_commit_hash", None)
+        self._model_key = cache_key(model_name, revision, backend)
+
+        # Batching
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.chunk_size = chunk_size
+        # The pad token added above has no embedding, so padding uses a token that has one; padded positions are masked anyway
+        num_embeddings = self.model.get_input_embeddings().num_embeddings
+        self.pad_id_inputs = self.tokenizer.pad_token_id
+        if self.pad_id_inputs is None or self.pad_id_inputs >= num_embeddings:
+            self.pad_id_inputs = self.tokenizer.eos_token_id or 0
+
+        # Outputs of the model that the NLLs are computed from: the last hidden
+        # states or, if the LM head does not give the logits, the logits
+        self.full_logits = not _logits_from_lm_head(self.model, self._example_inputs())
+        if self.full_logits:
+            logger.info(
+                f'LMScorer: the logits of "{model_name}" are not the LM head applied to the last hidden state, using the full logits of the model'
+            )
+
+        # Inference backend
+        self.backend = backend
+        self.hidden_states: Callable[..., torch.Tensor] = self._outputs_module()
+        if backend == "int8":
+            if self.model.device.type != "cpu":
+                raise ValueError("LMScorer: backend 'int8' only runs on CPU")
+            _conv1d_to_linear(self.model)
+            torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+            self.hidden_states = self._outputs_module()
+        elif backend == "torchscript":
+            self.hidden_states = torch.jit.trace(
+                self.hidden_states, self._example_inputs(), check_trace=False
+            )
+        elif backend == "compile":
+            if not hasattr(torch, "compile"):
+                raise ValueError("LMScorer: backend 'compile' requires PyTorch >= 2.0")
+            self.hidden_states = torch.compile(self.hidden_states, dynamic=True)
+
         return
 
+    def _outputs_module(self) -> torch.nn.Module:
+        if self.full_logits:
+            return _Logits(self.model)
+        return _HiddenStates(self.model.base_model)
+
+    def _example_inputs(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Padded batch for tracing; with padding, so that the traced model applies the attention mask"""
+        input_ids = torch.full((2, 8), self.pad_id_inputs, dtype=torch.long)
+        attention_mask = torch.ones_like(input_ids)
+        attention_mask[1, 5:] = 0
+        return input_ids.to(self.model.device), attention_mask.to(self.model.device)
+
     def __call__(self, text: str) -> Dict[str, np.float32]:
         """
         Returns a dictionary of the language model score (negative log likelihood)
@@ -39,42 +173,385 @@ class LMScorer(object):
         scores[f"{self.key}"] = self.predict_logprobs(text)
         return scores
 
-    def predict_logprobs(self, input_str: str) -> float:
+    def predict_logprobs(self, input_str: str) -> np.float32:
+        return self.mean_nll(self.predict_token_nlls(input_str))
+
+    def predict_token_nlls(self, input_str: str) -> np.ndarray:
+        """Negative log likelihood of each token of `input_str` but the first, given the previous tokens"""
+        if self.cache is not None:
+            return self.predict_token_nlls_batch([input_str])[0]
         # Tokenize the input sentence
-        inputs = self.tokenizer(
-            input_str,
-            return_tensors="pt",
-            truncation=True,
-            max_length=1024,
-        ).to(self.model.device)
-        input_ids = inputs["input_ids"].to(self.model.device)
-
-        # Get the output logits from the model
+        input_ids = self.tokenizer(input_str, truncation=True, max_length=1024)[
+            "input_ids"
+        ]
+        return self._token_nlls_padded([input_ids])[0]
+
+    def predict_logprobs_batch(self, input_strs: List[str]) -> List[np.float32]:
+        """
+        Batched version of `predict_logprobs`
+
+        The texts are sorted by their number of tokens and split into batches of similar lengths (see `_make_batches`), which are padded and passed to the model with an attention mask. The score of each text is the mean negative log likelihood of its tokens without the padding. The scores are returned in the order of `input_strs` and match those of `predict_logprobs` up to floating point precision. Texts with less than two tokens get the score NaN.
+        """
+        return [
+            self.mean_nll(nlls) for nlls in self.predict_token_nlls_batch(input_strs)
+        ]
+
+    def predict_token_nlls_batch(self, input_strs: List[str]) -> List[np.ndarray]:
+        """Batched version of `predict_token_nlls`, see `predict_logprobs_batch`"""
+        if self.cache is None:
+            return self._predict_token_nlls_batch(input_strs)
+        keys = [self._cache_key(input_str) for input_str in input_strs]
+        found: Dict[str, Any] = self.cache.get_many(keys)
+        # Identical texts are scored only once
+        missing = {
+            key: input_str
+            for key, input_str in zip(keys, input_strs)
+            if key not in found
+        }
+        if missing:
+            all_nlls = self._predict_token_nlls_batch(list(missing.values()))
+            self.cache.set_many(
+                (key, nlls.tolist()) for key, nlls in zip(missing, all_nlls)
+            )
+            found.update(zip(missing, all_nlls))
+        return [np.array(found[key], dtype=np.float32) for key in keys]
+
+    def _cache_key(self, input_str: str) -> str:
+        return cache_key(self._model_key, input_str)
+
+    def _predict_token_nlls_batch(self, input_strs: List[str]) -> List[np.ndarray]:
+        all_input_ids = self.tokenizer(
+            list(input_strs), truncation=True, max_length=1024
+        )["input_ids"]
+        all_nlls: List[np.ndarray] = [np.zeros(0, dtype=np.float32)] * len(
+            all_input_ids
+        )
+        batches = self._make_batches([len(ids) for ids in all_input_ids])
+        batch_input_ids = [[all_input_ids[i] for i in batch] for batch in batches]
+        if self.num_workers > 1:
+            all_batch_nlls = self.pool.map(batch_input_ids)
+        else:
+            all_batch_nlls = [self._token_nlls_padded(ids) for ids in batch_input_ids]
+        for batch, batch_nlls in zip(batches, all_batch_nlls):
+            for i, nlls in zip(batch, batch_nlls):
+                all_nlls[i] = nlls
+        return all_nlls
+
+    @property
+    def pool(self) -> "_WorkerPool":
+        """Worker processes for `predict_token_nlls_batch`; started again after `close` or in another process"""
+        if self._pool is None or self._pool.pid != os.getpid():
+            self._pool = _WorkerPool(self._worker_kwargs, self.num_workers)
+        return self._pool
+
+    def close(self) -> None:
+        """Stop the worker processes, if any"""
+        if self._pool is not None and self._pool.pid == os.getpid():
+            self._pool.close()
+        self._pool = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    @staticmethod
+    def mean_nll(nlls: np.ndarray) -> np.float32:
+        """Sentence score: mean of the token NLLs, NaN if there are none"""
+        return np.float32(nlls.mean() if len(nlls) else np.nan)
+
+    def _make_batches(self, lengths: List[int]) -> List[List[int]]:
+        """Group the indices of `lengths` into batches of at most `batch_size` sequences of similar lengths, such that a padded batch has at most `max_tokens` tokens (unless it has a single sequence)"""
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            if batch and (
+                len(batch) == self.batch_size
+                or (
+                    self.max_tokens is not None
+                    # Sorted by length, so the current sequence is the longest
+                    and (len(batch) + 1) * lengths[i] > self.max_tokens
+                )
+            ):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _token_nlls_padded(self, batch_input_ids: List[List[int]]) -> List[np.ndarray]:
+        """Token NLLs of each sequence in a batch, computed on the right-padded batch"""
+        max_len = max(len(ids) for ids in batch_input_ids)
+        if max_len < 2:
+            return [np.zeros(0, dtype=np.float32) for _ in batch_input_ids]
+        input_ids = torch.full(
+            (len(batch_input_ids), max_len), self.pad_id_inputs, dtype=torch.long
+        )
+        attention_mask = torch.zeros_like(input_ids)
+        for i, ids in enumerate(batch_input_ids):
+            input_ids[i, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[i, : len(ids)] = 1
+        input_ids = input_ids.to(self.model.device)
+        attention_mask = attention_mask.to(self.model.device)
+
+        nlls = self._token_nlls(input_ids, attention_mask).cpu().numpy()
+        lengths = [max(len(ids) - 1, 0) for ids in batch_input_ids]
+        return np.split(nlls, np.cumsum(lengths)[:-1])
+
+    def _token_nlls(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Negative log likelihoods of the unpadded tokens `input_ids[:, 1:]`, flattened in row-major order
+
+        Only the hidden states of the positions that predict an unpadded token are passed through the LM head, in chunks of `chunk_size` positions, and only the log-probability of the true token is kept (log-sum-exp of the logits minus the logit of the true token). So the logits of a whole sequence over the full vocabulary are never held in memory at once. If `self.full_logits` is set, the model computes the logits of the whole batch and only the last step is chunked.
+        """
         with torch.no_grad():
-            outputs = self.model(input_ids, labels=input_ids)
-            logits = outputs.logits
-
-        # Shift the logits and input_ids to align the predictions with the true values
-        shift_logits = logits[:, :-1, :].contiguous()
-        shift_labels = input_ids[:, 1:].contiguous()
-
-        # Flatten the tokens and logits for computing the loss
-        # Compute the log probabilities
-        loss_fct = torch.nn.CrossEntropyLoss(reduction="none")
-        loss = loss_fct(
-            shift_logits.view(-1, shift_logits.size(-1)), shift_labels.view(-1)
+            hidden = self.hidden_states(input_ids, attention_mask)
+            # Shift the hidden states and input_ids to align the predictions with the true values
+            shift_mask = attention_mask[:, 1:].bool()
+            hidden = hidden[:, :-1][shift_mask]
+            labels = input_ids[:, 1:][shift_mask]
+
+            lm_head = (
+                torch.nn.Identity()
+                if self.full_logits
+                else self.model.get_output_embeddings()
+            )
+            nlls = torch.empty(len(labels), dtype=torch.float32, device=hidden.device)
+            for start in range(0, len(labels), self.chunk_size):
+                end = start + self.chunk_size
+                logits = lm_head(hidden[start:end]).float()
+                nlls[start:end] = torch.logsumexp(logits, dim=-1) - logits.gather(
+                    1, labels[start:end, None]
+                ).squeeze(1)
+        return nlls
+
+
+class _WorkerPool(object):
+    """
+    Worker processes that compute the token NLLs of padded batches with their own `LMScorer`
+
+    The workers are spawned, not forked, since forking a process in which PyTorch has already run can deadlock its thread pools; each worker creates an `LMScorer` from `scorer_kwargs` (with `num_threads` PyTorch threads) and takes batches from a common task queue. `map` returns the results in the order of the batches.
+    """
+
+    def __init__(self, scorer_kwargs: Dict[str, Any], num_workers: int) -> None:
+        if multiprocessing.current_process().daemon:
+            raise ValueError(
+                "LMScorer: num_workers > 1 cannot be used in a daemonic process, e.g. in datasets.map with num_proc > 1"
+            )
+        context = multiprocessing.get_context("spawn")
+        self.pid = os.getpid()
+        self.tasks: multiprocessing.Queue = context.Queue()
+        self.results: multiprocessing.Queue = context.Queue()
+        self.processes = [
+            context.Process(
+                target=_worker_loop,
+                args=(scorer_kwargs, self.tasks, self.results),
+                daemon=True,
+            )
+            for _ in range(num_workers)
+        ]
+        for process in self.processes:
+            process.start()
+        # Results of earlier calls to `map` that failed are ignored
+        self.num_calls = 0
+
+    def map(self, batches: List[List[List[int]]]) -> List[List[np.ndarray]]:
+        self.num_calls += 1
+        for index, batch in enumerate(batches):
+            self.tasks.put(((self.num_calls, index), batch))
+        results: Dict[int, List[np.ndarray]] = {}
+        while len(results) < len(batches):
+            try:
+                (call, index), batch_nlls, error = self.results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.processes):
+                    raise RuntimeError("LMScorer: a worker process died")
+                continue
+            if call != self.num_calls:
+                continue
+            if error is not None:
+                raise RuntimeError(f"LMScorer: error in worker process: {error}")
+            results[index] = batch_nlls
+        return [results[i] for i in range(len(batches))]
+
+    def close(self) -> None:
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=10.0)
+            if process.is_alive():
+                process.terminate()
+
+
+def _worker_loop(
+    scorer_kwargs: Dict[str, Any],
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+) -> None:
+    scorer = LMScorer(**scorer_kwargs)
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        index, batch_input_ids = task
+        try:
+            results.put((index, scorer._token_nlls_padded(batch_input_ids), None))
+        except Exception as e:
+            results.put((index, None, repr(e)))
+
+
+class _HiddenStates(torch.nn.Module):
+    """Last hidden state of a transformer as a module with tensor inputs and output, which can be traced and compiled"""
+
+    def __init__(self, base_model: torch.nn.Module) -> None:
+        super().__init__()
+        self.base_model = base_model
+
+    def forward(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        return self.base_model(
+            input_ids, attention_mask=attention_mask, use_cache=False
+        ).last_hidden_state
+
+
+class _Logits(torch.nn.Module):
+    """Logits of a causal language model as a module with tensor inputs and output, for models whose logits are not the LM head applied to the last hidden state"""
+
+    def __init__(self, model: torch.nn.Module) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(
+        self, input_ids: torch.Tensor, attention_mask: torch.Tensor
+    ) -> torch.Tensor:
+        return self.model(
+            input_ids, attention_mask=attention_mask, use_cache=False
+        ).logits
+
+
+def _logits_from_lm_head(
+    model: transformers.PreTrainedModel,
+    example_inputs: Tuple[torch.Tensor, torch.Tensor],
+) -> bool:
+    """Are the logits of `model` the LM head (output embeddings) applied to the last hidden state of the base model, as for GPT-2
+
+    This is not the case if the model's config transforms the logits (see `LOGIT_TRANSFORMS`) or if the logits of the model differ from those of the LM head on `example_inputs`.
+    """
+    lm_head = model.get_output_embeddings()
+    if lm_head is None:
+        return False
+    for name, defaults in LOGIT_TRANSFORMS.items():
+        if getattr(model.config, name, None) not in defaults:
+            return False
+    input_ids, attention_mask = example_inputs
+    with torch.no_grad():
+        logits = _Logits(model)(input_ids, attention_mask)
+        hidden = _HiddenStates(model.base_model)(input_ids, attention_mask)
+        return torch.allclose(lm_head(hidden), logits, rtol=1e-4, atol=1e-4)
+
+
+def _conv1d_to_linear(module: torch.nn.Module) -> None:
+    """Replace the `Conv1D` layers of GPT-2 models, which are linear layers with a transposed weight, by `torch.nn.Linear` layers, so that they can be quantized"""
+    for name, child in module.named_children():
+        if isinstance(child, Conv1D):
+            linear = torch.nn.Linear(child.weight.shape[0], child.nf)
+            linear.weight.data = child.weight.data.T.contiguous()
+            linear.bias.data = child.bias.data
+            setattr(module, name, linear)
+        else:
+            _conv1d_to_linear(child)
+
+
+def set_torch_threads(
+    num_threads: Optional[int] = None, num_interop_threads: Optional[int] = None
+) -> None:
+    """Set the sizes of PyTorch's intra-op and inter-op thread pools, if given"""
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads is not None:
+        try:
+            torch.set_num_interop_threads(num_interop_threads)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            logger.warning(
+                f"Could not set the number of inter-op threads to {num_interop_threads}, it is {torch.get_num_interop_threads()}"
+            )
+
+
+def calibration_report(
+    model_name: str,
+    texts: List[str],
+    backends: Iterable[str] = BACKENDS,
+    batch_size: int = 1,
+    max_tokens: Optional[int] = None,
+    num_threads: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Compare the scores and throughput of the `backends` of `LMScorer` with the float32 "eager" backend on `texts`
+
+    For each backend, the report gives the Pearson and Spearman correlation of the scores with the reference scores, the largest absolute difference, the throughput (texts per second, after a warm-up on a few texts) and the speedup over the reference. Texts without a score (less than two tokens) are left out of the correlations.
+    """
+
+    def run(backend: str) -> Dict[str, Any]:
+        scorer = LMScorer(
+            model_name,
+            batch_size=batch_size,
+            max_tokens=max_tokens,
+            backend=backend,
+            num_threads=num_threads,
         )
-        neg_log_probs = loss.view(shift_labels.size())
+        # Warm-up, e.g. for compilation
+        scorer.predict_logprobs_batch(texts[:8])
+        start = time.perf_counter()
+        scores = np.array(scorer.predict_logprobs_batch(texts), dtype=np.float64)
+        return {"scores": scores, "seconds": time.perf_counter() - start}
+
+    reference = run("eager")
+    valid = ~np.isnan(reference["scores"])
+    ref_scores = reference["scores"][valid]
+    report: Dict[str, Any] = {
+        "texts": len(texts),
+        "scored": int(valid.sum()),
+        "backends": {},
+    }
+    for backend in backends:
+        result = reference if backend == "eager" else run(backend)
+        scores = result["scores"][valid]
+        report["backends"][backend] = {
+            "pearson": float(np.corrcoef(ref_scores, scores)[0, 1]),
+            "spearman": float(np.corrcoef(_ranks(ref_scores), _ranks(scores))[0, 1]),
+            "max_abs_diff": float(np.abs(ref_scores - scores).max()),
+            "texts_per_second": len(texts) / result["seconds"],
+            "speedup": reference["seconds"] / result["seconds"],
+        }
+    return report
 
-        # Aggregate sentence score
-        score = neg_log_probs.mean(-1)
 
-        return score.cpu().detach().numpy()[0]
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values, kind="stable")] = np.arange(len(values))
+    return ranks
 
 
 class LMScoreModifier(BaseDatasetModifier):
     def __init__(
-        self, layer: Optional[str] = None, language_model: Optional[str] = None
+        self,
+        layer: Optional[str] = None,
+        language_model: Optional[str] = None,
+        batch_size: int = 1,
+        max_tokens: Optional[int] = None,
+        token_nlls: bool = False,
+        backend: str = "eager",
+        num_threads: Optional[int] = None,
+        num_interop_threads: Optional[int] = None,
+        num_workers: int = 1,
+        threads_per_worker: int = 1,
+        cache: Optional[str] = None,
+        cache_max_entries: Optional[int] = None,
     ) -> None:
         """
         Modifier that adds a language model (LM) probability score to each record.
@@ -89,6 +566,16 @@ class LMScoreModifier(BaseDatasetModifier):
             "dbmdz/german-gpt2" : 5.6789
         }
         ```
+
+        With `batch_size > 1` or `max_tokens`, `modify_dataset` scores the records in padded batches of similar lengths (see `LMScorer.predict_logprobs_batch`): up to `batch_size` records per batch and, if `max_tokens` is given, up to `max_tokens` tokens per batch. The scores are the same as without batching up to floating point precision.
+
+        If `token_nlls` is True, a second new property holds the negative log likelihood of each model token but the first as float16, e.g. `"norm_dbmdz/german-gpt2_token_nlls": [7.49, 0.8677, ...]`.
+
+        `backend`, `num_threads` and `num_interop_threads` select the inference backend and PyTorch's thread settings (see `LMScorer`). With `num_workers > 1`, the batches are scored in that many worker processes with `threads_per_worker` PyTorch threads each; this cannot be combined with `modify_dataset(num_proc > 1)`.
+
+        The token NLLs are computed from the last hidden state of the base model and the LM head, without materializing the logits of whole sequences (see `_token_nlls`). Models whose logits are computed differently (see `LOGIT_TRANSFORMS` and `_logits_from_lm_head`) are scored with their own, full logits instead.
+
+        `cache` is the path to an SQLite database that keeps the scores across runs, so that only new or changed texts are scored; `cache_max_entries` limits its size (see `LMScorer`).
         """
 
         # Set layer
@@ -97,7 +584,21 @@ class LMScoreModifier(BaseDatasetModifier):
 
         # LM
         model_name = "dbmdz/german-gpt2" if language_model is None else language_model
-        self.lm_scorer = LMScorer(model_name, prefix=layer)
+        self.lm_scorer = LMScorer(
+            model_name,
+            prefix=layer,
+            batch_size=batch_size,
+            max_tokens=max_tokens,
+            backend=backend,
+            num_threads=num_threads,
+            num_interop_threads=num_interop_threads,
+            num_workers=num_workers,
+            threads_per_worker=threads_per_worker,
+            cache=cache,
+            cache_max_entries=cache_max_entries,
+        )
+        self.batched = batch_size > 1 or max_tokens is not None or num_workers > 1
+        self.token_nlls = token_nlls
 
     def modify_sample(self, sample: Dict) -> Dict:
         """
@@ -106,6 +607,9 @@ class LMScoreModifier(BaseDatasetModifier):
         Score is the negative log likelihood
         """
 
+        if self.token_nlls:
+            batch = self.modify_batch({k: [v] for k, v in sample.items()})
+            return {k: v[0] for k, v in batch.items()}
         scores = self.lm_scorer(sample[self.raw])
         # convert np.float32 to float
         scores_float = {
@@ -116,3 +620,48 @@ class LMScoreModifier(BaseDatasetModifier):
         }
         sample.update(scores_float)
         return sample
+
+    def modify_batch(self, batch: Dict[str, List]) -> Dict[str, List]:
+        """Like `modify_sample`, but for a batch of samples that are scored in padded batches"""
+        all_nlls = self.lm_scorer.predict_token_nlls_batch(batch[self.raw])
+        # convert np.float32 to float
+        batch[self.lm_scorer.key] = [
+            self.lm_scorer.mean_nll(nlls).item() for nlls in all_nlls
+        ]
+        if self.token_nlls:
+            batch[f"{self.lm_scorer.key}_token_nlls"] = [
+                nlls.astype(np.float16) for nlls in all_nlls
+            ]
+        return batch
+
+    def input_fields(self) -> List[str]:
+        return [self.raw]
+
+    def output_fields(self) -> List[str]:
+        fields = [self.lm_scorer.key]
+        if self.token_nlls:
+            fields.append(f"{self.lm_scorer.key}_token_nlls")
+        return fields
+
+    def fingerprint(self) -> List[Any]:
+        return [self.lm_scorer._model_key]
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        if num_proc is not None and num_proc > 1 and self.lm_scorer.num_workers > 1:
+            raise ValueError(
+                "LMScoreModifier: num_workers > 1 and num_proc > 1 cannot be combined"
+            )
+        if not self.batched:
+            return super()._map_dataset(dataset, num_proc=num_proc)
+        # Large batches give the length buckets more sequences to choose from
+        try:
+            return dataset.map(
+                self.modify_batch,
+                batched=True,
+                batch_size=MAP_BATCH_SIZE,
+                num_proc=num_proc,
+            )
+        finally:
+            self.lm_scorer.close()
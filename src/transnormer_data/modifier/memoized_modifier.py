@@ -0,0 +1,162 @@
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import datasets
+import numpy as np
+from datasets.fingerprint import generate_random_fingerprint
+
+from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.cache import MemoryCache, SqliteCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Number of records whose keys are computed and looked up at once
+KEY_BATCH_SIZE = 1000
+
+
+class MemoizedModifier(BaseDatasetModifier):
+    def __init__(
+        self,
+        modifier: BaseDatasetModifier,
+        cache: Optional[str] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        """
+        Wrapper that replays the outputs of a modifier for records that it has seen before.
+
+        `modifier` must declare the properties that its output depends on and the properties that it sets (see `BaseDatasetModifier.input_fields` and `output_fields`). The key of a record is a hash of the values of the input fields, the names of the input and output fields, the class of `modifier` and its `fingerprint`. `modify_dataset` passes only the first record with each key that is not cached yet to `modifier` (so the batched processing of the modifier, if any, is kept) and sets the output fields of all other records from the cache.
+
+        Per default, the outputs are kept in memory for the lifetime of the wrapper (see `cache.MemoryCache`), so duplicates within a run are only modified once. If `cache` is the path to an SQLite database (see `cache.SqliteCache`), the outputs are also kept across runs and shared between processes. With `max_entries`, the least recently used entries are evicted when the cache grows beyond that size.
+
+        Output values are stored as JSON, e.g. NumPy arrays are replayed as lists.
+        """
+        input_fields = modifier.input_fields()
+        output_fields = modifier.output_fields()
+        if input_fields is None or output_fields is None:
+            raise ValueError(
+                f"MemoizedModifier: {type(modifier).__name__} does not declare its input and output fields"
+            )
+        self.modifier = modifier
+        self.inputs = input_fields
+        self.outputs = output_fields
+        self.cache: Union[SqliteCache, MemoryCache] = (
+            SqliteCache(cache, table="memoized", max_entries=max_entries)
+            if cache
+            else MemoryCache(max_entries=max_entries)
+        )
+        self._modifier_key = cache_key(
+            type(modifier).__name__,
+            self.inputs,
+            self.outputs,
+            modifier.fingerprint(),
+        )
+
+    def input_fields(self) -> List[str]:
+        return self.inputs
+
+    def output_fields(self) -> List[str]:
+        return self.outputs
+
+    def fingerprint(self) -> List[Any]:
+        return [self._modifier_key]
+
+    def modify_sample(self, sample: Dict) -> Dict:
+        """Set the output fields of the sample from the cache or, if it is not cached, apply the wrapped modifier and cache its output"""
+        key = self._cache_key([sample.get(field) for field in self.inputs])
+        outputs = self.cache.get(key)
+        if outputs is None:
+            sample = self.modifier.modify_sample(sample)
+            self.cache.set(
+                key, {field: _to_json(sample[field]) for field in self.outputs}
+            )
+            return sample
+        sample.update(outputs)
+        return sample
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        # Index of the first record with each key that is not cached
+        todo: Dict[str, int] = {}
+        offset = 0
+        for keys in self._iter_dataset_keys(dataset):
+            unknown = [key for key in keys if key not in todo]
+            cached = self.cache.get_many(unknown)
+            for i, key in enumerate(keys, start=offset):
+                if key not in cached and key not in todo:
+                    todo[key] = i
+            offset += len(keys)
+        logger.info(
+            f"MemoizedModifier: {len(dataset) - len(todo)} of {len(dataset)} records are replayed"
+        )
+        if todo:
+            modified = self.modifier._map_dataset(
+                dataset.select(list(todo.values())), num_proc=num_proc
+            )
+            todo_keys = list(todo)
+            batches = modified.select_columns(self.outputs).iter(
+                batch_size=KEY_BATCH_SIZE
+            )
+            for start, columns in zip(range(0, len(todo), KEY_BATCH_SIZE), batches):
+                chunk = todo_keys[start : start + KEY_BATCH_SIZE]  # noqa: E203
+                self.cache.set_many(
+                    (
+                        key,
+                        {field: _to_json(columns[field][j]) for field in self.outputs},
+                    )
+                    for j, key in enumerate(chunk)
+                )
+            del todo, todo_keys, modified
+
+        # The outputs are looked up per batch, so they are not part of the function that is hashed and sent to the processes; the entries of a MemoryCache would still be, so it is only read in this process
+        return dataset.map(
+            self._replay_batch,
+            batched=True,
+            num_proc=num_proc if isinstance(self.cache, SqliteCache) else None,
+            new_fingerprint=generate_random_fingerprint(),
+        )
+
+    def _replay_batch(self, batch: Dict[str, List]) -> Dict[str, List]:
+        """Set the output fields of a batch of records from the cache; records whose outputs are not cached (anymore, e.g. after an eviction) are modified again"""
+        size = len(next(iter(batch.values())))
+        keys = self._batch_keys(batch, size)
+        outputs: Dict[str, Dict[str, Any]] = self.cache.get_many(keys)
+        for i, key in enumerate(keys):
+            if key not in outputs:
+                sample = self.modify_sample({name: batch[name][i] for name in batch})
+                outputs[key] = {
+                    field: _to_json(sample[field]) for field in self.outputs
+                }
+        for field in self.outputs:
+            batch[field] = [outputs[key][field] for key in keys]
+        return batch
+
+    def _iter_dataset_keys(self, dataset: datasets.Dataset) -> Iterator[List[str]]:
+        """Cache keys of the records of the dataset, in batches of `KEY_BATCH_SIZE` records; missing input fields count as None"""
+        present = [field for field in self.inputs if field in dataset.column_names]
+        if not present:
+            for start in range(0, len(dataset), KEY_BATCH_SIZE):
+                size = min(KEY_BATCH_SIZE, len(dataset) - start)
+                yield [self._cache_key([None] * len(self.inputs))] * size
+            return
+        for batch in dataset.select_columns(present).iter(batch_size=KEY_BATCH_SIZE):
+            yield self._batch_keys(batch, len(batch[present[0]]))
+
+    def _batch_keys(self, batch: Dict[str, List], size: int) -> List[str]:
+        """Cache keys of the `size` records of a batch; missing input fields count as None"""
+        columns = [batch.get(field, [None] * size) for field in self.inputs]
+        return [self._cache_key(list(values)) for values in zip(*columns)]
+
+    def _cache_key(self, values: List[Any]) -> str:
+        return cache_key(self._modifier_key, values)
+
+
+def _to_json(value: Any) -> Any:
+    """Convert NumPy arrays and scalars to lists and Python scalars, so that `value` can be stored as JSON"""
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    return value
@@ -1,10 +1,19 @@
 import csv
 import logging
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from transnormer_data import utils
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.cache import file_digest
 from transnormer_data.detokenizer import DtaEvalDetokenizer
+from transnormer_data.lexicon import (
+    CompiledLexicon,
+    LexiconNgramMatcher,
+    find_compiled_lexicon,
+    load_compiled_lexicon,
+    share_mapping,
+)
+from transnormer_data.ngram_matcher import NgramMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +26,7 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
         mapping_files: Optional[List[str]] = None,
         mapping_files_delimiters: Optional[str] = None,
         transliterate_source: Optional[bool] = None,
+        longest_match_first: Optional[bool] = None,
     ) -> None:
         """
         n-gram to m-gram cross layer replacement modifier.
@@ -26,6 +36,10 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
         Example: All occurrences of the n-gram (X,Y) on the orig layer will
         get normalized as (X',Y'). That is, we exchange the m-gram on the norm layer
         that corresponds to (X,Y) with (X', Y')
+
+        `mapping_files` are TSV/CSV files or a single compiled lexicon of kind "ntom" (see `cli/compile_lexicon.py`), which is memory-mapped instead of parsed.
+
+        The source n-grams are found with an Aho-Corasick automaton (see `NgramMatcher`) that is built once when the mapping is set. Per default, all occurrences of all source n-grams are replaced (overlaps are resolved on the target layer, see `_get_start2ngram_and_end`). Pass `longest_match_first=True` to resolve overlapping source n-grams by keeping the longest one, going from left to right.
         """
 
         # Keys in the sample dictionary
@@ -47,10 +61,12 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
         # Lengths of the source ngrams in the mapping
         self.src_ngram_lengths: List[int] | None = None
 
-        # Replacement dictionary
+        # Replacement dictionary (setting it also builds self._matcher)
         mapping_files = [] if mapping_files is None else mapping_files
-        self.replacement_mapping: Dict[Tuple[str, ...], Tuple[str, ...]] = (
-            self._load_n2m_replacement_mapping(mapping_files, mapping_files_delimiters)
+        self.mapping_files = mapping_files
+        self.mapping_files_delimiters = mapping_files_delimiters
+        self.replacement_mapping = self._load_n2m_replacement_mapping(
+            mapping_files, mapping_files_delimiters
         )
 
         # Whether to transliterate (e.g. "ſ" -> "s") the source tokens,
@@ -58,8 +74,29 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
         # iff the keys in the replacement_mapping are also transliterated types
         self.xlit_src = False if transliterate_source is None else transliterate_source
 
+        # Whether overlapping source ngrams are resolved by longest-match-first
+        self.longest_match_first = (
+            False if longest_match_first is None else longest_match_first
+        )
+
         self._current_sample: Dict = {}
 
+    @property
+    def replacement_mapping(self) -> Mapping[Tuple[str, ...], Tuple[str, ...]]:
+        return self._replacement_mapping
+
+    @replacement_mapping.setter
+    def replacement_mapping(
+        self, mapping: Mapping[Tuple[str, ...], Tuple[str, ...]]
+    ) -> None:
+        self._replacement_mapping = mapping
+        # Compiled lexicons are searched in place instead of building an automaton
+        self._matcher: NgramMatcher = (
+            LexiconNgramMatcher(mapping)
+            if isinstance(mapping, CompiledLexicon)
+            else NgramMatcher(mapping.keys())
+        )
+
     def get_ngram_lengths(
         self, ngram_mapping: Dict[Tuple[str, ...], Tuple[str, ...]]
     ) -> List[int]:
@@ -67,12 +104,14 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
 
     def _find_ngram_indices(
         self,
-        ngrams_to_search: Set[Tuple[str, ...]],
+        ngrams_to_search: Collection[Tuple[str, ...]],
         sent_tok: List[str],
         ngram_lengths: Optional[Iterable[int]] = None,
     ) -> Dict[Tuple[str, ...], List[Tuple[int, ...]]]:
         """
         Returns a mapping of the given ngrams to their indices in the list of strings.
+
+        Note: `map_tokens_cross_layer` uses the precompiled `self._matcher` instead, which returns the same mapping for the ngrams in `self.replacement_mapping`.
         """
 
         # Get ngram length's if not given
@@ -145,7 +184,7 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
         self,
         ngrams2indices_src: Dict[Tuple[str, ...], List[Tuple[int, ...]]],
         alignment: List[List[int | None]],
-        repl_lex: Dict[Tuple[str, ...], Tuple[str, ...]],
+        repl_lex: Mapping[Tuple[str, ...], Tuple[str, ...]],
     ) -> Dict[Tuple[int, ...], Tuple[str, ...]]:
         """
         Creates a mapping of a source index tuple to a desired source ngram according to
@@ -243,13 +282,11 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
         where `any_changes` is False iff `tokens_new==tokens_old`.
         """
         tokens_trg_new = []
-        search_ngrams_src = set(self.replacement_mapping.keys())
         # Find source ngrams in source tokens
-        ngram2idxs_src = self._find_ngram_indices(
-            search_ngrams_src,
-            tokens_src,
-            self.src_ngram_lengths,
-        )
+        if self.longest_match_first:
+            ngram2idxs_src = self._matcher.find_longest(tokens_src)
+        else:
+            ngram2idxs_src = self._matcher.find_all(tokens_src)
         # Nothing to change: exit
         if not ngram2idxs_src:
             return tokens_trg, False
@@ -311,9 +348,44 @@ class ReplaceNtoMCrossLayerModifier(BaseDatasetModifier):
 
         return sample
 
+    def input_fields(self) -> List[str]:
+        return [
+            self.raw_trg,
+            self.tok_trg,
+            self.ws_trg,
+            self.spans_trg,
+            self.tok_src,
+            self.alignment,
+            self.lang_de_score,
+        ]
+
+    def output_fields(self) -> List[str]:
+        return [self.raw_trg, self.tok_trg, self.ws_trg, self.spans_trg, self.alignment]
+
+    def fingerprint(self) -> List[Any]:
+        return [
+            file_digest(self.mapping_files),
+            self.mapping_files_delimiters,
+            self.xlit_src,
+            self.longest_match_first,
+        ]
+
+    def share_lexicon(self) -> CompiledLexicon:
+        """Move the replacement mapping into a lexicon that all worker processes share without copying it (see `lexicon.share_mapping`)
+
+        Call this before the modifier is handed to multiple processes, e.g. before `modify_dataset(..., num_proc=N)`. If the mapping is not a compiled lexicon file already, the returned `SharedLexicon` must be closed when all processes are done.
+        """
+        self.replacement_mapping = share_mapping(self.replacement_mapping, kind="ntom")
+        return self.replacement_mapping  # type: ignore
+
     def _load_n2m_replacement_mapping(
         self, files: List[str], delimiters: Optional[str] = None
-    ) -> Dict[Tuple[str, ...], Tuple[str, ...]]:
+    ) -> Mapping[Tuple[str, ...], Tuple[str, ...]]:
+        path_lexicon = find_compiled_lexicon(files)
+        if path_lexicon is not None:
+            lexicon = load_compiled_lexicon(path_lexicon, kind="ntom")
+            self.src_ngram_lengths = lexicon.ngram_lengths
+            return lexicon
         all_pairs = []
         for file in files:
             with open(file, newline="") as csvfile:
@@ -1,6 +1,11 @@
 import csv
-from typing import Dict, List, Optional, Tuple
+import heapq
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Generator, Iterator, List, Optional, Sequence, Tuple
 
+import datasets
 import spacy
 
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
@@ -16,6 +21,174 @@ def infer_type(value):
         return value
 
 
+def _sort_key(uid: Tuple) -> Tuple:
+    """Sort key for uids whose values may be numbers or strings: numbers come before strings, each in their natural order"""
+    return tuple((isinstance(value, str), value) for value in uid)
+
+
+def _iter_corrections(
+    files: List[str], uid_labels: List[str], raw_label: str
+) -> Iterator[Tuple[Tuple[str | int, ...], str]]:
+    """Yield the pairs `(uid, corrected_raw)` from the CSV/TSV files in the order of the files and rows
+
+    The values of a uid are in the order of `uid_labels`, whatever the order of the columns in the file.
+    """
+    for fname in files:
+        if fname.endswith(".csv") or fname.endswith(".tsv"):
+            with open(fname, newline="") as csvfile:
+                dialect = csv.Sniffer().sniff(csvfile.read(1024), delimiters="\t,")
+                # dialect.quotechar = "`"
+                csvfile.seek(0)
+                reader = csv.reader(csvfile, dialect)
+                column_names = next(reader)
+                if not (all([(uid_label in column_names) for uid_label in uid_labels])):
+                    raise Exception(
+                        ValueError,
+                        f"Not all uid_labels '{uid_labels}' in file: {fname}",
+                    )
+                # get the column index for uid fields (in the order of uid_labels, i.e. the order of the uids of the samples)
+                indices_uids = [column_names.index(label) for label in uid_labels]
+                try:
+                    index_raw = column_names.index(raw_label)
+                except ValueError as e:
+                    raise Exception(e, f"Raw label '{raw_label}' not in file: {fname}")
+                for row in reader:
+                    key = tuple([infer_type(row[i]) for i in indices_uids])
+                    yield key, row[index_raw]
+
+
+class SortedCorrections(object):
+    """Corrected raw strings sorted by uid, for merge-joining them with a dataset
+
+    The corrections are read from the files in chunks of `chunk_size` rows; each chunk is sorted and written to a temporary run file. The runs are merged lazily, so that memory stays bounded by `chunk_size` regardless of the number of corrections. If a uid occurs more than once, the last correction wins (as with `ReplaceRawModifier._load_corrected_samples`).
+
+    `lookup` reads the merged stream forwards. Datasets that are looked up in uid order (e.g. one dataset per basename, in order of the basenames) are joined in a single pass over the corrections; otherwise the stream is restarted.
+
+    The run files are removed with `close` (or at the end of a `with` block).
+    """
+
+    def __init__(
+        self,
+        files: List[str],
+        uid_labels: List[str],
+        raw_label: str,
+        chunk_size: int = 1_000_000,
+        dir: Optional[str] = None,
+    ) -> None:
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = (
+            tempfile.TemporaryDirectory(dir=dir, prefix="corrections-")
+        )
+        self.runs: List[str] = []
+        chunk: List[Tuple[Tuple, int, Tuple, str]] = []
+        for seq, (uid, raw) in enumerate(
+            _iter_corrections(files, uid_labels, raw_label)
+        ):
+            chunk.append((_sort_key(uid), seq, uid, raw))
+            if len(chunk) >= chunk_size:
+                self._write_run(chunk)
+                chunk = []
+        if chunk:
+            self._write_run(chunk)
+        self._reset()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The open stream cannot be pickled; copies don't own the run files
+        state = self.__dict__.copy()
+        state["_tmpdir"] = None
+        state["_stream"] = None
+        state["_head"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset()
+
+    def _write_run(self, chunk: List[Tuple[Tuple, int, Tuple, str]]) -> None:
+        assert self._tmpdir is not None
+        chunk.sort(key=lambda item: item[:2])
+        path = os.path.join(self._tmpdir.name, f"run-{len(self.runs):05d}.pickle")
+        with open(path, "wb") as f:
+            for item in chunk:
+                pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+
+    @staticmethod
+    def _read_run(path: str) -> Generator[Tuple[Tuple, int, Tuple, str], None, None]:
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def __iter__(self) -> Generator[Tuple[Tuple, Tuple, str], None, None]:
+        """Yield `(sort_key, uid, corrected_raw)` in uid order, one item per uid"""
+        readers = [self._read_run(path) for path in self.runs]
+        try:
+            merged = heapq.merge(*readers, key=lambda item: item[:2])
+            previous = None
+            for item in merged:
+                if previous is not None and previous[0] != item[0]:
+                    yield previous[0], previous[2], previous[3]
+                previous = item
+            if previous is not None:
+                yield previous[0], previous[2], previous[3]
+        finally:
+            # Close the run files, also if the stream is not read to the end
+            for reader in readers:
+                reader.close()
+
+    def _reset(self) -> None:
+        stream = getattr(self, "_stream", None)
+        if stream is not None:
+            stream.close()
+        self._stream: Optional[Generator[Tuple[Tuple, Tuple, str], None, None]] = None
+        self._head: Optional[Tuple[Tuple, Tuple, str]] = None
+        # Largest sort key that was skipped in the stream
+        self._skipped: Optional[Tuple] = None
+
+    def _advance(self) -> None:
+        assert self._stream is not None
+        if self._head is not None:
+            self._skipped = self._head[0]
+        self._head = next(self._stream, None)
+
+    def lookup(self, uids: Sequence[Tuple]) -> Dict[int, str]:
+        """Return a mapping of the indices of `uids` that have a correction to the corrected raw string"""
+        keys = {i: _sort_key(uid) for i, uid in enumerate(uids) if None not in uid}
+        order = sorted(keys, key=keys.__getitem__)
+        if not order:
+            return {}
+        if self._stream is None or (
+            self._skipped is not None and keys[order[0]] <= self._skipped
+        ):
+            self._reset()
+            self._stream = iter(self)
+            self._advance()
+        corrected = {}
+        for i in order:
+            while self._head is not None and self._head[0] < keys[i]:
+                self._advance()
+            if self._head is None:
+                break
+            if self._head[0] == keys[i]:
+                corrected[i] = self._head[2]
+        return corrected
+
+    def close(self) -> None:
+        """Close the stream and remove the run files"""
+        self._reset()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def __enter__(self) -> "SortedCorrections":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+
 class ReplaceRawModifier(BaseDatasetModifier):
     def __init__(
         self,
@@ -23,10 +196,14 @@ class ReplaceRawModifier(BaseDatasetModifier):
         mapping_files: Optional[List[str]] = None,
         uid_labels: List[str] = ["basename", "par_idx"],
         raw_label: str = "norm",
+        streaming: bool = False,
+        chunk_size: int = 1_000_000,
     ) -> None:
         """
         This modifier replaces the raw text version on the target layer with a
         corrected string and propagates the changes to the tokenized version.
+
+        By default, all corrections are loaded into memory. If `streaming` is True, the corrections are sorted by uid in temporary files with at most `chunk_size` rows in memory (see `SortedCorrections`) and `modify_dataset` merge-joins them with the dataset, batch by batch. This is meant for correction files that do not fit into memory; `modify_sample` cannot be used on its own then. Call `close` to remove the temporary files.
         """
 
         # Keys in the sample dictionary
@@ -54,9 +231,16 @@ class ReplaceRawModifier(BaseDatasetModifier):
 
         # Corrected raw samples
         mapping_files = [] if mapping_files is None else mapping_files
-        self.corrected_raw_samples: Dict[Tuple[str | int, ...], str] = (
-            self._load_corrected_samples(mapping_files, self.uid_labels, raw_label)
-        )
+        self.sorted_corrections: Optional[SortedCorrections] = None
+        if streaming:
+            self.corrected_raw_samples: Dict[Tuple[str | int, ...], str] = {}
+            self.sorted_corrections = SortedCorrections(
+                mapping_files, self.uid_labels, raw_label, chunk_size=chunk_size
+            )
+        else:
+            self.corrected_raw_samples = self._load_corrected_samples(
+                mapping_files, self.uid_labels, raw_label
+            )
 
     def modify_sample(self, sample: Dict) -> Dict:
         """
@@ -69,7 +253,37 @@ class ReplaceRawModifier(BaseDatasetModifier):
         uid = tuple([sample[uid_label] for uid_label in self.uid_labels])
         if uid not in self.corrected_raw_samples:
             return sample
-        sample[self.raw] = self.corrected_raw_samples[uid]
+        return self._replace_raw(sample, self.corrected_raw_samples[uid])
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        if self.sorted_corrections is None:
+            return super()._map_dataset(dataset, num_proc=num_proc)
+        # Every process reads the corrections for its batches from the run files
+        return dataset.map(self._modify_batch, batched=True, num_proc=num_proc)
+
+    def _modify_batch(self, batch: Dict[str, List]) -> Dict[str, List]:
+        """Look up the corrections for a batch of records in the sorted corrections and replace the raw strings of the corrected records"""
+        assert self.sorted_corrections is not None
+        uids = list(zip(*[batch[label] for label in self.uid_labels]))
+        corrected = self.sorted_corrections.lookup(uids)
+        for i, raw in corrected.items():
+            sample = self._replace_raw({k: v[i] for k, v in batch.items()}, raw)
+            for k, v in sample.items():
+                if k not in batch:
+                    batch[k] = [None] * len(uids)
+                batch[k][i] = v
+        return batch
+
+    def close(self) -> None:
+        """Remove the temporary files of the sorted corrections (only in streaming mode)"""
+        if self.sorted_corrections is not None:
+            self.sorted_corrections.close()
+
+    def _replace_raw(self, sample: Dict, raw: str) -> Dict:
+        """Set the corrected raw string and propagate it to tokens, whitespaces, spans and alignment"""
+        sample[self.raw] = raw
         self.update_tok_from_raw(
             sample, key_raw=self.raw, key_tok=self.tok, key_ws=self.ws
         )
@@ -92,34 +306,4 @@ class ReplaceRawModifier(BaseDatasetModifier):
     def _load_corrected_samples(
         self, files: List[str], uid_labels: List[str], raw_label: str
     ) -> Dict[Tuple[str | int, ...], str]:
-        mapping = {}
-        for fname in files:
-            if fname.endswith(".csv") or fname.endswith(".tsv"):
-                with open(fname, newline="") as csvfile:
-                    dialect = csv.Sniffer().sniff(csvfile.read(1024), delimiters="\t,")
-                    # dialect.quotechar = "`"
-                    csvfile.seek(0)
-                    reader = csv.reader(csvfile, dialect)
-                    column_names = next(reader)
-                    if not (
-                        all([(uid_label in column_names) for uid_label in uid_labels])
-                    ):
-                        raise Exception(
-                            ValueError,
-                            f"Not all uid_labels '{uid_labels}' in file: {fname}",
-                        )
-                    # get the column index for uid fields
-                    indices_uids = [
-                        i for i, field in enumerate(column_names) if field in uid_labels
-                    ]
-                    try:
-                        index_raw = column_names.index(raw_label)
-                    except ValueError as e:
-                        raise Exception(
-                            e, f"Raw label '{raw_label}' not in file: {fname}"
-                        )
-                    for row in reader:
-                        key = tuple([infer_type(row[i]) for i in indices_uids])
-                        value = row[index_raw]
-                        mapping[key] = value
-        return mapping
+        return dict(_iter_corrections(files, uid_labels, raw_label))
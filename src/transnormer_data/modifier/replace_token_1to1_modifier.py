@@ -1,15 +1,30 @@
 import csv
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
+import datasets
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import spacy
 
+from transnormer_data import arrow_utils
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.cache import file_digest
 from transnormer_data.detokenizer import DtaEvalDetokenizer
+from transnormer_data.lexicon import (
+    CompiledLexicon,
+    find_compiled_lexicon,
+    load_compiled_lexicon,
+    share_mapping,
+)
 
 
 class ReplaceToken1to1Modifier(BaseDatasetModifier):
     def __init__(
-        self, layer: str = "norm", mapping_files: Optional[List[str]] = None
+        self,
+        layer: str = "norm",
+        mapping_files: Optional[List[str]] = None,
+        type_level: bool = False,
     ) -> None:
         """
         Modifier that replaces unigrams with unigrams.
@@ -18,6 +33,9 @@ class ReplaceToken1to1Modifier(BaseDatasetModifier):
 
         Default target layer is `norm`.
 
+        `mapping_files` are TSV/CSV files or a single compiled lexicon of kind "1to1" (see `cli/compile_lexicon.py`), which is memory-mapped instead of parsed.
+
+        If `type_level` is True, `modify_dataset` processes the dataset in batches of Arrow columns: the tokens of a batch are dictionary-encoded, the mapping is looked up once per distinct type, and tokens, raw strings and spans of the records that contain a mapped type are recomputed with vectorized operations (see `modify_batch`). The output is the same as with `modify_sample`.
         """
 
         # Keys in the sample dictionary
@@ -30,6 +48,7 @@ class ReplaceToken1to1Modifier(BaseDatasetModifier):
         self.tok = f"{layer}_tok"
         self.ws = f"{layer}_ws"
         self.spans = f"{layer}_spans"
+        self.type_level = type_level
 
         # Detokenizer
         self.detokenizer = DtaEvalDetokenizer()
@@ -39,7 +58,8 @@ class ReplaceToken1to1Modifier(BaseDatasetModifier):
 
         # Replacement dictionary
         mapping_files = [] if mapping_files is None else mapping_files
-        self.type_mapping: Dict[str, str] = self._load_replacement_mapping(
+        self.mapping_files = mapping_files
+        self.type_mapping: Mapping[str, str] = self._load_replacement_mapping(
             mapping_files
         )
 
@@ -68,6 +88,90 @@ class ReplaceToken1to1Modifier(BaseDatasetModifier):
 
         return sample
 
+    def modify_batch(self, batch: pa.Table) -> pa.Table:
+        """
+        Columnar version of `modify_sample` for a batch of records.
+
+        The mapping is looked up once per distinct token type of the batch. For the records that contain a mapped type, the tokens are replaced by a vectorized lookup, the raw strings are recomputed by joining tokens and whitespaces, and the spans by cumulative sums over token lengths and whitespace flags. Records for which this could differ from `modify_sample` (e.g. empty tokens or tokens and whitespaces of different lengths) are passed to `modify_sample`.
+        """
+        types, type_ids, row_ids = arrow_utils.dictionary_encode_tokens(batch[self.tok])
+        replacements = [self.type_mapping.get(t) for t in types]
+        is_mapped = np.array([r is not None for r in replacements], dtype=bool)
+        rows = arrow_utils.rows_with_types(row_ids, type_ids, is_mapped)
+        new_types = [t if r is None else r for t, r in zip(types, replacements)]
+
+        changed, regular = self._replace_columns(
+            batch.take(pa.array(rows, pa.int64())),
+            pa.array(types, pa.string()),
+            pa.array(new_types, pa.string()),
+        )
+        fallback = np.setdiff1d(np.arange(len(rows)), regular)
+        batch = arrow_utils.put_rows(
+            batch, rows[regular].tolist(), changed.take(pa.array(regular))
+        )
+        return arrow_utils.replace_rows(
+            batch,
+            rows[fallback].tolist(),
+            lambda row, sample: self.modify_sample(sample),
+        )
+
+    def _replace_columns(
+        self, records: pa.Table, types: pa.StringArray, new_types: pa.StringArray
+    ) -> Tuple[pa.Table, np.ndarray]:
+        """Replace every token of `records` that occurs in `types` by the corresponding entry of `new_types` and recompute the raw strings and spans of `records` without a per-record loop. Returns the modified records and the indices of the records for which the result is the same as with `modify_sample`."""
+        none_regular = np.array([], dtype=np.int64)
+        keys = [self.tok, self.ws, self.raw, self.spans]
+        if len(records) == 0 or not set(keys).issubset(records.column_names):
+            return records, none_regular
+        tokens = records[self.tok].combine_chunks()
+        whitespaces = records[self.ws].combine_chunks()
+        offsets = arrow_utils.list_offsets(tokens)
+        if (
+            tokens.null_count
+            or whitespaces.null_count
+            or not np.array_equal(offsets, arrow_utils.list_offsets(whitespaces))
+        ):
+            # Cannot flatten tokens and whitespaces in parallel
+            return records, none_regular
+        tokens_new = new_types.take(
+            pc.index_in(pc.list_flatten(tokens), value_set=types)
+        )
+        ws_flat = pc.list_flatten(whitespaces)
+
+        # `modify_sample` reads the whitespaces back from the new raw string, which only gives the old whitespaces if no token is empty or starts with a space
+        irregular = pc.or_(
+            pc.or_(pc.equal(pc.utf8_length(tokens_new), 0), pc.is_null(ws_flat)),
+            pc.starts_with(tokens_new, " "),
+        ).fill_null(True)
+        parents = pc.list_parent_indices(tokens).to_numpy(zero_copy_only=False)
+        irregular_records = parents[irregular.to_numpy(zero_copy_only=False)]
+        regular = np.setdiff1d(np.arange(len(records)), irregular_records)
+
+        for key, column in [
+            (
+                self.tok,
+                pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), tokens_new),
+            ),
+            (self.raw, arrow_utils.join_tokens(offsets, tokens_new, ws_flat)),
+            (self.spans, arrow_utils.token_spans(offsets, tokens_new, ws_flat)),
+        ]:
+            field = records.schema.field(key)
+            records = records.set_column(
+                records.schema.get_field_index(key), field, column.cast(field.type)
+            )
+        return records, regular
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        if not self.type_level:
+            return super()._map_dataset(dataset, num_proc=num_proc)
+        return (
+            dataset.with_format("arrow")
+            .map(self.modify_batch, batched=True, num_proc=num_proc)
+            .with_format(**dataset.format)
+        )
+
     def map_tokens(self, tokens_old: List[str]) -> Tuple[List[str], bool]:
         """Modifies `tokens_old` by applying the type mapping on each token, if necessary. Returns a tuple `(tokens_new, any_changes)` where `any_changes` is False iff `tokens_new==tokens_old`."""
         tokens_new = []
@@ -82,7 +186,27 @@ class ReplaceToken1to1Modifier(BaseDatasetModifier):
                 tokens_new.append(t)
         return tokens_new, any_changes
 
-    def _load_replacement_mapping(self, files: List[str]) -> Dict[str, str]:
+    def input_fields(self) -> List[str]:
+        return [self.raw, self.tok, self.ws, self.spans]
+
+    def output_fields(self) -> List[str]:
+        return [self.raw, self.tok, self.ws, self.spans]
+
+    def fingerprint(self) -> List[Any]:
+        return [file_digest(self.mapping_files)]
+
+    def share_lexicon(self) -> CompiledLexicon:
+        """Move the replacement mapping into a lexicon that all worker processes share without copying it (see `lexicon.share_mapping`)
+
+        Call this before the modifier is handed to multiple processes, e.g. before `modify_dataset(..., num_proc=N)`. If the mapping is not a compiled lexicon file already, the returned `SharedLexicon` must be closed when all processes are done.
+        """
+        self.type_mapping = share_mapping(self.type_mapping, kind="1to1")
+        return self.type_mapping  # type: ignore
+
+    def _load_replacement_mapping(self, files: List[str]) -> Mapping[str, str]:
+        path_lexicon = find_compiled_lexicon(files)
+        if path_lexicon is not None:
+            return load_compiled_lexicon(path_lexicon, kind="1to1")
         all_pairs = []
         for file in files:
             with open(file, newline="") as csvfile:
@@ -1,15 +1,29 @@
 import csv
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
+import datasets
+import numpy as np
+import pyarrow as pa
 import spacy
 
+from transnormer_data import arrow_utils
 from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.cache import file_digest
 from transnormer_data.detokenizer import DtaEvalDetokenizer
+from transnormer_data.lexicon import (
+    CompiledLexicon,
+    find_compiled_lexicon,
+    load_compiled_lexicon,
+    share_mapping,
+)
 
 
 class ReplaceToken1toNModifier(BaseDatasetModifier):
     def __init__(
-        self, layer: str = "norm", mapping_files: Optional[List[str]] = None
+        self,
+        layer: str = "norm",
+        mapping_files: Optional[List[str]] = None,
+        type_level: bool = False,
     ) -> None:
         """
         Modifier that replaces unigrams with ngrams.
@@ -18,6 +32,9 @@ class ReplaceToken1toNModifier(BaseDatasetModifier):
 
         Default target layer is `norm`.
 
+        `mapping_files` are TSV/CSV files or a single compiled lexicon of kind "1ton" (see `cli/compile_lexicon.py`), which is memory-mapped instead of parsed.
+
+        If `type_level` is True, `modify_dataset` looks up the mapping once per distinct token type of a batch and only rebuilds the records that contain a mapped type (see `modify_batch`). The output is the same as with `modify_sample`.
         """
 
         # Keys in the sample dictionary
@@ -33,6 +50,7 @@ class ReplaceToken1toNModifier(BaseDatasetModifier):
         other_layer = (valid_layers - {layer}).pop()
         self.tok_src = f"{other_layer}_tok"
         self.alignment = "alignment"
+        self.type_level = type_level
 
         # Detokenizer
         self.detokenizer = DtaEvalDetokenizer()
@@ -42,7 +60,8 @@ class ReplaceToken1toNModifier(BaseDatasetModifier):
 
         # Replacement dictionary
         mapping_files = [] if mapping_files is None else mapping_files
-        self.type_mapping: Dict[str, List[str]] = self._load_replacement_mapping(
+        self.mapping_files = mapping_files
+        self.type_mapping: Mapping[str, List[str]] = self._load_replacement_mapping(
             mapping_files
         )
 
@@ -57,6 +76,52 @@ class ReplaceToken1toNModifier(BaseDatasetModifier):
         tokens_old = sample[self.tok]
         ws_old = sample[self.ws]
         tokens_new, ws_new, any_changes = self.map_tokens(tokens_old, ws_old)
+        return self._update_sample(sample, tokens_new, ws_new, any_changes)
+
+    def modify_batch(self, batch: pa.Table) -> pa.Table:
+        """
+        Type-level version of `modify_sample` for a batch of records.
+
+        The mapping is looked up once per distinct token type of the batch, the results are applied to all occurrences of a type via its id, and only the records that contain a mapped type are rebuilt.
+        """
+        types, type_ids, row_ids = arrow_utils.dictionary_encode_tokens(batch[self.tok])
+        replacements = [self.type_mapping.get(t) for t in types]
+        is_mapped = np.array([r is not None for r in replacements], dtype=bool)
+        rows = arrow_utils.rows_with_types(row_ids, type_ids, is_mapped)
+        starts = np.searchsorted(row_ids, rows, side="left")
+        ends = np.searchsorted(row_ids, rows, side="right")
+        bounds = dict(zip(rows.tolist(), zip(starts.tolist(), ends.tolist())))
+
+        def modify_row(row: int, sample: Dict) -> Dict:
+            start, end = bounds[row]
+            tokens_new, ws_new, any_changes = self._replace_tokens(
+                sample[self.tok],
+                sample[self.ws],
+                (replacements[i] for i in type_ids[start:end]),
+            )
+            return self._update_sample(sample, tokens_new, ws_new, any_changes)
+
+        return arrow_utils.replace_rows(batch, rows.tolist(), modify_row)
+
+    def _map_dataset(
+        self, dataset: datasets.Dataset, num_proc: Optional[int] = None
+    ) -> datasets.Dataset:
+        if not self.type_level:
+            return super()._map_dataset(dataset, num_proc=num_proc)
+        return (
+            dataset.with_format("arrow")
+            .map(self.modify_batch, batched=True, num_proc=num_proc)
+            .with_format(**dataset.format)
+        )
+
+    def _update_sample(
+        self,
+        sample: Dict,
+        tokens_new: List[str],
+        ws_new: List[bool],
+        any_changes: bool,
+    ) -> Dict:
+        """Set the new tokens and whitespaces of the sample and propagate the changes to the raw string, the spans and the alignment"""
         if any_changes:
             sample[self.tok] = tokens_new
             sample[self.ws] = ws_new
@@ -85,12 +150,21 @@ class ReplaceToken1toNModifier(BaseDatasetModifier):
         """
         Modifies `tokens_old` and `ws_old` by applying the 1:n type mapping on each token, if necessary. Returns a tuple `(tokens_new, ws_new, any_changes)` where `any_changes` is False iff `tokens_new==tokens_old`.
         """
+        return self._replace_tokens(
+            tokens_old, ws_old, (self.type_mapping.get(t) for t in tokens_old)
+        )
 
+    def _replace_tokens(
+        self,
+        tokens_old: List[str],
+        ws_old: List[bool],
+        replacements: Iterable[Optional[List[str]]],
+    ) -> Tuple[List[str], List[bool], bool]:
+        """Replace each token in `tokens_old` with its replacement n-gram, unless the replacement is None"""
         tokens_new = []
         ws_new = []
         any_changes = False
-        for t, ws in zip(tokens_old, ws_old):
-            _tokens_new = self.type_mapping.get(t)
+        for t, ws, _tokens_new in zip(tokens_old, ws_old, replacements):
             # Found something?
             if _tokens_new is not None:
                 any_changes = True
@@ -103,7 +177,27 @@ class ReplaceToken1toNModifier(BaseDatasetModifier):
                 ws_new.append(ws)
         return tokens_new, ws_new, any_changes
 
-    def _load_replacement_mapping(self, files: List[str]) -> Dict[str, List[str]]:
+    def input_fields(self) -> List[str]:
+        return [self.raw, self.tok, self.ws, self.spans, self.tok_src, self.alignment]
+
+    def output_fields(self) -> List[str]:
+        return [self.raw, self.tok, self.ws, self.spans, self.alignment]
+
+    def fingerprint(self) -> List[Any]:
+        return [file_digest(self.mapping_files)]
+
+    def share_lexicon(self) -> CompiledLexicon:
+        """Move the replacement mapping into a lexicon that all worker processes share without copying it (see `lexicon.share_mapping`)
+
+        Call this before the modifier is handed to multiple processes, e.g. before `modify_dataset(..., num_proc=N)`. If the mapping is not a compiled lexicon file already, the returned `SharedLexicon` must be closed when all processes are done.
+        """
+        self.type_mapping = share_mapping(self.type_mapping, kind="1ton")
+        return self.type_mapping  # type: ignore
+
+    def _load_replacement_mapping(self, files: List[str]) -> Mapping[str, List[str]]:
+        path_lexicon = find_compiled_lexicon(files)
+        if path_lexicon is not None:
+            return load_compiled_lexicon(path_lexicon, kind="1ton")
         all_pairs = []
         for file in files:
             with open(file, newline="") as csvfile:
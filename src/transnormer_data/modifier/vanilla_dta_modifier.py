@@ -47,9 +47,9 @@ class VanillaDtaModifier(BaseDatasetModifier):
         )
 
     def modify_dataset(
-        self, dataset: datasets.Dataset, save_to=None
+        self, dataset: datasets.Dataset, save_to=None, num_proc=None
     ) -> datasets.Dataset:
-        dataset = dataset.map(self.modify_sample)
+        dataset = dataset.map(self.modify_sample, num_proc=num_proc)
         return dataset
 
     def modify_sample(self, sample: Dict) -> Dict:
@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Deque, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+
+class NgramMatcher(object):
+    """Aho-Corasick automaton that finds token n-grams in token sequences
+
+    The automaton is built once from a collection of n-grams (tuples of tokens). Afterwards, all occurrences of all n-grams in a token sequence are found in a single left-to-right pass over the sequence, independent of the number and the lengths of the n-grams.
+
+    Example:
+
+    >>> matcher = NgramMatcher([("daß", "es"), ("es",), ("Schiffahrt", ".")])
+    >>> matcher.find_all(["daß", "es", "heute", "in", "der", "Schiffahrt", "."])
+    {('es',): [(1,)], ('daß', 'es'): [(0, 1)], ('Schiffahrt', '.'): [(5, 6)]}
+    """
+
+    def __init__(self, ngrams: Iterable[Sequence[str]]) -> None:
+        # Transitions of the trie: state -> {token: next state}
+        self._goto: List[Dict[str, int]] = [{}]
+        # Failure links: state -> state of the longest proper suffix in the trie
+        self._fail: List[int] = [0]
+        # Lengths of the n-grams that end in a state, longest first
+        self._out: List[Tuple[int, ...]] = [()]
+        self._size = 0
+
+        for ngram in ngrams:
+            self._add(ngram)
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, ngram: Sequence[str]) -> bool:
+        state = 0
+        for token in ngram:
+            state = self._goto[state].get(token, -1)
+            if state < 0:
+                return False
+        return len(ngram) > 0 and len(ngram) in self._out[state]
+
+    def _add(self, ngram: Sequence[str]) -> None:
+        if not ngram:
+            return
+        state = 0
+        for token in ngram:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = next_state
+        if not self._out[state]:
+            self._out[state] = (len(ngram),)
+            self._size += 1
+
+    def _build_failure_links(self) -> None:
+        """Compute the failure links breadth-first and merge the outputs of each state with those of its failure state"""
+        queue: Deque[int] = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(token, 0)
+                if fail == next_state:
+                    # Children of the root fail to the root
+                    fail = 0
+                self._fail[next_state] = fail
+                # The failure state's n-grams are suffixes, i.e. shorter
+                self._out[next_state] = self._out[next_state] + self._out[fail]
+
+    def iter_matches(self, tokens: Sequence[str]) -> Iterator[Tuple[int, int]]:
+        """Yield the `(start, length)` of every occurrence of an n-gram in `tokens`
+
+        Matches are yielded in order of their end position, longer matches before shorter ones with the same end position. Overlapping matches are all yielded.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, token in enumerate(tokens):
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length in out[state]:
+                yield end - length + 1, length
+
+    def find_all(
+        self, tokens: Sequence[str]
+    ) -> Dict[Tuple[str, ...], List[Tuple[int, ...]]]:
+        """Return a mapping of the n-grams that occur in `tokens` to the indices of their occurrences
+
+        Output format (and order) is the same as `ReplaceNtoMCrossLayerModifier._find_ngram_indices`: n-grams are ordered by length, then by the position of their first occurrence, e.g. `{('x',): [(3,)], ('x','y') : [(1,2), (3,4)]}`.
+        """
+        return self._to_ngram2indices(
+            tokens, sorted(self.iter_matches(tokens), key=_by_length)
+        )
+
+    def find_longest(
+        self, tokens: Sequence[str]
+    ) -> Dict[Tuple[str, ...], List[Tuple[int, ...]]]:
+        """Like `find_all`, but resolve overlapping matches by longest-match-first
+
+        Going from left to right, the longest n-gram that starts at the current position is kept and all matches that overlap with it are dropped.
+        """
+        longest: Dict[int, int] = {}
+        for start, length in self.iter_matches(tokens):
+            if length > longest.get(start, 0):
+                longest[start] = length
+        matches = []
+        next_free = 0
+        for start in sorted(longest):
+            if start >= next_free:
+                matches.append((start, longest[start]))
+                next_free = start + longest[start]
+        return self._to_ngram2indices(tokens, sorted(matches, key=_by_length))
+
+    @staticmethod
+    def _to_ngram2indices(
+        tokens: Sequence[str], matches: Iterable[Tuple[int, int]]
+    ) -> Dict[Tuple[str, ...], List[Tuple[int, ...]]]:
+        ngram2indices: Dict[Tuple[str, ...], List[Tuple[int, ...]]] = {}
+        for start, length in matches:
+            ngram = tuple(tokens[start : start + length])  # noqa: E203
+            indices = tuple(range(start, start + length))
+            if ngram in ngram2indices:
+                ngram2indices[ngram].append(indices)
+            else:
+                ngram2indices[ngram] = [indices]
+        return ngram2indices
+
+
+def _by_length(match: Tuple[int, int]) -> Tuple[int, int]:
+    start, length = match
+    return length, start
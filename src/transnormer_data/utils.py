@@ -1,9 +1,10 @@
 import glob
 import json
 import os
+import random
 import unicodedata
 
-from typing import Generator, List, Union
+from typing import Any, Dict, Generator, Iterable, List, Union
 
 import datasets
 import pandas as pd
@@ -18,10 +19,14 @@ def get_basename_no_ext(file_path: Union[str, os.PathLike]) -> str:
 
 
 def save_dataset_to_json_grouped_by_property(
-    dataset: datasets.Dataset, property: str, path_outdir: Union[str, os.PathLike]
+    dataset: Union[datasets.Dataset, Iterable[Dict[str, Any]]],
+    property: str,
+    path_outdir: Union[str, os.PathLike],
 ) -> None:
     """Save a datasets.Dataset into multiple JSONL files grouped by a common value of property
 
+    Instead of a datasets.Dataset, `dataset` can be any iterable of records (e.g. a generator), in which case the records are written as they come in.
+
     `property` must be a column in the dataset. The common value by which records are grouped will be used as the output filename, i.e. the path will be "path_outputdir/{value_property}.jsonl". For example, if the "basename" property is taken (for DTA EvalCorpus and DTAK), the output path can be "path/to/dir/fontane_stechlin_1899.jsonl"
 
     `path_outdir` must be an existing directory path
@@ -41,6 +46,8 @@ def save_dataset_to_json_grouped_by_property(
         else:
             if f is not None:
                 f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    if f is not None:
+        f.close()
 
 
 def save_dataset_to_json(
@@ -93,3 +100,27 @@ def filename_gen(path: str) -> Generator[str, None, None]:
     else:
         for filename in glob.glob(path):
             yield filename
+
+
+def sample_sentences(path: str, key: str, size: int, seed: int) -> List[str]:
+    """Draw a uniform random sample of `size` sentences from the JSONL file(s) at `path` (reservoir sampling)"""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "**", "*.jsonl"), recursive=True))
+    else:
+        files = [path]
+    rng = random.Random(seed)
+    sample: List[str] = []
+    seen = 0
+    for fname in files:
+        with open(fname, "r", encoding="utf8") as f:
+            for line in f:
+                sentence = json.loads(line)[key]
+                seen += 1
+                if len(sample) < size:
+                    sample.append(sentence)
+                else:
+                    i = rng.randrange(seen)
+                    if i < size:
+                        sample[i] = sentence
+    rng.shuffle(sample)
+    return sample
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from transnormer_data.archive import (
+    ArchiveMember,
+    _zipfiles,
+    close_archives,
+    is_archive,
+    iter_documents,
+    open_document,
+)
+
+INPUT_DIR = "tests/testdata/dtak/ddctabs"
+
+
+def make_archives(input_dir: str, outdir: str) -> None:
+    """Pack the files in `input_dir` into a zip, tar and tar.gz archive in `outdir`"""
+    fnames = sorted(os.listdir(input_dir))
+    with zipfile.ZipFile(
+        os.path.join(outdir, "data.zip"), "w", compression=zipfile.ZIP_DEFLATED
+    ) as zf:
+        for fname in fnames:
+            zf.write(os.path.join(input_dir, fname), arcname=f"data/{fname}")
+    for ext, mode in [(".tar", "w"), (".tar.gz", "w:gz")]:
+        with tarfile.open(os.path.join(outdir, "data" + ext), mode) as tf:
+            for fname in fnames:
+                tf.add(os.path.join(input_dir, fname), arcname=f"data/{fname}")
+
+
+class ArchiveTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp()
+        make_archives(INPUT_DIR, self.tmpdir)
+        self.fnames = sorted(os.listdir(INPUT_DIR))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
+
+    def test_is_archive(self) -> None:
+        assert is_archive(os.path.join(self.tmpdir, "data.zip"))
+        assert is_archive(os.path.join(self.tmpdir, "data.tar.gz"))
+        assert not is_archive(INPUT_DIR)
+        assert not is_archive(os.path.join(INPUT_DIR, self.fnames[0]))
+
+    def test_iter_documents_directory(self) -> None:
+        documents = list(iter_documents(INPUT_DIR))
+        assert documents == [os.path.join(INPUT_DIR, f) for f in self.fnames]
+
+    def test_iter_documents_archives(self) -> None:
+        for ext in [".zip", ".tar", ".tar.gz"]:
+            path = os.path.join(self.tmpdir, "data" + ext)
+            documents = list(iter_documents(path))
+            assert all(isinstance(d, ArchiveMember) for d in documents)
+            assert [d.name for d in documents] == [f"data/{f}" for f in self.fnames]
+            for document, fname in zip(documents, self.fnames):
+                with open(os.path.join(INPUT_DIR, fname), "rb") as f:
+                    expected = f.read()
+                with open_document(document) as f:
+                    assert f.read() == expected
+
+    def test_zip_members_are_read_lazily(self) -> None:
+        documents = list(iter_documents(os.path.join(self.tmpdir, "data.zip")))
+        assert all(d.data is None for d in documents)
+        with open(os.path.join(INPUT_DIR, self.fnames[0]), encoding="utf8") as f:
+            expected = f.read()
+        with open_document(documents[0], encoding="utf8") as f:
+            assert f.read() == expected
+
+    def test_close_archives(self) -> None:
+        documents = list(iter_documents(os.path.join(self.tmpdir, "data.zip")))
+        with open_document(documents[0]) as f:
+            expected = f.read()
+        assert len(_zipfiles) == 1
+        zf = next(iter(_zipfiles.values()))
+        close_archives()
+        assert not _zipfiles
+        assert zf.fp is None
+        # closed archives are re-opened on demand
+        with open_document(documents[0]) as f:
+            assert f.read() == expected
+        close_archives()
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import tempfile
+import unittest
+
+from transnormer_data.cache import MemoryCache, SqliteCache, cache_key, file_digest
+
+
+def _write_range(args):
+    path, start = args
+    cache = SqliteCache(path)
+    for i in range(start, start + 100):
+        cache.set(cache_key(i), {"value": i})
+    return cache.get_many(cache_key(i) for i in range(start, start + 100))
+
+
+class SqliteCacheTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite")
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_cache_key(self) -> None:
+        assert cache_key("ab", "c") != cache_key("a", "bc")
+        assert cache_key("daß", ["ZUVIEL"]) == cache_key("daß", ["ZUVIEL"])
+        assert len(cache_key("daß")) == 64
+
+    def test_get_set(self) -> None:
+        cache = SqliteCache(self.path)
+        assert cache.get("a") is None
+        cache.set("a", "dass")
+        cache.set_many([("b", [1, 2]), ("c", None), ("a", "daß")])
+        assert cache.get("a") == "daß"
+        assert cache.get_many(["a", "b", "c", "d", "a"]) == {
+            "a": "daß",
+            "b": [1, 2],
+            "c": None,
+        }
+        assert len(cache) == 3
+        cache.close()
+
+    def test_persistence_and_tables(self) -> None:
+        cache = SqliteCache(self.path, table="one")
+        cache.set_many((str(i), i) for i in range(1200))
+        cache.close()
+        cache = SqliteCache(self.path, table="one")
+        assert cache.get_many(str(i) for i in range(1200)) == {
+            str(i): i for i in range(1200)
+        }
+        assert len(SqliteCache(self.path, table="two")) == 0
+        with self.assertRaises(ValueError):
+            SqliteCache(self.path, table="one; DROP TABLE one")
+
+    def test_pickle(self) -> None:
+        cache = SqliteCache(self.path)
+        cache.set("a", 1)
+        cache_copy = pickle.loads(pickle.dumps(cache))
+        assert cache_copy.get("a") == 1
+
+    def test_multiple_processes(self) -> None:
+        SqliteCache(self.path)
+        with multiprocessing.get_context("spawn").Pool(4) as pool:
+            results = pool.map(_write_range, [(self.path, i * 100) for i in range(8)])
+        assert [len(r) for r in results] == [100] * 8
+        cache = SqliteCache(self.path)
+        assert len(cache) == 800
+        assert cache.get(cache_key(799)) == {"value": 799}
+
+    def test_max_entries(self) -> None:
+        cache = SqliteCache(self.path, max_entries=3)
+        cache.set_many([("a", 1), ("b", 2), ("c", 3)])
+        # Reading "a" makes "b" the least recently used entry
+        assert cache.get("a") == 1
+        cache.set("d", 4)
+        assert len(cache) == 3
+        assert cache.get_many(["a", "b", "c", "d"]) == {"a": 1, "c": 3, "d": 4}
+        with self.assertRaises(ValueError):
+            SqliteCache(self.path, max_entries=0)
+
+    def test_deferred_access_times(self) -> None:
+        cache = SqliteCache(self.path, timeout=0.1, max_entries=3)
+        cache.set_many([("a", 1), ("b", 2)])
+        # Reads do not wait for the write lock of another connection
+        other = sqlite3.connect(self.path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        assert cache.get("a") == 1
+        other.execute("ROLLBACK")
+        accessed = dict(other.execute("SELECT key, accessed FROM cache"))
+        assert accessed["a"] == accessed["b"]
+        # The access times are written with the next write
+        cache.set("c", 3)
+        accessed = dict(other.execute("SELECT key, accessed FROM cache"))
+        assert accessed["b"] < accessed["a"] < accessed["c"]
+        assert cache.get("b") == 2
+        cache.flush()
+        accessed = dict(other.execute("SELECT key, accessed FROM cache"))
+        assert accessed["b"] > accessed["c"]
+        other.close()
+
+    def test_old_table(self) -> None:
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        connection.execute("INSERT INTO cache VALUES ('a', '1')")
+        connection.commit()
+        connection.close()
+        cache = SqliteCache(self.path, max_entries=1)
+        assert cache.get("a") == 1
+        cache.set("b", 2)
+        assert cache.get_many(["a", "b"]) == {"b": 2}
+
+
+class MemoryCacheTester(unittest.TestCase):
+    def test_get_set(self) -> None:
+        cache = MemoryCache(max_entries=3)
+        cache.set_many([("a", 1), ("b", 2), ("c", 3)])
+        assert cache.get("a") == 1
+        cache.set("d", 4)
+        assert len(cache) == 3
+        assert cache.get_many(["a", "b", "c", "d"]) == {"a": 1, "c": 3, "d": 4}
+        assert cache.get("b") is None
+
+    def test_file_digest(self) -> None:
+        files = [
+            "tests/testdata/type-replacements/old2new.tsv",
+            "tests/testdata/type-replacements/error2correct.tsv",
+        ]
+        assert file_digest(files) == file_digest(list(files))
+        assert file_digest(files) != file_digest(files[::-1])
+        assert file_digest(files) != file_digest(files[:1])
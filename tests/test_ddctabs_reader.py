@@ -0,0 +1,76 @@
+import io
+import unittest
+
+from transnormer_data.ddctabs_reader import DdcTabsReader
+
+TABS = """%%$DDC:meta.basename=test_doc_1900
+%%$DDC:index[0]=Token w
+%%$DDC:index[1]=Utf8 u
+%%$DDC:index[2]=CanonicalToken v
+%%$DDC:index[3]=Pos p
+%%$DDC:index[4]=Lemma l
+%%$DDC:index[5]=Coord coord
+%%$DDC:index[6]=WordSep ws
+%%$DDC:BREAK.s[1]=1
+Eyn\tEyn\tEin\tART\teine\t-\t1
+Theilstueck\tTheilſtueck\tTeilstück\tNN\tTeilstück\t-\t1
+.\t.\t.\t$.\t.\t-\t0
+
+%%$DDC:BREAK.s[2]=4
+geht_es\tgeht_es\tgeht_es\tVVFIN\tgehen\t-\t1
+
+incomplete\tincomplete\tincomplete\tADJD\tincomplete\t-\t1
+"""
+
+
+class DdcTabsReaderTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.path = "tests/testdata/dtak/ddctabs/weigel_moralweissheit_1674.TEI-P5.tabs"
+
+    def test_read_stream(self) -> None:
+        sents = list(DdcTabsReader(io.StringIO(TABS)))
+        # the tokens after the last empty line are not yielded
+        assert len(sents) == 2
+        assert [sent.idx for sent in sents] == [0, 1]
+        assert sents[0].columns == {
+            "xlit": ["Eyn", "Theilstueck", "."],
+            "orig": ["Eyn", "Theilſtueck", "."],
+            "norm": ["Ein", "Teilstück", "."],
+            "pos": ["ART", "NN", "$."],
+            "lemma": ["eine", "Teilstück", "."],
+            "ws": [True, True, False],
+        }
+        assert sents[1].columns["norm"] == ["geht_es"]
+        # the reader does not change the whitespace before the first token
+        assert sents[1].columns["ws"] == [True]
+
+    def test_meta(self) -> None:
+        reader = DdcTabsReader(self.path)
+        assert reader.meta == {}
+        next(iter(reader))
+        assert reader.meta["firstDate"] == "1837"
+        assert reader.meta["textClass"] == "Belletristik::Prosa"
+        assert reader.meta["scan_"] == ""
+        assert len(reader.meta) == 24
+
+    def test_column_projection(self) -> None:
+        reader = DdcTabsReader(
+            io.StringIO(TABS), columns={"pos": ("Pos", "p"), "ws": ("WordSep", "ws")}
+        )
+        sent = next(iter(reader))
+        assert sent.columns == {"pos": ["ART", "NN", "$."], "ws": [True, True, False]}
+        assert reader.column_indices == {"pos": 3, "ws": 6}
+
+    def test_missing_column(self) -> None:
+        reader = DdcTabsReader(io.StringIO(TABS), columns={"page": ("Page", "page")})
+        with self.assertRaises(Exception):
+            list(reader)
+
+    def test_read_file(self) -> None:
+        sents = list(DdcTabsReader(self.path))
+        assert len(sents) == 80
+        for sent in sents:
+            lengths = {len(values) for values in sent.columns.values()}
+            assert len(lengths) == 1
+        # small buffer size does not change the output
+        assert list(DdcTabsReader(self.path, buffer_size=100)) == sents
@@ -1,4 +1,6 @@
 import os
+import shutil
+import tempfile
 from typing import List
 import unittest
 
@@ -237,3 +239,88 @@ class DtaEvalMakerTester(unittest.TestCase):
         target = ["Versammlungs-Freiheits-Gesetz"]
         result = self.maker.join_wrongly_splitted_tokens(tokens)
         assert result == target
+
+    def test_parallel_make(self) -> None:
+        """Test whether processing the files in parallel returns the same dataset"""
+        maker = DtaEvalMaker(
+            self.input_dir_data,
+            self.input_dir_meta,
+            os.path.join(TMPDIR, "parallel"),
+            jobs=2,
+        )
+        dataset = maker.make(save=True)
+        assert dataset.to_list() == self.dataset.to_list()
+        for basename in ["brentano_kasperl_1838", "fontane_stechlin_1899"]:
+            with open(f"{TMPDIR}/{basename}.jsonl", encoding="utf-8") as f:
+                expected = f.read()
+            with open(f"{TMPDIR}/parallel/{basename}.jsonl", encoding="utf-8") as f:
+                assert f.read() == expected
+
+    def test_parallel_make_empty(self) -> None:
+        """Test whether processing no files in parallel returns the same empty dataset"""
+        input_dir = tempfile.mkdtemp()
+        try:
+            target = DtaEvalMaker(
+                input_dir, self.input_dir_meta, self.output_dir
+            ).make()
+            maker = DtaEvalMaker(
+                input_dir, self.input_dir_meta, self.output_dir, jobs=2
+            )
+            dataset = maker.make()
+            assert len(dataset) == 0
+            assert dataset.column_names == target.column_names
+            assert dataset.features == target.features
+        finally:
+            shutil.rmtree(input_dir)
+
+    def test_make_from_archive(self) -> None:
+        """Test whether reading the XML files from a tar archive returns the same dataset"""
+        archive_dir = tempfile.mkdtemp()
+        try:
+            path_archive = shutil.make_archive(
+                os.path.join(archive_dir, "xml"), "gztar", root_dir=self.input_dir_data
+            )
+            maker = DtaEvalMaker(
+                path_archive,
+                self.input_dir_meta,
+                self.output_dir,
+            )
+            assert maker.make().to_list() == self.dataset.to_list()
+        finally:
+            shutil.rmtree(archive_dir)
+
+    def test_iter_sentence_elements(self) -> None:
+        """Test whether incremental parsing yields the same sentences as a full parse"""
+        path = os.path.join(self.input_dir_data, "fontane_stechlin_1899.xml")
+        tree = etree.parse(path)
+        targets = [
+            (self.maker._create_example_from_s(s), "sbad" in s.attrib)
+            for s in tree.iterfind(".//s")
+        ]
+        results = []
+        for s in self.maker._iter_sentence_elements(path):
+            results.append((self.maker._create_example_from_s(s), "sbad" in s.attrib))
+            # processed sentences have been removed from the tree
+            assert s.getprevious() is None
+        assert results == targets
+
+    def test_iter_sentence_elements_nested(self) -> None:
+        """Test whether finished ancestors of processed sentences are removed from the tree"""
+        xml = (
+            "<doc><body>"
+            "<div><p><s><w old='a' new='a'/></s></p><p><s><w old='b' new='b'/></s></p></div>"
+            "<div><p><s><w old='c' new='c'/></s></p></div>"
+            "</body></doc>"
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".xml", delete=False) as f:
+            f.write(xml)
+        try:
+            n = 0
+            for s in self.maker._iter_sentence_elements(f.name):
+                n += 1
+                # neither the sentence nor its ancestors have preceding siblings
+                assert all(elem.getprevious() is None for elem in s.iterancestors())
+                assert s.getprevious() is None
+            assert n == 3
+        finally:
+            os.remove(f.name)
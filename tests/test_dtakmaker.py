@@ -1,4 +1,7 @@
+import json
 import os
+import shutil
+import tempfile
 import unittest
 from typing import List
 
@@ -74,6 +77,10 @@ class DtakMakerTester(unittest.TestCase):
         """Test whether dataset's shape is correct"""
         assert self.dataset.shape == (101, len(self.target_properties))
 
+    def test_first_token_ws(self) -> None:
+        """Test whether the whitespace before the first token of a sentence is always False"""
+        assert all(not ws[0] for ws in self.dataset["orig_ws"] if ws)
+
     def test_verify_data_integrity(self) -> None:
         for i, example in enumerate(self.dataset):
             # Recreate: tok,ws -> raw
@@ -136,3 +143,118 @@ class DtakMakerTester(unittest.TestCase):
             print()
             if i > 20:
                 break
+
+
+class DtakMakerOutputModesTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.input_dir_data = "tests/testdata/dtak/ddctabs/"
+        self.input_dir_meta = "tests/testdata/metadata/metadata_dtak.jsonl"
+        self.output_dir = os.path.join(TMPDIR, "default")
+        self.output_dir_streaming = os.path.join(TMPDIR, "streaming")
+        self.output_dir_parallel = os.path.join(TMPDIR, "parallel")
+
+    def tearDown(self) -> None:
+        # Remove files that were created during training
+        for root, dirs, files in os.walk(TMPDIR, topdown=False):
+            for file in files:
+                os.remove(os.path.join(root, file))
+            else:
+                os.rmdir(root)
+
+    def assert_same_files(self, dir_expected: str, dir_actual: str) -> None:
+        filenames = sorted(os.listdir(dir_expected))
+        assert filenames == sorted(os.listdir(dir_actual))
+        assert len(filenames) == 2
+        for filename in filenames:
+            with open(os.path.join(dir_expected, filename), encoding="utf-8") as f:
+                expected = f.read()
+            with open(os.path.join(dir_actual, filename), encoding="utf-8") as f:
+                assert f.read() == expected
+
+    def test_streaming_output_identical(self) -> None:
+        """Test whether the streaming mode saves the same files as the default mode"""
+        DtakMaker(self.input_dir_data, self.input_dir_meta, self.output_dir).make()
+        # batch size that does not divide the number of sentences
+        DtakMaker(
+            self.input_dir_data,
+            self.input_dir_meta,
+            self.output_dir_streaming,
+            streaming=True,
+            batch_size=7,
+        ).make()
+        self.assert_same_files(self.output_dir, self.output_dir_streaming)
+
+    def test_parallel_output_identical(self) -> None:
+        """Test whether parallel processing saves the same files as the default mode"""
+        DtakMaker(self.input_dir_data, self.input_dir_meta, self.output_dir).make()
+        DtakMaker(
+            self.input_dir_data, self.input_dir_meta, self.output_dir_parallel, jobs=2
+        ).make()
+        self.assert_same_files(self.output_dir, self.output_dir_parallel)
+
+    def test_archive_output_identical(self) -> None:
+        """Test whether reading the data from archives saves the same files as reading from a directory"""
+        DtakMaker(self.input_dir_data, self.input_dir_meta, self.output_dir).make()
+        archive_dir = tempfile.mkdtemp()
+        try:
+            for fmt, kwargs in [
+                ("zip", {}),
+                ("zip", {"jobs": 2}),
+                ("tar", {"streaming": True}),
+                ("gztar", {"jobs": 2}),
+            ]:
+                path_archive = shutil.make_archive(
+                    os.path.join(archive_dir, fmt), fmt, root_dir=self.input_dir_data
+                )
+                output_dir = os.path.join(TMPDIR, f"{fmt}_{len(kwargs)}")
+                DtakMaker(
+                    path_archive,
+                    self.input_dir_meta,
+                    output_dir,
+                    **kwargs,
+                ).make()
+                self.assert_same_files(self.output_dir, output_dir)
+        finally:
+            shutil.rmtree(archive_dir)
+
+
+class DtakMakerHeaderMetadataTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.input_dir_data = "tests/testdata/dtak/ddctabs/"
+        self.output_dir = TMPDIR
+
+    def tearDown(self) -> None:
+        # Remove files that were created during training
+        for root, dirs, files in os.walk(TMPDIR, topdown=False):
+            for file in files:
+                os.remove(os.path.join(root, file))
+            else:
+                os.rmdir(root)
+
+    def test_metadata_from_header(self) -> None:
+        """Test whether the metadata is taken from the ddctabs headers"""
+        maker = DtakMaker(
+            self.input_dir_data, None, self.output_dir, merge_into_single_dataset=True
+        )
+        maker.make()
+        dataset = maker._dataset
+        for record in dataset.filter(lambda x: x["basename"].startswith("varnhagen")):
+            assert record["author"] == "Varnhagen, Rahel (#118626175)"
+            assert record["title"] == "Rahel: Ein Buch des Andenkens für ihre Freunde"
+            assert record["date"] == 1834
+            assert record["genre"] == "Belletristik::Prosa"
+        # The header of the weigel test file contains the metadata of another document
+        for record in dataset.filter(lambda x: x["basename"].startswith("weigel")):
+            assert record["author"] == "Varnhagen von Ense, Karl August (#118626167)"
+            assert record["date"] == 1837
+        assert dataset.column_names[9:13] == ["author", "title", "date", "genre"]
+        assert "bibl" not in dataset.column_names
+        assert "collection" not in dataset.column_names
+
+    def test_metadata_from_header_streaming(self) -> None:
+        """Test whether the metadata from the header is saved in streaming mode"""
+        DtakMaker(self.input_dir_data, None, self.output_dir, streaming=True).make()
+        with open(f"{TMPDIR}/varnhagen_rahel01_1834.jsonl", encoding="utf-8") as f:
+            record = json.loads(f.readline())
+        assert record["author"] == "Varnhagen, Rahel (#118626175)"
+        assert record["date"] == 1834
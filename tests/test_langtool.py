@@ -0,0 +1,189 @@
+import os
+import tempfile
+import types
+import unittest
+
+from language_tool_python import LanguageTool
+
+from transnormer_data.langtool import (
+    LanguageToolClient,
+    StubLanguageToolServer,
+    TriggerIndex,
+    correct_text,
+    prefilter_report,
+    server_url,
+)
+
+RULES = {
+    "OLD_SPELLING": {"daß": "dass", "Abfluß": "Abfluss", "muß": "muss"},
+    "ZUVIEL": {"Zuviel": "Zu viel"},
+    "OTHER": {"es": "ES"},
+}
+PARAMS = {
+    "language": "de-DE",
+    "enabledRules": "OLD_SPELLING,ZUVIEL",
+    "enabledOnly": "true",
+}
+
+
+class LanguageToolClientTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.servers = [StubLanguageToolServer(RULES).start() for _ in range(2)]
+        self.urls = [server.url for server in self.servers]
+
+    def tearDown(self) -> None:
+        for server in self.servers:
+            server.stop()
+
+    def test_correct_many_same_as_languagetool(self) -> None:
+        texts = [
+            "Zuviel Abfluß.",
+            "Ich weiß, daß es so sein muß.",
+            "😀 daß 😀 muß",
+            "Nichts zu tun.",
+            "",
+        ]
+        langtool = LanguageTool(language="de-DE", remote_server=self.urls[0])
+        langtool.enabled_rules = {"OLD_SPELLING", "ZUVIEL"}
+        langtool.enabled_rules_only = True
+        target = [langtool.correct(text) for text in texts]
+        client = LanguageToolClient(self.urls, PARAMS, num_threads=3)
+        assert client.correct_many(texts) == target
+        assert target[2] == "😀 dass 😀 muss"
+        assert target[1] == "Ich weiß, dass es so sein muss."
+        client.close()
+
+    def test_packing_same_as_per_sentence(self) -> None:
+        texts = [
+            "Zuviel Abfluß.",
+            "😀 daß 😀 muß",
+            "",
+            "daß",
+            "Ein langer Satz, in dem es nichts zu korrigieren gibt, außer: daß.",
+            "Zwei\n\nAbsätze, daß",
+            "muß",
+            "Nichts.",
+        ] * 5
+        langtool = LanguageTool(language="de-DE", remote_server=self.urls[0])
+        langtool.enabled_rules = {"OLD_SPELLING", "ZUVIEL"}
+        langtool.enabled_rules_only = True
+        target = [langtool.correct(text) for text in texts]
+        num_checks = self.servers[0].num_checks
+
+        client = LanguageToolClient(self.urls[:1], PARAMS, max_chars=50)
+        assert client.correct_many(texts) == target
+        assert self.servers[0].num_checks - num_checks < len(texts) / 2
+        assert LanguageToolClient(self.urls, PARAMS, max_chars=10)._pack(
+            ["aaaa", "bbbb", "c" * 20, "dd"]
+        ) == [[0, 1], [2], [3]]
+        client.close()
+
+    def test_correct_text(self) -> None:
+        def match(offset, length, *replacements):
+            return {
+                "offset": offset,
+                "length": length,
+                "replacements": [{"value": r} for r in replacements],
+            }
+
+        # Offsets are in UTF-16 code units, the emoji counts twice
+        assert correct_text("😀 daß", [match(3, 3, "dass", "das")]) == "😀 dass"
+        # Matches without replacements and overlapping matches are skipped
+        assert (
+            correct_text("a bb c", [match(0, 1), match(2, 2, "x"), match(3, 3, "y")])
+            == "a x c"
+        )
+
+    def test_server_url(self) -> None:
+        langtool = LanguageTool(language="de-DE", remote_server=self.urls[0])
+        assert server_url(langtool) == self.urls[0] + "/v2/"
+        # language-tool-python < 3 has no LanguageTool.url
+        old_langtool = types.SimpleNamespace(_url=self.urls[0] + "/v2/")
+        assert server_url(old_langtool) == self.urls[0] + "/v2/"  # type: ignore
+
+    def test_check_many_order(self) -> None:
+        texts = [f"Satz {i}: daß" + " muß" * (i % 7) for i in range(200)]
+        client = LanguageToolClient(self.urls, PARAMS, num_threads=8)
+        responses = client.check_many(texts)
+        assert [len(r["matches"]) for r in responses] == [1 + i % 7 for i in range(200)]
+        client.close()
+
+    def test_reconnect(self) -> None:
+        client = LanguageToolClient(self.urls[:1], PARAMS, num_threads=1)
+        assert client.correct_many(["daß"]) == ["dass"]
+        # The server closes the keep-alive connection
+        self.servers[0].stop()
+        self.servers[0] = StubLanguageToolServer(
+            RULES, port=int(self.urls[0].rsplit(":", 1)[1])
+        ).start()
+        assert client.correct_many(["daß"]) == ["dass"]
+        client.close()
+
+
+class TriggerIndexTester(unittest.TestCase):
+    def test_is_candidate(self) -> None:
+        index = TriggerIndex(
+            {
+                "OLD_SPELLING": {"tokens": ["daß", "Muß"], "regexes": []},
+                "ZUVIEL": {"tokens": [], "regexes": [r"\bzuviel\b"]},
+            }
+        )
+        rules = ["OLD_SPELLING", "ZUVIEL"]
+        assert index.is_candidate("Ich weiß, DASS es so sein muß.", rules)
+        assert index.is_candidate("Daß es so ist.", rules)
+        assert index.is_candidate("Das ist zuviel.", rules)
+        assert not index.is_candidate("Das ist Zuviel.", rules)
+        assert not index.is_candidate("Ich weiß, dass es so sein muss.", rules)
+        # Rules without an entry can match any sentence
+        assert index.is_candidate("Nichts.", rules + ["OTHER"])
+        # So can rules without triggers, e.g. rules that never matched while learning
+        index.add("OTHER")
+        assert index.is_candidate("Nichts.", rules + ["OTHER"])
+
+    def test_learn_save_load(self) -> None:
+        texts = ["😀 daß 😀 Zuviel", "Nichts.", "a--b"]
+        with StubLanguageToolServer({**RULES, "DASH": {"--": "–"}}) as server:
+            client = LanguageToolClient(
+                [server.url],
+                {**PARAMS, "enabledRules": "OLD_SPELLING,ZUVIEL,DASH"},
+            )
+            matches = client.check_texts(texts)
+            client.close()
+        index = TriggerIndex()
+        index.learn(texts, matches)
+        assert index.tokens == {
+            "OLD_SPELLING": {"daß"},
+            "ZUVIEL": {"zuviel"},
+            "DASH": set(),
+        }
+        assert index.regexes["DASH"] == ["\\-\\-"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "triggers.json")
+            index.save(path)
+            loaded = TriggerIndex.load(path)
+        assert loaded.tokens == index.tokens
+        assert loaded.is_candidate("x--y", ["DASH"])
+        assert not loaded.is_candidate("x-y", ["DASH"])
+
+    def test_prefilter_report(self) -> None:
+        texts = ["daß", "muß", "Zuviel", "Nichts.", "Zuviel daß"]
+        with StubLanguageToolServer(RULES) as server:
+            client = LanguageToolClient([server.url], PARAMS)
+            matches = client.check_texts(texts)
+            client.close()
+        index = TriggerIndex(
+            {
+                "OLD_SPELLING": {"tokens": ["daß"]},
+                "ZUVIEL": {"tokens": ["zuviel"]},
+            }
+        )
+        report = prefilter_report(texts, matches, index, ["OLD_SPELLING", "ZUVIEL"])
+        assert report["sentences"] == 5
+        assert report["candidates"] == 3
+        assert report["sentences_with_matches"] == 4
+        assert report["recalled"] == 3
+        assert report["recall"] == 0.75
+        assert report["per_rule"] == {
+            "OLD_SPELLING": {"sentences": 3, "recalled": 2},
+            "ZUVIEL": {"sentences": 2, "recalled": 2},
+        }
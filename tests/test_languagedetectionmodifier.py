@@ -6,6 +6,7 @@ import pytest
 
 from transnormer_data.modifier.language_detection_modifier import (
     LanguageDetectionModifier,
+    cascade_report,
 )
 
 
@@ -88,3 +89,61 @@ class LanguageDetectionModifierTester(unittest.TestCase):
         assert dataset_mod[20]["lang_py3langid"] == "de"
         assert dataset_mod[20]["lang_cld3"] == "de"
         assert dataset_mod[20]["lang_de"] == 1.0
+
+    def test_predict_batch(self) -> None:
+        texts = [
+            "Das ist ein einfach zu erkennender deutscher Satz.",
+            "Homos homini lupus.",
+            "Donde Lebensmann.",
+            "Homos homini lupus.",
+        ]
+        ensemble = self.modifier.languagedetector
+        target = [ensemble(text) for text in texts]
+        assert ensemble.predict_batch(texts) == target
+        ensemble.num_threads = 3
+        assert ensemble.predict_batch(texts) == target
+
+    def test_modify_dataset_batched(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        target = self.modifier.modify_dataset(dataset, save_to=False)
+        modifier = LanguageDetectionModifier(batch_size=8, num_threads=3)
+        result = modifier.modify_dataset(dataset, save_to=False)
+        assert result.to_list() == target.to_list()
+
+    def test_modify_dataset_cascade(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        target = self.modifier.modify_dataset(dataset, save_to=False)
+        # Threshold above 1: the whole ensemble classifies every sample
+        modifier = LanguageDetectionModifier(cascade_threshold=1.1, batch_size=8)
+        result = modifier.modify_dataset(dataset, save_to=False)
+        assert result.remove_columns("lang_path").to_list() == target.to_list()
+        assert set(result["lang_path"]) == {"ensemble"}
+        # Threshold 0: fastText alone classifies every sample
+        modifier = LanguageDetectionModifier(cascade_threshold=0.0)
+        result = modifier.modify_dataset(dataset, save_to=False)
+        assert set(result["lang_path"]) == {"fastText"}
+        assert result["lang_fastText"] == target["lang_fastText"]
+        assert set(result["lang_cld3"]) == {None}
+        assert result[20]["lang_de"] == 1.0
+
+    def test_cascade_report(self) -> None:
+        texts = [
+            "Das ist ein einfach zu erkennender deutscher Satz.",
+            "Homos homini lupus.",
+            "Donde Lebensmann.",
+        ]
+        report = cascade_report(self.modifier.languagedetector, texts, [0.0, 1.1])
+        assert report["sentences"] == 3
+        assert report["thresholds"]["0.0"]["early_exits"] == 3
+        # "Donde Lebensmann.": fastText says "en", the ensemble 0.333 German
+        assert report["thresholds"]["0.0"]["skipped_only_by_cascade"] == 1
+        assert report["thresholds"]["1.1"] == {
+            "early_exits": 0,
+            "early_exit_rate": 0.0,
+            "lang_de_agreement": 1.0,
+            "skip_agreement": 1.0,
+            "skipped_only_by_cascade": 0,
+            "skipped_only_by_ensemble": 0,
+        }
@@ -1,7 +1,10 @@
+import os
+import tempfile
 import unittest
 
 import datasets
 
+from transnormer_data.langtool import StubLanguageToolServer, TriggerIndex
 from transnormer_data.modifier.language_tool_modifier import LanguageToolModifier
 
 
@@ -55,3 +58,104 @@ class LanguageToolModifierTester(unittest.TestCase):
             dataset_mod[20]["norm"]
             == "Und wenn auch der volle Reichtum dieses von Geist und Liebe beseelten Gemütes nicht unmittelbar jedem Auge ganz entfaltet lag, so bekennen doch Alle, die auch nur Momente dieses in Wohlwollen und Wahrheitseifer stets erregten Lebens angeschaut, daß sie von dieser Erscheinung einen seltenen und ahndungsvollen Eindruck der eigentümlichsten Kraft und Anmut empfangen haben, der jeder freigebigsten Voraussetzung Raum gibt, und Alle mitfühlend unserer Wehklage beistimmen lässt."
         )
+
+
+class LanguageToolModifierConcurrentTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rule_file = "tests/testdata/languagetool/rules.txt"
+        rules = {
+            "OLD_SPELLING": {"daß": "dass", "läßt": "lässt", "muß": "muss"},
+            "ZUVIEL": {"Zuviel": "Zu viel"},
+        }
+        self.servers = [StubLanguageToolServer(rules).start() for _ in range(2)]
+        self.urls = [server.url for server in self.servers]
+
+    def tearDown(self) -> None:
+        for server in self.servers:
+            server.stop()
+
+    def test_modify_dataset_concurrent(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        modifier = LanguageToolModifier(self.rule_file, remote_servers=self.urls)
+        modifier_concurrent = LanguageToolModifier(
+            self.rule_file, remote_servers=self.urls, concurrency=4, batch_size=8
+        )
+        target = modifier.modify_dataset(dataset)
+        result = modifier_concurrent.modify_dataset(dataset)
+        assert result.to_list() == target.to_list()
+        assert result[20]["norm"].endswith("beistimmen lässt.")
+        modifier_concurrent.client.close()
+
+    def test_modify_dataset_packed(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        modifier = LanguageToolModifier(self.rule_file, remote_servers=self.urls[:1])
+        modifier_packed = LanguageToolModifier(
+            self.rule_file, remote_servers=self.urls[:1], max_request_chars=2000
+        )
+        target = modifier.modify_dataset(dataset)
+        num_checks = self.servers[0].num_checks
+        result = modifier_packed.modify_dataset(dataset)
+        assert result.to_list() == target.to_list()
+        assert self.servers[0].num_checks - num_checks < len(dataset)
+
+    def test_modify_dataset_trigger_index(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        index = TriggerIndex(
+            {
+                "OLD_SPELLING": {"tokens": ["daß", "läßt", "muß"]},
+                "ZUVIEL": {"tokens": ["zuviel"]},
+                "BESSERN_VS_BESSEREN": {"tokens": ["bessern", "besseren"]},
+            }
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "triggers.json")
+            index.save(path)
+            modifier = LanguageToolModifier(
+                self.rule_file, remote_servers=self.urls[:1]
+            )
+            modifier_filtered = LanguageToolModifier(
+                self.rule_file, remote_servers=self.urls[:1], trigger_index=path
+            )
+        target = modifier.modify_dataset(dataset)
+        num_checks = self.servers[0].num_checks
+        result = modifier_filtered.modify_dataset(dataset)
+        assert result.to_list() == target.to_list()
+        num_candidates = sum(
+            index.is_candidate(raw, modifier.rules) for raw in dataset["norm"]
+        )
+        assert self.servers[0].num_checks - num_checks == num_candidates
+        assert num_candidates < len(dataset)
+
+    def test_modify_dataset_cache(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        target = LanguageToolModifier(
+            self.rule_file, remote_servers=self.urls[:1]
+        ).modify_dataset(dataset)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "cache.sqlite")
+            # Only the first run sends requests, repeated sentences only once
+            num_sentences = len(set(dataset["norm"]))
+            for concurrency, expected_checks in [(1, num_sentences), (4, 0), (1, 0)]:
+                modifier = LanguageToolModifier(
+                    self.rule_file,
+                    remote_servers=self.urls[:1],
+                    concurrency=concurrency,
+                    cache=path,
+                )
+                num_checks = self.servers[0].num_checks
+                result = modifier.modify_dataset(dataset)
+                assert result.to_list() == target.to_list()
+                assert self.servers[0].num_checks - num_checks == expected_checks
+
+            # Other rules do not use the cached corrections
+            modifier = LanguageToolModifier(
+                self.rule_file, remote_servers=self.urls[:1], cache=path
+            )
+            modifier.set_langtool_rules({"ZUVIEL"})
+            num_checks = self.servers[0].num_checks
+            modifier.modify_dataset(dataset)
+            assert self.servers[0].num_checks - num_checks == num_sentences
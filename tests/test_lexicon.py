@@ -0,0 +1,266 @@
+import multiprocessing
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+
+import datasets
+
+from transnormer_data.cli import compile_lexicon as compile_lexicon_cli
+from transnormer_data.lexicon import (
+    CompiledLexicon,
+    LexiconNgramMatcher,
+    SharedLexicon,
+    compile_lexicon,
+    validate_mapping_files,
+)
+from transnormer_data.modifier.replace_ntom_cross_layer_modifier import (
+    ReplaceNtoMCrossLayerModifier,
+)
+from transnormer_data.modifier.replace_token_1to1_modifier import (
+    ReplaceToken1to1Modifier,
+)
+from transnormer_data.modifier.replace_token_1ton_modifier import (
+    ReplaceToken1toNModifier,
+)
+from transnormer_data.ngram_matcher import NgramMatcher
+
+TESTDATA = "tests/testdata/type-replacements"
+
+
+class LexiconTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
+
+    def write_file(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmpdir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def compile(self, files, kind: str, delimiters=None) -> str:
+        mapping, errors, _ = validate_mapping_files(files, kind, delimiters)
+        assert errors == []
+        path = os.path.join(self.tmpdir, f"{kind}.tnlex")
+        compile_lexicon(mapping, path, kind)
+        return path
+
+    def test_validate_arity_errors(self) -> None:
+        _, errors, _ = validate_mapping_files(
+            [f"{TESTDATA}/broken.tsv"], "1to1", delimiters="\t"
+        )
+        assert len(errors) == 2
+        assert "broken.tsv:2: expected 2 columns, got 3" in errors[0]
+        assert "broken.tsv:3: expected 2 columns, got 1" in errors[1]
+        _, errors, _ = validate_mapping_files([f"{TESTDATA}/1-to-n.tsv"], "1to1")
+        assert len(errors) == 3
+        assert all("target must be a single token" in e for e in errors)
+        _, errors, _ = validate_mapping_files(
+            [f"{TESTDATA}/2-to-n.tsv"], "1ton", delimiters="\t"
+        )
+        assert len(errors) == 4
+        assert all("source must be a single token" in e for e in errors)
+
+    def test_validate_duplicates_and_conflicts(self) -> None:
+        path = self.write_file(
+            "mapping.tsv", "daß\tdass\nmuß\tmuss\ndaß\tdass\nmuß\tmus\n"
+        )
+        mapping, errors, warnings = validate_mapping_files([path], "1to1")
+        assert len(warnings) == 1 and "mapping.tsv:3: duplicate of" in warnings[0]
+        assert len(errors) == 1 and "mapping.tsv:4: conflicts with" in errors[0]
+        assert mapping == {"daß": "dass", "muß": "muss"}
+        mapping, errors, warnings = validate_mapping_files(
+            [path], "1to1", on_conflict="last"
+        )
+        assert errors == [] and len(warnings) == 2
+        assert mapping == {"daß": "dass", "muß": "mus"}
+
+    def test_compiled_same_as_text_mapping(self) -> None:
+        for kind, files, load_text in [
+            (
+                "1to1",
+                [f"{TESTDATA}/old2new.tsv", f"{TESTDATA}/error2correct.tsv"],
+                ReplaceToken1to1Modifier()._load_replacement_mapping,
+            ),
+            (
+                "1ton",
+                [f"{TESTDATA}/1-to-n.tsv"],
+                ReplaceToken1toNModifier()._load_replacement_mapping,
+            ),
+        ]:
+            lexicon = CompiledLexicon(self.compile(files, kind))
+            expected = load_text(files)
+            assert lexicon.kind == kind
+            assert dict(lexicon) == expected
+            assert lexicon.get("unknown") is None
+            assert "unknown" not in lexicon
+        modifier = ReplaceNtoMCrossLayerModifier()
+        files = [f"{TESTDATA}/2-to-n.tsv"]
+        path = self.compile(files, "ntom", delimiters="\t")
+        lexicon = modifier._load_n2m_replacement_mapping([path])
+        assert dict(lexicon) == modifier._load_n2m_replacement_mapping(files, "\t")
+        assert modifier.src_ngram_lengths == [1, 2]
+
+    def test_wrong_kind(self) -> None:
+        path = self.compile([f"{TESTDATA}/old2new.tsv"], "1to1")
+        with self.assertRaises(ValueError):
+            ReplaceToken1toNModifier(mapping_files=[path])
+        with self.assertRaises(ValueError):
+            ReplaceToken1to1Modifier(mapping_files=[path, f"{TESTDATA}/old2new.tsv"])
+
+    def test_pickle(self) -> None:
+        path = self.compile([f"{TESTDATA}/old2new.tsv"], "1to1")
+        modifier = ReplaceToken1to1Modifier(mapping_files=[path])
+        modifier_copy = pickle.loads(pickle.dumps(modifier))
+        assert modifier_copy.type_mapping["daß"] == "dass"
+
+    def test_modify_sample_with_compiled_lexicon(self) -> None:
+        path = self.compile([f"{TESTDATA}/2-to-n.tsv"], "ntom", delimiters="\t")
+        modifier_text = ReplaceNtoMCrossLayerModifier(
+            mapping_files=[f"{TESTDATA}/2-to-n.tsv"], mapping_files_delimiters="\t"
+        )
+        modifier_compiled = ReplaceNtoMCrossLayerModifier(mapping_files=[path])
+        tokens_src = ["All", "'", "Andres", "'", "Allein", "'", "mässig"]
+        tokens_trg = ["Alle", "'", "Andres", "'", "Allein", "'", "mässig"]
+        alignment = [[i, i] for i in range(len(tokens_src))]
+        assert modifier_compiled.map_tokens_cross_layer(
+            tokens_src, tokens_trg, alignment
+        ) == modifier_text.map_tokens_cross_layer(tokens_src, tokens_trg, alignment)
+
+    def test_lexicon_ngram_matcher(self) -> None:
+        """Compare the search on the compiled lexicon with the automaton on random data"""
+        rng = random.Random(42)
+        vocab = ["a", "b", "c", "d", "e"]
+        ngrams = {
+            tuple(rng.choice(vocab) for _ in range(rng.randint(1, 6)))
+            for _ in range(300)
+        }
+        path = os.path.join(self.tmpdir, "random.tnlex")
+        compile_lexicon({ngram: ngram for ngram in ngrams}, path, "ntom")
+        matcher = LexiconNgramMatcher(CompiledLexicon(path))
+        expected_matcher = NgramMatcher(ngrams)
+        assert len(matcher) == len(expected_matcher)
+        for _ in range(200):
+            sent_tok = [rng.choice(vocab) for _ in range(rng.randint(0, 30))]
+            actual = matcher.find_all(sent_tok)
+            assert list(actual.items()) == list(
+                expected_matcher.find_all(sent_tok).items()
+            )
+            assert matcher.find_longest(sent_tok) == expected_matcher.find_longest(
+                sent_tok
+            )
+
+    def test_cli(self) -> None:
+        path_out = os.path.join(self.tmpdir, "lex.tnlex")
+        assert (
+            compile_lexicon_cli.main(
+                ["-k", "1to1", "-d", "{TAB}", "-o", path_out, f"{TESTDATA}/broken.tsv"]
+            )
+            == 1
+        )
+        assert not os.path.exists(path_out)
+        assert (
+            compile_lexicon_cli.main(
+                ["--kind", "1to1", "-o", path_out, f"{TESTDATA}/old2new.tsv"]
+            )
+            == 0
+        )
+        assert CompiledLexicon(path_out)["muß"] == "muss"
+
+
+def _lookup_in_worker(args):
+    lexicon, keys = args
+    return [lexicon.get(key) for key in keys]
+
+
+def _shares_resource_tracker_in_worker(lexicon):
+    return lexicon._shares_resource_tracker()
+
+
+class SharedLexiconTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mapping = {"daß": "dass", "muß": "muss", "Schiffahrt": "Schifffahrt"}
+
+    def test_create_and_attach(self) -> None:
+        with SharedLexicon.create(self.mapping, kind="1to1") as lexicon:
+            assert dict(lexicon) == self.mapping
+            # Pickling attaches to the same block instead of copying it
+            state = pickle.dumps(lexicon)
+            assert len(state) < 200
+            attached = pickle.loads(state)
+            assert attached.name == lexicon.name
+            assert dict(attached) == self.mapping
+            attached.close()
+            # Detaching does not free the block
+            assert lexicon["muß"] == "muss"
+
+    def test_worker_processes(self) -> None:
+        keys = ["daß", "und", "Schiffahrt"]
+        context = multiprocessing.get_context("spawn")
+        with SharedLexicon.create(self.mapping, kind="1to1") as lexicon:
+            with context.Pool(2) as pool:
+                results = pool.map(_lookup_in_worker, [(lexicon, keys)] * 4)
+        assert results == [["dass", None, "Schifffahrt"]] * 4
+
+    def test_worker_processes_share_resource_tracker(self) -> None:
+        # Workers must not unregister the block from the creator's tracker
+        for method in ["fork", "spawn"]:
+            context = multiprocessing.get_context(method)
+            with SharedLexicon.create(self.mapping, kind="1to1") as lexicon:
+                with context.Pool(2) as pool:
+                    results = pool.map(
+                        _shares_resource_tracker_in_worker, [lexicon] * 2
+                    )
+            assert results == [True, True]
+
+    def test_invalid_tokens(self) -> None:
+        with self.assertRaises(ValueError):
+            SharedLexicon.create({"da\x1fß": "dass"}, kind="1to1")
+        with self.assertRaises(ValueError):
+            SharedLexicon.create({"daß": ["da", ""]}, kind="1ton")
+        with self.assertRaises(ValueError):
+            SharedLexicon.create({("so", "\twie"): ("sowie",)}, kind="ntom")
+
+    def test_share_mapping(self) -> None:
+        modifier = ReplaceNtoMCrossLayerModifier(
+            mapping_files=[f"{TESTDATA}/2-to-n.tsv"], mapping_files_delimiters="\t"
+        )
+        mapping = dict(modifier.replacement_mapping)
+        tokens_src = ["All", "'", "Andres", "'", "Allein", "'", "mässig"]
+        tokens_trg = ["Alle", "'", "Andres", "'", "Allein", "'", "mässig"]
+        alignment = [[i, i] for i in range(len(tokens_src))]
+        expected = modifier.map_tokens_cross_layer(tokens_src, tokens_trg, alignment)
+        lexicon = modifier.share_lexicon()
+        try:
+            assert isinstance(lexicon, SharedLexicon)
+            assert isinstance(modifier._matcher, LexiconNgramMatcher)
+            assert dict(modifier.replacement_mapping) == mapping
+            assert (
+                modifier.map_tokens_cross_layer(tokens_src, tokens_trg, alignment)
+                == expected
+            )
+        finally:
+            lexicon.close()
+
+    def test_modify_dataset_num_proc(self) -> None:
+        dataset = datasets.Dataset.from_list(
+            [
+                {
+                    "norm": f"Die {i}. Schiffahrt daß es",
+                    "norm_tok": ["Die", f"{i}.", "Schiffahrt", "daß", "es"],
+                    "norm_ws": [False, True, True, True, True],
+                    "norm_spans": [],
+                }
+                for i in range(20)
+            ]
+        )
+        modifier = ReplaceToken1to1Modifier(mapping_files=[f"{TESTDATA}/old2new.tsv"])
+        expected = modifier.modify_dataset(dataset)
+        with modifier.share_lexicon():
+            actual = modifier.modify_dataset(dataset, num_proc=2)
+        assert actual.to_list() == expected.to_list()
@@ -1,8 +1,18 @@
 import os
 import pytest
+import tempfile
 import unittest
+from unittest import mock
 
-from transnormer_data.modifier.lm_score_modifier import LMScoreModifier, LMScorer
+import datasets
+import transformers
+
+from transnormer_data.modifier.lm_score_modifier import (
+    LMScoreModifier,
+    LMScorer,
+    _logits_from_lm_head,
+    calibration_report,
+)
 
 
 @pytest.mark.skipif(
@@ -30,3 +40,164 @@ class LMScoreModifierTester(unittest.TestCase):
         sample_02 = self.modifier.modify_sample(sample_02)
         # lower is better
         assert sample_01["dbmdz/german-gpt2"] < sample_02["dbmdz/german-gpt2"]
+
+    def test_predict_logprobs_batch(self) -> None:
+        texts = [
+            "Das ist ein normaler deutscher Satz.",
+            "normaler Satz deutscher Das ist nicht ein.",
+            "Kurz.",
+            "Ein etwas längerer Satz, der beim Auffüllen mehr Tokens hat als die anderen.",
+            "Das ist ein normaler deutscher Satz.",
+        ]
+        target = [self.lm_scorer.predict_logprobs(text) for text in texts]
+        for batch_size, max_tokens in [(2, None), (8, None), (8, 40)]:
+            scorer = self.lm_scorer
+            scorer.batch_size, scorer.max_tokens = batch_size, max_tokens
+            result = scorer.predict_logprobs_batch(texts)
+            for score, score_target in zip(result, target):
+                self.assertAlmostEqual(float(score), float(score_target), places=4)
+
+    def test_make_batches(self) -> None:
+        scorer = self.lm_scorer
+        scorer.batch_size, scorer.max_tokens = 3, None
+        assert scorer._make_batches([5, 1, 4, 2, 3]) == [[1, 3, 4], [2, 0]]
+        scorer.batch_size, scorer.max_tokens = 10, 8
+        assert scorer._make_batches([5, 1, 4, 2, 3]) == [[1, 3], [4, 2], [0]]
+
+    def test_modify_dataset_batched(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        target = self.modifier.modify_dataset(dataset, save_to=False)
+        modifier = LMScoreModifier(batch_size=8, max_tokens=2048)
+        result = modifier.modify_dataset(dataset, save_to=False)
+        key = "norm_dbmdz/german-gpt2"
+        for score, score_target in zip(result[key], target[key]):
+            self.assertAlmostEqual(score, score_target, places=4)
+
+    def test_predict_token_nlls(self) -> None:
+        text = "Das ist ein normaler deutscher Satz."
+        num_tokens = len(self.lm_scorer.tokenizer(text)["input_ids"])
+        nlls = self.lm_scorer.predict_token_nlls(text)
+        assert len(nlls) == num_tokens - 1
+        self.assertAlmostEqual(
+            float(nlls.mean()), float(self.lm_scorer.predict_logprobs(text)), places=5
+        )
+        # Smaller chunks of the LM head give the same result
+        self.lm_scorer.chunk_size = 3
+        nlls_chunked = self.lm_scorer.predict_token_nlls(text)
+        for nll, nll_chunked in zip(nlls, nlls_chunked):
+            self.assertAlmostEqual(float(nll), float(nll_chunked), places=4)
+
+    def test_modifier_token_nlls(self) -> None:
+        modifier = LMScoreModifier(token_nlls=True)
+        sample = modifier.modify_sample(
+            {"norm": "Das ist ein normaler deutscher Satz."}
+        )
+        nlls = sample["norm_dbmdz/german-gpt2_token_nlls"]
+        assert nlls.dtype == "float16"
+        self.assertAlmostEqual(
+            float(nlls.astype("float32").mean()),
+            sample["norm_dbmdz/german-gpt2"],
+            places=2,
+        )
+
+    def test_backends(self) -> None:
+        texts = [
+            "Das ist ein normaler deutscher Satz.",
+            "normaler Satz deutscher Das ist nicht ein.",
+            "Ein etwas längerer Satz, der beim Auffüllen mehr Tokens hat als die anderen.",
+        ]
+        target = self.lm_scorer.predict_logprobs_batch(texts)
+        scorer = LMScorer("dbmdz/german-gpt2", backend="torchscript", batch_size=8)
+        for score, score_target in zip(scorer.predict_logprobs_batch(texts), target):
+            self.assertAlmostEqual(float(score), float(score_target), places=4)
+        scorer = LMScorer("dbmdz/german-gpt2", backend="int8", batch_size=8)
+        scores = scorer.predict_logprobs_batch(texts)
+        for score, score_target in zip(scores, target):
+            self.assertAlmostEqual(float(score), float(score_target), delta=0.5)
+        # lower is better
+        assert scores[0] < scores[1]
+        with self.assertRaises(ValueError):
+            LMScorer("dbmdz/german-gpt2", backend="onnx")
+
+    def test_full_logits(self) -> None:
+        texts = [
+            "Das ist ein normaler deutscher Satz.",
+            "Ein etwas längerer Satz, der beim Auffüllen mehr Tokens hat als die anderen.",
+        ]
+        model = self.lm_scorer.model
+        example_inputs = self.lm_scorer._example_inputs()
+        assert not self.lm_scorer.full_logits
+        assert _logits_from_lm_head(model, example_inputs)
+        with mock.patch.object(
+            model.config, "final_logit_softcapping", 30.0, create=True
+        ):
+            assert not _logits_from_lm_head(model, example_inputs)
+        # Models that transform their logits are scored with their own logits
+        with mock.patch.object(
+            transformers.GPT2Config, "final_logit_softcapping", 30.0, create=True
+        ):
+            scorer = LMScorer("dbmdz/german-gpt2", batch_size=8)
+        assert scorer.full_logits
+        target = self.lm_scorer.predict_logprobs_batch(texts)
+        for score, score_target in zip(scorer.predict_logprobs_batch(texts), target):
+            self.assertAlmostEqual(float(score), float(score_target), places=4)
+
+    def test_calibration_report(self) -> None:
+        texts = ["Das ist ein normaler deutscher Satz.", "Kurz.", "Satz ein das."]
+        report = calibration_report(
+            "dbmdz/german-gpt2", texts, backends=["eager", "int8"], num_threads=2
+        )
+        assert report["texts"] == 3
+        assert report["backends"]["eager"]["max_abs_diff"] == 0.0
+        assert report["backends"]["int8"]["spearman"] > 0.9
+        assert report["backends"]["int8"]["texts_per_second"] > 0
+
+    def test_num_workers(self) -> None:
+        texts = [
+            "Das ist ein normaler deutscher Satz.",
+            "normaler Satz deutscher Das ist nicht ein.",
+            "Kurz.",
+            "Ein etwas längerer Satz, der beim Auffüllen mehr Tokens hat als die anderen.",
+        ]
+        target = self.lm_scorer.predict_logprobs_batch(texts)
+        scorer = LMScorer("dbmdz/german-gpt2", batch_size=1, num_workers=2)
+        scores = scorer.predict_logprobs_batch(texts)
+        scorer.close()
+        for score, score_target in zip(scores, target):
+            self.assertAlmostEqual(float(score), float(score_target), places=5)
+
+    def test_num_workers_and_num_proc(self) -> None:
+        modifier = LMScoreModifier(num_workers=2)
+        dataset = datasets.Dataset.from_dict({"norm": ["Kurz.", "Das ist ein Satz."]})
+        with self.assertRaises(ValueError):
+            modifier.modify_dataset(dataset, num_proc=2)
+        modifier.lm_scorer.close()
+
+    def test_cache(self) -> None:
+        texts = [
+            "Das ist ein normaler deutscher Satz.",
+            "Kurz.",
+            "Das ist ein normaler deutscher Satz.",
+        ]
+        target = self.lm_scorer.predict_token_nlls_batch(texts)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "cache.sqlite")
+            scorer = LMScorer("dbmdz/german-gpt2", cache=path)
+            scorer.predict_token_nlls_batch(texts)
+            assert len(scorer.cache) == 2
+            # A new run scores nothing again
+            scorer = LMScorer("dbmdz/german-gpt2", cache=path)
+            with mock.patch.object(scorer, "tokenizer", side_effect=AssertionError):
+                nlls = scorer.predict_token_nlls_batch(texts)
+                score = scorer(texts[0])["dbmdz/german-gpt2"]
+            for a, b in zip(nlls, target):
+                assert (a == b).all()
+            assert score == scorer.mean_nll(target[0])
+            # Other backends have their own entries
+            scorer = LMScorer("dbmdz/german-gpt2", backend="int8", cache=path)
+            scorer.predict_token_nlls_batch(texts[:1])
+            assert len(scorer.cache) == 3
+            scorer = LMScorer("dbmdz/german-gpt2", cache=path, cache_max_entries=2)
+            scorer.predict_token_nlls_batch(["Noch ein Satz."])
+            assert len(scorer.cache) == 2
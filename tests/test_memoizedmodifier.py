@@ -0,0 +1,127 @@
+import glob
+import os
+import tempfile
+import unittest
+from typing import Any, Dict, List
+
+import datasets
+import numpy as np
+
+from transnormer_data import utils
+from transnormer_data.base_dataset_modifier import BaseDatasetModifier
+from transnormer_data.modifier.memoized_modifier import MemoizedModifier
+from transnormer_data.modifier.replace_token_1to1_modifier import (
+    ReplaceToken1to1Modifier,
+)
+
+
+class LengthModifier(BaseDatasetModifier):
+    """Adds the length of the norm string and counts how many samples it modified"""
+
+    def __init__(self, factor: int = 1) -> None:
+        self.factor = factor
+        self.calls = 0
+
+    def modify_sample(self, sample: Dict) -> Dict:
+        self.calls += 1
+        sample["norm_len"] = np.int64(len(sample["norm"]) * self.factor)
+        return sample
+
+    def input_fields(self) -> List[str]:
+        return ["norm"]
+
+    def output_fields(self) -> List[str]:
+        return ["norm_len"]
+
+    def fingerprint(self) -> List[Any]:
+        return [self.factor]
+
+
+class MemoizedModifierTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite")
+        self.dataset = datasets.Dataset.from_dict(
+            {"norm": ["a", "bb", "a", "ccc", "bb"], "par_idx": [0, 1, 2, 3, 4]}
+        )
+
+    def tearDown(self) -> None:
+        self.tmpdir.cleanup()
+
+    def test_modify_dataset(self) -> None:
+        modifier = LengthModifier()
+        memoized = MemoizedModifier(modifier)
+        dataset = memoized.modify_dataset(self.dataset)
+        assert dataset["norm_len"] == [1, 2, 1, 3, 2]
+        assert dataset["par_idx"] == [0, 1, 2, 3, 4]
+        assert modifier.calls == 3
+        memoized.modify_dataset(self.dataset)
+        assert modifier.calls == 3
+
+    def test_modify_sample(self) -> None:
+        modifier = LengthModifier()
+        memoized = MemoizedModifier(modifier)
+        assert memoized.modify_sample({"norm": "bb"})["norm_len"] == 2
+        assert memoized.modify_sample({"norm": "bb"})["norm_len"] == 2
+        assert modifier.calls == 1
+
+    def test_persistent_cache(self) -> None:
+        MemoizedModifier(LengthModifier(), cache=self.path).modify_dataset(self.dataset)
+        modifier = LengthModifier()
+        dataset = MemoizedModifier(modifier, cache=self.path).modify_dataset(
+            self.dataset.select([3, 4])
+        )
+        assert dataset["norm_len"] == [3, 2]
+        assert modifier.calls == 0
+        # Another configuration does not use the cached outputs
+        modifier = LengthModifier(factor=2)
+        dataset = MemoizedModifier(modifier, cache=self.path).modify_dataset(
+            self.dataset
+        )
+        assert dataset["norm_len"] == [2, 4, 2, 6, 4]
+        assert modifier.calls == 3
+
+    def test_max_entries(self) -> None:
+        modifier = LengthModifier()
+        memoized = MemoizedModifier(modifier, max_entries=2)
+        dataset = memoized.modify_dataset(self.dataset)
+        assert len(memoized.cache) == 2
+        # Evicted outputs are computed again
+        assert dataset["norm_len"] == [1, 2, 1, 3, 2]
+        assert modifier.calls > 3
+
+    def test_undeclared_fields(self) -> None:
+        class UndeclaredModifier(BaseDatasetModifier):
+            def __init__(self) -> None:
+                pass
+
+            def modify_sample(self, sample: Dict) -> Dict:
+                return sample
+
+        with self.assertRaises(ValueError):
+            MemoizedModifier(UndeclaredModifier())
+
+    def test_replace_token_1to1(self) -> None:
+        files = sorted(glob.glob("tests/testdata/jsonl/dtak/*.jsonl"))
+        dataset = utils.load_dataset_via_pandas(data_files=files)
+        dataset = datasets.concatenate_datasets([dataset, dataset])
+        mapping_files = ["tests/testdata/type-replacements/old2new.tsv"]
+        target = ReplaceToken1to1Modifier(mapping_files=mapping_files).modify_dataset(
+            dataset
+        )
+        memoized = MemoizedModifier(
+            ReplaceToken1to1Modifier(mapping_files=mapping_files), cache=self.path
+        )
+        result = memoized.modify_dataset(dataset, num_proc=2)
+        assert result.to_list() == target.to_list()
+        assert len(memoized.cache) <= len(dataset) // 2
+        # Another lexicon has another fingerprint
+        other = MemoizedModifier(
+            ReplaceToken1to1Modifier(
+                mapping_files=["tests/testdata/type-replacements/error2correct.tsv"]
+            ),
+            cache=self.path,
+        )
+        keys = [key for batch in other._iter_dataset_keys(dataset) for key in batch]
+        assert len(keys) == len(dataset)
+        assert other.cache.get_many(keys) == {}
@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from transnormer_data.maker.dta_maker import DtaMaker
+from transnormer_data.maker.dtak_maker import DtakMaker
+from transnormer_data.metadata_index import MetadataIndex, default_index_path
+
+
+class MetadataIndexTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp()
+        self.path_jsonl = os.path.join(self.tmpdir, "metadata.jsonl")
+        shutil.copy("tests/testdata/metadata/metadata_dtak.jsonl", self.path_jsonl)
+        # Default indexes are stored in the cache directory
+        self.cache_home = os.path.join(self.tmpdir, "cache")
+        self.env = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cache_home})
+        self.env.start()
+
+    def tearDown(self) -> None:
+        self.env.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_build_and_get(self) -> None:
+        index = MetadataIndex.open_or_build(
+            self.path_jsonl, transform=DtaMaker._normalize_metadata_record
+        )
+        path_index = default_index_path(self.path_jsonl)
+        assert path_index.startswith(
+            os.path.join(self.cache_home, "transnormer_data", "metadata", "metadata-")
+        )
+        assert os.path.isfile(path_index)
+        assert not os.path.exists(os.path.join(self.tmpdir, "metadata.index.sqlite"))
+        assert len(index) == 6
+        record = index.get("fontane_stechlin_1899")
+        assert record == {
+            "author": "Fontane, Theodor (#118534262)",
+            "basename": "fontane_stechlin_1899",
+            "title": "Der Stechlin: Roman",
+            "date": 1899,
+            "genre": "Belletristik::Roman",
+        }
+        assert index.get("unknown_basename_1900") is None
+        assert "fontane_stechlin_1899" in index
+
+    def test_same_as_load_metadata(self) -> None:
+        maker = DtakMaker("", self.path_jsonl, "")
+        metadata = maker._load_metadata()
+        index = maker._load_metadata_index()
+        assert index.get_many(metadata.keys()) == metadata
+
+    def test_rebuild_outdated_index(self) -> None:
+        index = MetadataIndex.open_or_build(self.path_jsonl)
+        assert index.get("new_document_1900") is None
+        record = {"basename": "new_document_1900", "title": "Neu"}
+        with open(self.path_jsonl, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        index = MetadataIndex.open_or_build(self.path_jsonl)
+        assert index.get("new_document_1900") == record
+
+    def test_first_record_wins(self) -> None:
+        with open(self.path_jsonl, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"basename": "fontane_stechlin_1899"}) + "\n")
+        index = MetadataIndex.open_or_build(self.path_jsonl)
+        assert index.get("fontane_stechlin_1899")["title"] == "Der Stechlin: Roman"
+
+    def test_unknown_basename(self) -> None:
+        maker = DtakMaker("", self.path_jsonl, "")
+        maker._metadata_index = maker._load_metadata_index()
+        with self.assertRaises(KeyError):
+            maker._get_metadata("unknown_basename_1900")
+
+    def test_rebuild_other_transform(self) -> None:
+        MetadataIndex.open_or_build(self.path_jsonl)
+        index = MetadataIndex.open_or_build(
+            self.path_jsonl, transform=DtaMaker._normalize_metadata_record
+        )
+        assert "textClass" not in index.get("fontane_stechlin_1899")
+        index = MetadataIndex.open_or_build(
+            self.path_jsonl,
+            transform=DtaMaker._normalize_metadata_record,
+            transform_tag="normalize:2",
+        )
+        assert index.info()["transform"] == "normalize:2"
+        index = MetadataIndex.open_or_build(self.path_jsonl)
+        assert "textClass" in index.get("fontane_stechlin_1899")
+
+    def test_default_index_path(self) -> None:
+        other_dir = os.path.join(self.tmpdir, "other")
+        os.makedirs(other_dir)
+        other_jsonl = os.path.join(other_dir, "metadata.jsonl")
+        assert default_index_path(self.path_jsonl) != default_index_path(other_jsonl)
+        assert default_index_path(self.path_jsonl, "/x") == default_index_path(
+            os.path.relpath(self.path_jsonl), "/x"
+        )
+
+    def test_file_mode(self) -> None:
+        umask = os.umask(0o022)
+        try:
+            index = MetadataIndex.open_or_build(self.path_jsonl)
+        finally:
+            os.umask(umask)
+        assert os.stat(index.path).st_mode & 0o777 == 0o644
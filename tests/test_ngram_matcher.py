@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from transnormer_data.modifier.replace_ntom_cross_layer_modifier import (
+    ReplaceNtoMCrossLayerModifier,
+)
+from transnormer_data.ngram_matcher import NgramMatcher
+
+
+class NgramMatcherTester(unittest.TestCase):
+    def setUp(self) -> None:
+        self.ngrams = [("daß", "es"), ("es",), ("Schiffahrt", "."), ("nicht", "drin")]
+        self.matcher = NgramMatcher(self.ngrams)
+
+    def test_len_and_contains(self) -> None:
+        assert len(self.matcher) == 4
+        assert ("daß", "es") in self.matcher
+        assert ("daß",) not in self.matcher
+        assert ("es", "heute") not in self.matcher
+        assert () not in self.matcher
+
+    def test_find_all(self) -> None:
+        sent_tok = ["daß", "es", "heute", "in", "der", "Schiffahrt", "."]
+        result = self.matcher.find_all(sent_tok)
+        assert result == {
+            ("es",): [(1,)],
+            ("daß", "es"): [(0, 1)],
+            ("Schiffahrt", "."): [(5, 6)],
+        }
+        assert list(result) == [("es",), ("daß", "es"), ("Schiffahrt", ".")]
+
+    def test_find_all_same_as_find_ngram_indices(self) -> None:
+        """Compare with the brute-force search on random data, including the order of the result"""
+        rng = random.Random(42)
+        vocab = ["a", "b", "c", "d", "e"]
+        ngrams = {
+            tuple(rng.choice(vocab) for _ in range(rng.randint(1, 6)))
+            for _ in range(300)
+        }
+        matcher = NgramMatcher(ngrams)
+        modifier = ReplaceNtoMCrossLayerModifier()
+        for _ in range(200):
+            sent_tok = [rng.choice(vocab) for _ in range(rng.randint(0, 30))]
+            expected = modifier._find_ngram_indices(ngrams, sent_tok)
+            actual = matcher.find_all(sent_tok)
+            assert list(actual.items()) == list(expected.items())
+
+    def test_find_longest(self) -> None:
+        matcher = NgramMatcher([("irgend", "'", "was"), ("'", "was"), ("was", "für")])
+        sent_tok = ["irgend", "'", "was", "für", "'", "was"]
+        assert matcher.find_all(sent_tok) == {
+            ("'", "was"): [(1, 2), (4, 5)],
+            ("was", "für"): [(2, 3)],
+            ("irgend", "'", "was"): [(0, 1, 2)],
+        }
+        assert matcher.find_longest(sent_tok) == {
+            ("'", "was"): [(4, 5)],
+            ("irgend", "'", "was"): [(0, 1, 2)],
+        }
@@ -309,6 +309,26 @@ class ReplaceNtoMCrossLayerModifierTester(unittest.TestCase):
         correct_res = (["Alle", "Andres", "'", "Alleine"], True)
         assert correct_res == actual_res
 
+    def test_map_tokens_cross_layer_longest_match_first(self) -> None:
+        self.modifier.replacement_mapping = {
+            ("irgend", "'"): ("irgend",),
+            ("irgend", "'", "was"): ("irgendetwas",),
+        }
+        tokens_src = ["irgend", "'", "was", "und", "irgend", "'"]
+        tokens_trg = ["irgend", "'", "was", "und", "irgend", "'"]
+        alignment = [[0, 0], [1, 1], [2, 2], [3, 3], [4, 4], [5, 5]]
+        # Default: overlap is resolved on the target layer, first span is kept
+        actual_res = self.modifier.map_tokens_cross_layer(
+            tokens_src, tokens_trg, alignment
+        )
+        assert actual_res == (["irgend", "was", "und", "irgend"], True)
+        # Longest source ngram is kept
+        self.modifier.longest_match_first = True
+        actual_res = self.modifier.map_tokens_cross_layer(
+            tokens_src, tokens_trg, alignment
+        )
+        assert actual_res == (["irgendetwas", "und", "irgend"], True)
+
     def test_modify_sample_basic(self) -> None:
         self.modifier.replacement_mapping = self.modifier._load_n2m_replacement_mapping(
             self.mapping_files, delimiters="\t"
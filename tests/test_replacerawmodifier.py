@@ -1,7 +1,13 @@
+import csv
+import os
+import tempfile
 import unittest
 
+import datasets
+
 from transnormer_data.modifier.replace_raw_modifier import (
     ReplaceRawModifier,
+    SortedCorrections,
 )
 
 
@@ -21,6 +27,94 @@ class ReplaceRawModifierTester(unittest.TestCase):
         )
         print(mapping)
 
+    def test_uid_column_order(self) -> None:
+        # The uid columns are in another order than the uid_labels
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "corrections.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["par_idx", "basename", "norm_correct"])
+                writer.writerow([2, "b", "b2"])
+            mapping = self.modifier._load_corrected_samples(
+                [path], ["basename", "par_idx"], "norm_correct"
+            )
+            assert mapping == {("b", 2): "b2"}
+            with SortedCorrections(
+                [path], ["basename", "par_idx"], "norm_correct"
+            ) as corrections:
+                assert corrections.lookup([("b", 2)]) == {0: "b2"}
+
+    def test_sorted_corrections(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "corrections.tsv")
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f, delimiter="\t")
+                writer.writerow(["basename", "par_idx", "norm_correct"])
+                writer.writerow(["b", 2, "b2"])
+                writer.writerow(["a", 10, "a10"])
+                writer.writerow(["b", 1, "b1"])
+                writer.writerow(["a", 2, "a2"])
+                writer.writerow(["b", 2, "b2 (last)"])
+            with SortedCorrections(
+                [path], ["basename", "par_idx"], "norm_correct", chunk_size=2
+            ) as corrections:
+                assert len(corrections.runs) == 3
+                assert [(uid, raw) for _, uid, raw in corrections] == [
+                    (("a", 2), "a2"),
+                    (("a", 10), "a10"),
+                    (("b", 1), "b1"),
+                    (("b", 2), "b2 (last)"),
+                ]
+                assert corrections.lookup([("b", 2), ("c", 1), ("b", 1)]) == {
+                    0: "b2 (last)",
+                    2: "b1",
+                }
+                # Going back restarts the stream
+                assert corrections.lookup([("a", 10)]) == {0: "a10"}
+                runs = corrections.runs
+            # The run files are removed at the end of the with block
+            assert not any(os.path.exists(run) for run in runs)
+
+    def test_modify_dataset_streaming(self) -> None:
+        data_files = [
+            "tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl",
+            "tests/testdata/jsonl/dtak/weigel_moralweissheit_1674.jsonl",
+        ]
+        dataset_list = [
+            datasets.load_dataset("json", data_files=[fname], split="train")
+            for fname in data_files
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "corrections.csv")
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["basename", "par_idx", "norm_correct"])
+                # Every third record, in reverse order
+                for dataset in reversed(dataset_list):
+                    for record in list(dataset)[::-3]:
+                        writer.writerow(
+                            [record["basename"], record["par_idx"], "Korrigiert ."]
+                        )
+            modifier = ReplaceRawModifier(
+                mapping_files=[path], raw_label="norm_correct"
+            )
+            modifier_streaming = ReplaceRawModifier(
+                mapping_files=[path],
+                raw_label="norm_correct",
+                streaming=True,
+                chunk_size=5,
+            )
+            for dataset in dataset_list + dataset_list[:1]:
+                target = modifier.modify_dataset(dataset)
+                result = modifier_streaming.modify_dataset(dataset)
+                assert result.to_list() == target.to_list()
+                assert "Korrigiert ." in result["norm"]
+            # Batches are looked up in the processes that modify them
+            dataset = datasets.concatenate_datasets(dataset_list)
+            result = modifier_streaming.modify_dataset(dataset, num_proc=2)
+            assert result.to_list() == modifier.modify_dataset(dataset).to_list()
+            modifier_streaming.close()
+
     # def test_load_mapping_two_files(self) -> None:
     #     target_mapping = {
     #         "daß": "dass",
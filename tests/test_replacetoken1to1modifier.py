@@ -159,6 +159,53 @@ class ReplaceToken1to1ModifierTester(unittest.TestCase):
             == "Diese Bezeichnung darf indes auch jetzt, da jenem Verlangen nachgegeben wird, im vollen Sinne fortdauern; denn noch immer sind es wesentlich die Freunde, für welche der neue Abdruck Stadt findet, nur dass den im Leben gekannten jetzt auch die nach dem Scheiden erworbenen und künftigen sich anschließen."
         )
 
+    def test_modify_dataset_type_level(self) -> None:
+        mapping_files = [
+            "tests/testdata/type-replacements/old2new.tsv",
+            "tests/testdata/type-replacements/error2correct.tsv",
+        ]
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        modifier_type_level = ReplaceToken1to1Modifier(
+            mapping_files=mapping_files, type_level=True
+        )
+        self.modifier.type_mapping = modifier_type_level.type_mapping
+        target = self.modifier.modify_dataset(dataset)
+        result = modifier_type_level.modify_dataset(dataset)
+        assert result.features == target.features
+        assert result.to_list() == target.to_list()
+        assert result[9]["norm"] != dataset[9]["norm"]
+
+    def test_modify_batch_irregular_records(self) -> None:
+        # Empty replacements, replacements with a leading space and whitespace lists of the wrong length are passed to modify_sample
+        self.modifier.type_mapping = {"a": "A", "b": "", "c": " c", "d": "x😀y"}
+        records = [
+            {"tok": ["a", "b", "d"], "ws": [False, True, True]},
+            {"tok": ["d", "a", "😀"], "ws": [True, False, True]},
+            {"tok": ["e", "c"], "ws": [False, True]},
+            {"tok": [], "ws": []},
+            {"tok": ["f", "g"], "ws": [False, True]},
+            {"tok": ["a", "d", "d"], "ws": [False, True]},
+        ]
+        samples = []
+        for record in records:
+            raw = self.modifier._tok2raw(record["tok"], record["ws"])
+            spans = self.modifier._get_token_spans(record["tok"], record["ws"])
+            samples.append(
+                {
+                    "norm": raw,
+                    "norm_tok": record["tok"],
+                    "norm_ws": record["ws"],
+                    "norm_spans": spans,
+                }
+            )
+        dataset = datasets.Dataset.from_list(samples)
+        target = [self.modifier.modify_sample(s) for s in dataset.to_list()]
+        result = self.modifier.modify_batch(dataset.data.table).to_pylist()
+        assert result == target
+        assert result[1]["norm"] == " x😀yA 😀"
+        assert result[1]["norm_spans"] == [[1, 4], [4, 5], [6, 7]]
+
 
 class ReplaceToken1to1ModifierTesterOrigLayer(unittest.TestCase):
     def setUp(self) -> None:
@@ -2,6 +2,8 @@ import csv
 import pytest
 import unittest
 
+import datasets
+
 from transnormer_data.modifier.replace_token_1ton_modifier import (
     ReplaceToken1toNModifier,
 )
@@ -215,3 +217,16 @@ class ReplaceToken1toNModifierTester(unittest.TestCase):
         }
         result = self.modifier.modify_sample(input_sample)
         assert result == target
+
+    def test_modify_dataset_type_level(self) -> None:
+        data_files = ["tests/testdata/jsonl/dtak/varnhagen_rahel01_1834.jsonl"]
+        dataset = datasets.load_dataset("json", data_files=data_files, split="train")
+        mapping = {"daß": ["dass"], "indes": ["in", "des"], "Freunde": ["Freun", "de"]}
+        modifier_type_level = ReplaceToken1toNModifier(type_level=True)
+        self.modifier.type_mapping = mapping
+        modifier_type_level.type_mapping = mapping
+        target = self.modifier.modify_dataset(dataset)
+        result = modifier_type_level.modify_dataset(dataset, num_proc=2)
+        assert result.features == target.features
+        assert result.to_list() == target.to_list()
+        assert result.to_list() != dataset.to_list()